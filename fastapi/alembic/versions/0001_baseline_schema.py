@@ -0,0 +1,121 @@
+"""Baseline schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2025-09-01 10:00:00
+
+Tables created by database/migrations/20250829093313_dark_stream.sql and
+the Node.js backend. Existing databases already have them, so each table is
+only created when missing; stamp such databases with `alembic stamp 0001`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _json():
+    return sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(255), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    if "trips" not in existing:
+        op.create_table(
+            "trips",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("host_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("title", sa.String(255), nullable=False),
+            sa.Column("destination", sa.String(255), nullable=False),
+            sa.Column("start_date", sa.Date(), nullable=False),
+            sa.Column("end_date", sa.Date(), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("open_slots", sa.Integer(), nullable=False, server_default="1"),
+            sa.Column("budget_min", sa.DECIMAL(10, 2)),
+            sa.Column("budget_max", sa.DECIMAL(10, 2)),
+            sa.Column("preferences", _json(), server_default="{}"),
+            sa.Column("status", sa.String(20), server_default="active"),
+            sa.Column("current_participants", sa.Integer(), server_default="1"),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("idx_trips_destination", "trips", ["destination"])
+        op.create_index("idx_trips_start_date", "trips", ["start_date"])
+        op.create_index("idx_trips_status", "trips", ["status"])
+        op.create_index("idx_trips_created_at", "trips", ["created_at"])
+
+    if "trip_requests" not in existing:
+        op.create_table(
+            "trip_requests",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("status", sa.String(20), server_default="pending"),
+            sa.Column("message", sa.Text()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint("trip_id", "user_id"),
+        )
+        op.create_index("idx_trip_requests_trip_id", "trip_requests", ["trip_id"])
+        op.create_index("idx_trip_requests_user_id", "trip_requests", ["user_id"])
+        op.create_index("idx_trip_requests_status", "trip_requests", ["status"])
+
+    if "trip_participants" not in existing:
+        op.create_table(
+            "trip_participants",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("role", sa.String(20), server_default="participant"),
+            sa.Column("joined_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint("trip_id", "user_id"),
+        )
+        op.create_index("idx_trip_participants_trip_id", "trip_participants", ["trip_id"])
+        op.create_index("idx_trip_participants_user_id", "trip_participants", ["user_id"])
+
+    if "group_chats" not in existing:
+        op.create_table(
+            "group_chats",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False, unique=True),
+            sa.Column("name", sa.String(255)),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    if "chat_messages" not in existing:
+        op.create_table(
+            "chat_messages",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("chat_id", sa.Integer(), sa.ForeignKey("group_chats.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("message", sa.Text(), nullable=False),
+            sa.Column("message_type", sa.String(20), server_default="text"),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("idx_chat_messages_chat_id", "chat_messages", ["chat_id"])
+        op.create_index("idx_chat_messages_created_at", "chat_messages", ["created_at"])
+
+
+def downgrade() -> None:
+    # The baseline predates Alembic; never drop user data on downgrade
+    pass
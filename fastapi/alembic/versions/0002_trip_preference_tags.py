@@ -0,0 +1,73 @@
+"""Indexed trip preference filtering
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-09-01 10:30:00
+
+Adds the trip_tags side table (normalized tags derived from
+trips.preferences), indexed by tag, which backs the tag and key=value
+preference filters on every database.
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+MAX_TAG_LENGTH = 100
+
+
+def _fit_tag(tag):
+    if len(tag) <= MAX_TAG_LENGTH:
+        return tag
+    digest = hashlib.sha1(tag.encode()).hexdigest()[:20]
+    return f"{tag[:MAX_TAG_LENGTH - len(digest) - 1]}~{digest}"
+
+
+def preference_tags(preferences):
+    """Tags of a preferences dict, as app.utils.preference_tags derived them at this revision"""
+    tags = set()
+    for key, value in (preferences or {}).items():
+        key = str(key).strip().lower()
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if item is True:
+                tags.add(_fit_tag(key))
+            elif item is None or item is False or isinstance(item, (dict, list)):
+                continue
+            elif key == "tags":
+                tags.add(_fit_tag(str(item).strip().lower()))
+            else:
+                tags.add(_fit_tag(f"{key}={str(item).strip().lower()}"))
+    return sorted(tags)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    trip_tags = op.create_table(
+        "trip_tags",
+        sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("tag", sa.String(100), primary_key=True),
+    )
+    op.create_index("idx_trip_tags_tag_trip_id", "trip_tags", ["tag", "trip_id"])
+
+    # Backfill tags for existing trips
+    trips = sa.table("trips", sa.column("id", sa.Integer), sa.column("preferences", sa.JSON))
+    rows = [
+        {"trip_id": trip_id, "tag": tag}
+        for trip_id, preferences in bind.execute(sa.select(trips.c.id, trips.c.preferences))
+        for tag in preference_tags(preferences)
+    ]
+    if rows:
+        op.bulk_insert(trip_tags, rows)
+
+
+def downgrade() -> None:
+    op.drop_index("idx_trip_tags_tag_trip_id", table_name="trip_tags")
+    op.drop_table("trip_tags")
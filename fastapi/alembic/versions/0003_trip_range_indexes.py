@@ -0,0 +1,65 @@
+"""Trip bound constraints and range indexes for overlap matching
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-09-02 09:00:00
+
+GiST indexes on the daterange / numrange expressions compared by the feed's
+travel_from/travel_to and budget_range_min/budget_range_max filters,
+restricted to active trips. Other databases use the plain column
+comparisons and need no extra index.
+
+CHECK constraints keep start_date <= end_date and budget_min <= budget_max
+on every database, which the range indexes also rely on. Existing rows are
+not rewritten: if any have inverted bounds the migration fails listing their
+ids, to be fixed by hand before upgrading.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+BOUND_CHECKS = {
+    "ck_trips_dates": "start_date <= end_date",
+    "ck_trips_budget": "budget_min <= budget_max",
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for name, condition in BOUND_CHECKS.items():
+        ids = bind.execute(sa.text(f"SELECT id FROM trips WHERE NOT ({condition}) ORDER BY id")).scalars().all()
+        if ids:
+            raise RuntimeError(f"{name}: trips {ids} violate {condition}; fix them before upgrading")
+
+    with op.batch_alter_table("trips") as batch_op:
+        for name, condition in BOUND_CHECKS.items():
+            batch_op.create_check_constraint(name, condition)
+
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trips_active_date_range ON trips "
+        "USING GIST (daterange(start_date, end_date, '[]')) WHERE status = 'active'"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trips_active_budget_range ON trips "
+        "USING GIST (numrange(budget_min, budget_max, '[]')) WHERE status = 'active'"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS idx_trips_active_budget_range")
+        op.execute("DROP INDEX IF EXISTS idx_trips_active_date_range")
+
+    with op.batch_alter_table("trips") as batch_op:
+        for name in reversed(list(BOUND_CHECKS)):
+            batch_op.drop_constraint(name, type_="check")
@@ -0,0 +1,33 @@
+"""Precomputed similar trips
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-09-03 11:00:00
+
+Top-K neighbor lists served by GET /api/v1/trips/{trip_id}/similar.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trip_neighbors",
+        sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("rank", sa.Integer(), primary_key=True),
+        sa.Column("neighbor_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_trip_neighbors_neighbor_id", "trip_neighbors", ["neighbor_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_trip_neighbors_neighbor_id", table_name="trip_neighbors")
+    op.drop_table("trip_neighbors")
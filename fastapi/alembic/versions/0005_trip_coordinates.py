@@ -0,0 +1,49 @@
+"""Trip destination coordinates
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-09-04 10:00:00
+
+Adds latitude/longitude to trips for radius search, indexed for bounding
+box prefiltering, and geocodes existing trips with the bundled gazetteer.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.geo import geocode
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("trips", sa.Column("latitude", sa.Float()))
+    op.add_column("trips", sa.Column("longitude", sa.Float()))
+    op.create_index("idx_trips_latitude_longitude", "trips", ["latitude", "longitude"])
+
+    bind = op.get_bind()
+    trips = sa.table(
+        "trips",
+        sa.column("id", sa.Integer),
+        sa.column("destination", sa.String),
+        sa.column("latitude", sa.Float),
+        sa.column("longitude", sa.Float),
+    )
+    for trip_id, destination in bind.execute(sa.select(trips.c.id, trips.c.destination)).all():
+        coordinates = geocode(destination)
+        if coordinates:
+            bind.execute(
+                trips.update().where(trips.c.id == trip_id).values(
+                    latitude=coordinates[0], longitude=coordinates[1]
+                )
+            )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_trips_latitude_longitude", table_name="trips")
+    op.drop_column("trips", "longitude")
+    op.drop_column("trips", "latitude")
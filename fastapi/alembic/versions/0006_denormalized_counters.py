@@ -0,0 +1,219 @@
+"""Denormalized trip and chat counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-09-04 15:00:00
+
+Adds trips.pending_requests and group_chats.message_count/last_message_id,
+installs the triggers maintaining them (and current_participants) on
+PostgreSQL and SQLite, and backfills every counter from the rows it counts.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+# The counter triggers as of this revision, copied from app/counters.py so
+# the migration does not change when the application code does
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION update_trip_participants_count()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE trips SET current_participants = current_participants + 1 WHERE id = NEW.trip_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE trips SET current_participants = current_participants - 1 WHERE id = OLD.trip_id;
+        END IF;
+        RETURN COALESCE(NEW, OLD);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS update_participants_count_insert ON trip_participants",
+    """
+    CREATE TRIGGER update_participants_count_insert
+        AFTER INSERT ON trip_participants
+        FOR EACH ROW EXECUTE FUNCTION update_trip_participants_count()
+    """,
+    "DROP TRIGGER IF EXISTS update_participants_count_delete ON trip_participants",
+    """
+    CREATE TRIGGER update_participants_count_delete
+        AFTER DELETE ON trip_participants
+        FOR EACH ROW EXECUTE FUNCTION update_trip_participants_count()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION update_trip_pending_requests()
+    RETURNS TRIGGER AS $$
+    DECLARE
+        delta INTEGER := 0;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'pending' THEN
+            delta := delta - 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'pending' THEN
+            delta := delta + 1;
+        END IF;
+        IF delta <> 0 THEN
+            UPDATE trips SET pending_requests = pending_requests + delta
+            WHERE id = COALESCE(NEW.trip_id, OLD.trip_id);
+        END IF;
+        RETURN COALESCE(NEW, OLD);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS update_pending_requests_count ON trip_requests",
+    """
+    CREATE TRIGGER update_pending_requests_count
+        AFTER INSERT OR DELETE OR UPDATE OF status ON trip_requests
+        FOR EACH ROW EXECUTE FUNCTION update_trip_pending_requests()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION update_chat_message_count()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE group_chats
+            SET message_count = message_count + 1,
+                last_message_id = GREATEST(COALESCE(last_message_id, 0), NEW.id)
+            WHERE id = NEW.chat_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE group_chats
+            SET message_count = message_count - 1,
+                last_message_id = (SELECT MAX(id) FROM chat_messages WHERE chat_id = OLD.chat_id)
+            WHERE id = OLD.chat_id;
+        END IF;
+        RETURN COALESCE(NEW, OLD);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS update_message_count ON chat_messages",
+    """
+    CREATE TRIGGER update_message_count
+        AFTER INSERT OR DELETE ON chat_messages
+        FOR EACH ROW EXECUTE FUNCTION update_chat_message_count()
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS update_participants_count_insert
+    AFTER INSERT ON trip_participants
+    BEGIN
+        UPDATE trips SET current_participants = current_participants + 1 WHERE id = NEW.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_participants_count_delete
+    AFTER DELETE ON trip_participants
+    BEGIN
+        UPDATE trips SET current_participants = current_participants - 1 WHERE id = OLD.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_pending_requests_insert
+    AFTER INSERT ON trip_requests WHEN NEW.status = 'pending'
+    BEGIN
+        UPDATE trips SET pending_requests = pending_requests + 1 WHERE id = NEW.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_pending_requests_delete
+    AFTER DELETE ON trip_requests WHEN OLD.status = 'pending'
+    BEGIN
+        UPDATE trips SET pending_requests = pending_requests - 1 WHERE id = OLD.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_pending_requests_update
+    AFTER UPDATE OF status ON trip_requests
+    WHEN (OLD.status = 'pending') <> (NEW.status = 'pending')
+    BEGIN
+        UPDATE trips
+        SET pending_requests = pending_requests + (NEW.status = 'pending') - (OLD.status = 'pending')
+        WHERE id = NEW.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_message_count_insert
+    AFTER INSERT ON chat_messages
+    BEGIN
+        UPDATE group_chats
+        SET message_count = message_count + 1,
+            last_message_id = MAX(COALESCE(last_message_id, 0), NEW.id)
+        WHERE id = NEW.chat_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_message_count_delete
+    AFTER DELETE ON chat_messages
+    BEGIN
+        UPDATE group_chats
+        SET message_count = message_count - 1,
+            last_message_id = (SELECT MAX(id) FROM chat_messages WHERE chat_id = OLD.chat_id)
+        WHERE id = OLD.chat_id;
+    END
+    """,
+]
+
+COUNTER_TRIGGERS = {
+    "postgresql": POSTGRES_TRIGGERS,
+    "sqlite": SQLITE_TRIGGERS,
+}
+
+
+def upgrade() -> None:
+    op.add_column("trips", sa.Column("pending_requests", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("group_chats", sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("group_chats", sa.Column("last_message_id", sa.Integer()))
+
+    bind = op.get_bind()
+    for statement in COUNTER_TRIGGERS.get(bind.dialect.name, []):
+        op.execute(statement)
+
+    op.execute("""
+        UPDATE trips SET
+            current_participants = (
+                SELECT COUNT(*) FROM trip_participants WHERE trip_participants.trip_id = trips.id
+            ),
+            pending_requests = (
+                SELECT COUNT(*) FROM trip_requests
+                WHERE trip_requests.trip_id = trips.id AND trip_requests.status = 'pending'
+            )
+    """)
+    op.execute("""
+        UPDATE group_chats SET
+            message_count = (
+                SELECT COUNT(*) FROM chat_messages WHERE chat_messages.chat_id = group_chats.id
+            ),
+            last_message_id = (
+                SELECT MAX(id) FROM chat_messages WHERE chat_messages.chat_id = group_chats.id
+            )
+    """)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        # The participant count trigger predates this revision and is kept
+        op.execute("DROP TRIGGER IF EXISTS update_pending_requests_count ON trip_requests")
+        op.execute("DROP TRIGGER IF EXISTS update_message_count ON chat_messages")
+        op.execute("DROP FUNCTION IF EXISTS update_trip_pending_requests()")
+        op.execute("DROP FUNCTION IF EXISTS update_chat_message_count()")
+    elif bind.dialect.name == "sqlite":
+        for trigger in (
+            "update_participants_count_insert", "update_participants_count_delete",
+            "update_pending_requests_insert", "update_pending_requests_delete",
+            "update_pending_requests_update", "update_message_count_insert",
+            "update_message_count_delete",
+        ):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    op.drop_column("group_chats", "last_message_id")
+    op.drop_column("group_chats", "message_count")
+    op.drop_column("trips", "pending_requests")
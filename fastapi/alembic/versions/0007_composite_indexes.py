@@ -0,0 +1,65 @@
+"""Composite and partial indexes for the hot query shapes
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-09-05 10:00:00
+
+Adds indexes matching how the routers filter and order, where the existing
+ones are single-column: active trips by start date and destination, trips
+by host, membership checks on
+(trip_id, user_id), my-trips on (user_id, role) and chat history on
+(chat_id, created_at DESC). On PostgreSQL they are built CONCURRENTLY so
+writes are not blocked; run `benchmarks/explain.py` to check the plans.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("status = 'active'")
+
+# (name, table, columns, options)
+INDEXES = [
+    ("idx_trips_active_start_date", "trips", ["start_date", "id"],
+     {"postgresql_where": ACTIVE, "sqlite_where": ACTIVE}),
+    ("idx_trips_active_destination", "trips", ["destination"],
+     {"postgresql_where": ACTIVE, "sqlite_where": ACTIVE}),
+    ("idx_trips_host_id_start_date", "trips", ["host_id", "start_date", "id"], {}),
+    ("idx_trip_requests_trip_id_user_id", "trip_requests", ["trip_id", "user_id"], {"unique": True}),
+    ("idx_trip_requests_trip_id_status_created_at", "trip_requests", ["trip_id", "status", "created_at"], {}),
+    ("idx_trip_participants_trip_id_user_id", "trip_participants", ["trip_id", "user_id"], {"unique": True}),
+    ("idx_trip_participants_user_id_role", "trip_participants", ["user_id", "role", "trip_id"], {}),
+    ("idx_chat_messages_chat_id_created_at", "chat_messages", ["chat_id", sa.text("created_at DESC")], {}),
+]
+
+
+def _has_unique(inspector, table, columns) -> bool:
+    """Databases set up with the SQL script already have UNIQUE(trip_id, user_id)"""
+    constraints = inspector.get_unique_constraints(table)
+    indexes = [index for index in inspector.get_indexes(table) if index.get("unique")]
+    return any(item["column_names"] == columns for item in constraints + indexes)
+
+
+def upgrade() -> None:
+    context = op.get_context()
+    # Offline (--sql) scripts target databases set up with the SQL script
+    inspector = None if context.as_sql else sa.inspect(op.get_bind())
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with context.autocommit_block():
+        for name, table, columns, options in INDEXES:
+            if options.get("unique") and (inspector is None or _has_unique(inspector, table, columns)):
+                continue
+            op.create_index(
+                name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,42 @@
+"""Idempotency keys
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-09-08 10:00:00
+
+First responses of POSTs sent with an Idempotency-Key, replayed to retries
+until they expire (see app/idempotency.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("owner", sa.String(64), nullable=False),
+        sa.Column("key", sa.String(255), nullable=False),
+        sa.Column("fingerprint", sa.String(64), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("response_status", sa.Integer()),
+        sa.Column("response_headers", sa.JSON()),
+        sa.Column("response_body", sa.LargeBinary()),
+        sa.Column("locked_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("idx_idempotency_keys_owner_key", "idempotency_keys", ["owner", "key"], unique=True)
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_expires_at", table_name="idempotency_keys")
+    op.drop_index("idx_idempotency_keys_owner_key", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
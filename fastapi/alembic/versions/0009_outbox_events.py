@@ -0,0 +1,48 @@
+"""Transactional outbox
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-09-09 10:00:00
+
+Side effects of writes (group chat creation, system messages, notifications)
+recorded in the same transaction and run by the outbox worker (see
+app/outbox.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("status = 'pending'")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_type", sa.String(50), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("claim_token", sa.String(32)),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index(
+        "idx_outbox_events_pending_available_at", "outbox_events", ["available_at", "id"],
+        postgresql_where=PENDING, sqlite_where=PENDING
+    )
+    op.create_index("idx_outbox_events_status_processed_at", "outbox_events", ["status", "processed_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_outbox_events_status_processed_at", table_name="outbox_events")
+    op.drop_index("idx_outbox_events_pending_available_at", table_name="outbox_events")
+    op.drop_table("outbox_events")
@@ -0,0 +1,46 @@
+"""Activity timeline
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-09-10 10:00:00
+
+Append-only activity events, fanned out at write time to one user_activity
+row per recipient so GET /api/v1/activity/ reads a single range of the
+(user_id, event_id) primary key.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "activity_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_type", sa.String(50), nullable=False),
+        sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("actor_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("subject_id", sa.Integer()),
+        sa.Column("data", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_activity_events_created_at", "activity_events", ["created_at"])
+    op.create_table(
+        "user_activity",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("activity_events.id", ondelete="CASCADE"), primary_key=True),
+    )
+    op.create_index("ix_user_activity_event_id", "user_activity", ["event_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_activity_event_id", table_name="user_activity")
+    op.drop_table("user_activity")
+    op.drop_index("ix_activity_events_created_at", table_name="activity_events")
+    op.drop_table("activity_events")
@@ -0,0 +1,31 @@
+"""Queued similar trip refreshes
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-09-11 10:00:00
+
+Trip writes queue their trip ids in trip_neighbor_refreshes, in the same
+transaction, and a scheduled job refreshes the neighbor lists of all queued
+trips in one pass instead of once per request.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trip_neighbor_refreshes",
+        sa.Column("trip_id", sa.Integer(), primary_key=True),
+        sa.Column("queued_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("trip_neighbor_refreshes")
@@ -0,0 +1,43 @@
+"""Default trips.current_participants to 0
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2025-09-12 10:00:00
+
+The participant count triggers installed in 0006 count the host's
+participant row like any other, so trips must start at 0. The baseline
+server default of 1 made rows inserted outside the ORM count the host twice.
+
+SQLite cannot change a default in place, so the table is rebuilt; legacy
+ALTER TABLE semantics keep the rename from re-validating the counter
+triggers while trips is briefly missing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def _set_default(value: str) -> None:
+    sqlite = op.get_bind().dialect.name == "sqlite"
+    if sqlite:
+        op.execute("PRAGMA legacy_alter_table = ON")
+    with op.batch_alter_table("trips") as batch_op:
+        batch_op.alter_column(
+            "current_participants", existing_type=sa.Integer(), server_default=value, existing_nullable=True
+        )
+    if sqlite:
+        op.execute("PRAGMA legacy_alter_table = OFF")
+
+
+def upgrade() -> None:
+    _set_default("0")
+
+
+def downgrade() -> None:
+    _set_default("1")
@@ -1 +1,8 @@
-# TripNect India FastAPI Backend
\ No newline at end of file
+# TripNect India FastAPI Backend
+from dotenv import load_dotenv
+
+from app.startup import startup_report
+
+# Loaded before any module reads its settings from the environment
+with startup_report.phase("configuration"):
+    load_dotenv()
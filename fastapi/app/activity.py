@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Optional
+import os
+
+from app.models import ActivityEvent, UserActivity, TripParticipant
+
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "90"))
+ACTIVITY_RETENTION_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_RETENTION_INTERVAL_SECONDS", "3600"))
+ACTIVITY_RETENTION_BATCH_SIZE = int(os.getenv("ACTIVITY_RETENTION_BATCH_SIZE", "1000"))
+# Characters of a chat message kept in its activity event
+ACTIVITY_PREVIEW_LENGTH = 100
+
+def trip_members(db: Session, trip_id: int) -> List[int]:
+    """User ids of the trip's participants, host included"""
+    return [row[0] for row in db.query(TripParticipant.user_id).filter(TripParticipant.trip_id == trip_id)]
+
+def record_activity(
+    db: Session,
+    event_type: str,
+    trip_id: int,
+    actor_id: int,
+    recipients: Iterable[int],
+    subject_id: Optional[int] = None,
+    **data: Any
+) -> Optional[int]:
+    """Append an event and fan it out to each recipient's timeline, in the caller's transaction.
+
+    Writing one row per recipient here keeps reads to a single range of the
+    reader's own rows. Returns the event id, or None when nobody receives it.
+    """
+    recipients = sorted(set(recipients))
+    if not recipients:
+        return None
+    event = ActivityEvent(
+        event_type=event_type, trip_id=trip_id, actor_id=actor_id, subject_id=subject_id,
+        data=data or None, created_at=datetime.now(timezone.utc)
+    )
+    db.add(event)
+    db.flush()
+    db.execute(insert(UserActivity), [{"user_id": user_id, "event_id": event.id} for user_id in recipients])
+    return event.id
+
+def message_preview(message: str) -> str:
+    if len(message) <= ACTIVITY_PREVIEW_LENGTH:
+        return message
+    return message[:ACTIVITY_PREVIEW_LENGTH - 1] + "…"
+
+def compact_activity(db: Session) -> Dict[str, int]:
+    """Delete events older than ACTIVITY_RETENTION_DAYS and their timeline rows, in batches.
+
+    Event ids grow with time, so the expired events are exactly those up to
+    the newest expired id.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ACTIVITY_RETENTION_DAYS)
+    last_expired = db.query(func.max(ActivityEvent.id)).filter(ActivityEvent.created_at < cutoff).scalar()
+    if last_expired is None:
+        return {"events_deleted": 0, "timeline_rows_deleted": 0}
+    events = timeline_rows = 0
+    while True:
+        ids = [
+            row[0] for row in db.query(ActivityEvent.id).filter(
+                ActivityEvent.id <= last_expired
+            ).order_by(ActivityEvent.id).limit(ACTIVITY_RETENTION_BATCH_SIZE)
+        ]
+        if not ids:
+            break
+        timeline_rows += db.query(UserActivity).filter(
+            UserActivity.event_id.in_(ids)
+        ).delete(synchronize_session=False)
+        events += db.query(ActivityEvent).filter(ActivityEvent.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    return {"events_deleted": events, "timeline_rows_deleted": timeline_rows}
@@ -1,20 +1,31 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from typing import Optional
 from jose import JWTError, jwt
 import os
 
 from app.database import get_db
 from app.models import User
+from app.statements import user_by_id
+
+# Set on sub-requests of POST /api/v1/batch to the user the batch authenticated
+BATCH_USER_SCOPE_KEY = "tripnect.batch.user"
 
 # Security scheme
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     """Get current authenticated user from JWT token"""
+    batch_user = request.scope.get(BATCH_USER_SCOPE_KEY)
+    if batch_user is not None:
+        return batch_user
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -37,12 +48,22 @@ def get_current_user(
         raise credentials_exception
     
     # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_by_id(db, user_id)
     if user is None:
         raise credentials_exception
         
     return user
 
+def get_optional_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+):
+    """Get the authenticated user if a token was sent, None for anonymous requests"""
+    if credentials is None:
+        return None
+    return get_current_user(request, credentials, db)
+
 def verify_token(token: str) -> dict:
     """Verify JWT token and return payload"""
     try:
@@ -56,4 +77,16 @@ def verify_token(token: str) -> dict:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
-        )
\ No newline at end of file
+        )
+
+def get_current_admin(current_user: User = Depends(get_current_user)):
+    """Require the current user to be listed in ADMIN_USER_IDS"""
+    admin_ids = {
+        int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()
+    }
+    if current_user.id not in admin_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
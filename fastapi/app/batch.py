@@ -0,0 +1,189 @@
+from fastapi import BackgroundTasks, FastAPI, Request
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+from sqlalchemy.orm import Session
+from starlette.middleware.exceptions import ExceptionMiddleware
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import asyncio
+import json
+import logging
+import os
+
+from app.database import BATCH_DB_SCOPE_KEY
+from app.models import User
+from app.schemas import BatchItem, BatchItemResponse
+from app.auth import BATCH_USER_SCOPE_KEY
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+# Default and upper bound of a sub-request's timeout_ms
+BATCH_ITEM_TIMEOUT_MS = int(os.getenv("BATCH_ITEM_TIMEOUT_MS", "5000"))
+
+# Sub-request headers taken from the batch request instead of the item
+_RESERVED_HEADERS = {"authorization", "host", "content-length", "content-type", "transfer-encoding"}
+
+# FastAPI app -> its router wrapped in the exception handling of the full stack
+_dispatchers: Dict[int, Any] = {}
+
+def _dispatcher(app: FastAPI):
+    """The app's router with its exception handlers and dependency exit stack, but no middleware.
+
+    Sub-requests skip CORS, rate limits, load shedding, idempotency and
+    profiling; the batch request itself has been through them.
+    """
+    dispatcher = _dispatchers.get(id(app))
+    if dispatcher is None:
+        handlers = {key: value for key, value in app.exception_handlers.items() if key not in (500, Exception)}
+        dispatcher = ExceptionMiddleware(AsyncExitStackMiddleware(app.router), handlers=handlers, debug=app.debug)
+        _dispatchers[id(app)] = dispatcher
+    return dispatcher
+
+def validate_item(item: BatchItem) -> Optional[str]:
+    """Why a sub-request cannot run, or None"""
+    path = urlsplit(item.path).path
+    if not path.startswith("/api/v1/"):
+        return "Sub-request paths must start with /api/v1/"
+    if path.rstrip("/") == "/api/v1/batch":
+        return "Batches cannot be nested"
+    return None
+
+def _response_body(headers: Dict[str, str], body: bytes) -> Any:
+    if not body:
+        return None
+    if headers.get("content-type", "").startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+async def run_item(
+    request: Request, db: Session, user: User, item: BatchItem,
+    release: asyncio.Event, tails: List[asyncio.Task]
+) -> BatchItemResponse:
+    """Run one sub-request through the app's routes on the batch's session and user.
+
+    Returns once the response body is complete. The sub-request is then held
+    before its background tasks until release is set, and added to tails.
+    """
+    parent = request.scope
+    parts = urlsplit(item.path)
+    body = json.dumps(item.body).encode() if item.body is not None else b""
+    headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in (item.headers or {}).items() if name.lower() not in _RESERVED_HEADERS
+    ]
+    headers += [(name, value) for name, value in parent["headers"] if name == b"authorization"]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {
+        "type": "http",
+        "asgi": parent.get("asgi", {}),
+        "http_version": parent.get("http_version", "1.1"),
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "app": parent.get("app"),
+        "method": item.method,
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "headers": headers,
+        BATCH_DB_SCOPE_KEY: db,
+        BATCH_USER_SCOPE_KEY: user,
+    }
+
+    body_sent = False
+    never = asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Streaming responses wait for a disconnect that never comes
+        await never.wait()
+
+    response: Dict[str, Any] = {"status": 500, "headers": {}, "body": b""}
+    complete = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {
+                name.decode("latin-1"): value.decode("latin-1") for name, value in message.get("headers", [])
+            }
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+            if not message.get("more_body", False):
+                complete.set()
+                # Background tasks of the sub-request run after the batch response
+                await release.wait()
+
+    task = asyncio.ensure_future(_dispatcher(request.app)(scope, receive, send))
+    waiter = asyncio.ensure_future(complete.wait())
+    try:
+        await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        waiter.cancel()
+    if task.done():
+        task.result()
+    else:
+        tails.append(task)
+    response["headers"].pop("content-length", None)
+    return BatchItemResponse(
+        id=item.id,
+        status=response["status"],
+        headers=response["headers"],
+        body=_response_body(response["headers"], response["body"])
+    )
+
+async def _finish(release: asyncio.Event, tails: List[asyncio.Task]):
+    release.set()
+    for result in await asyncio.gather(*tails, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.error("Batch sub-request background task failed", exc_info=result)
+
+async def run_batch(
+    request: Request, db: Session, user: User, items: List[BatchItem], background_tasks: BackgroundTasks
+) -> List[BatchItemResponse]:
+    """Run sub-requests one after the other, in order.
+
+    Every sub-request shares the batch's session (one connection), and route
+    handlers do their database work on the event loop, so running them
+    concurrently would not overlap any work. A read listed after a write
+    sees it. The session is rolled back after a write that failed so later
+    items start clean. Background tasks the sub-requests add run once the
+    batch response has been sent.
+    """
+    release = asyncio.Event()
+    tails: List[asyncio.Task] = []
+    background_tasks.add_task(_finish, release, tails)
+    results: List[BatchItemResponse] = []
+    try:
+        for item in items:
+            error = validate_item(item)
+            if error:
+                results.append(BatchItemResponse(id=item.id, status=400, headers={}, body={"detail": error}))
+                continue
+            timeout_ms = min(item.timeout_ms or BATCH_ITEM_TIMEOUT_MS, BATCH_ITEM_TIMEOUT_MS)
+            try:
+                result = await asyncio.wait_for(
+                    run_item(request, db, user, item, release, tails), timeout_ms / 1000
+                )
+            except asyncio.TimeoutError:
+                result = BatchItemResponse(
+                    id=item.id, status=504, headers={}, body={"detail": f"Sub-request timed out after {timeout_ms} ms"}
+                )
+            except Exception:
+                logger.exception("Batch sub-request %s %s failed", item.method, item.path)
+                result = BatchItemResponse(id=item.id, status=500, headers={}, body={"detail": "Internal Server Error"})
+            if item.method != "GET" and result.status >= 400:
+                db.rollback()
+            results.append(result)
+    except BaseException:
+        release.set()
+        raise
+    return results
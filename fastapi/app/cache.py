@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import os
+import threading
+import time
+
+from app.models import User, Trip, TripParticipant
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with an optional TTL"""
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Entity snapshots
+
+class _Snapshot:
+    """Immutable copy of a row's columns, safe to share between requests"""
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={self.id}>"
+
+class UserSnapshot(_Snapshot):
+    __slots__ = ("id", "email", "name", "created_at")
+
+class TripSnapshot(_Snapshot):
+    __slots__ = (
+        "id", "user_id", "host_id", "title", "destination", "start_date", "end_date",
+        "open_slots", "current_participants", "budget_min", "budget_max", "status"
+    )
+
+class ProfileView:
+    """Read-only view of a row or snapshot with cached profiles attached as attributes"""
+    __slots__ = ("_source", "_profiles")
+
+    def __init__(self, source, **profiles):
+        self._source = source
+        self._profiles = profiles
+
+    def __getattr__(self, name):
+        if name in self._profiles:
+            return self._profiles[name]
+        return getattr(self._source, name)
+
+# Commits evict entries only in the writing process, so other workers may
+# serve a snapshot up to this old; it is the staleness bound of the cache
+ENTITY_CACHE_TTL_SECONDS = float(os.getenv("ENTITY_CACHE_TTL_SECONDS", "10"))
+
+user_cache = LRUCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=ENTITY_CACHE_TTL_SECONDS
+)
+trip_cache = LRUCache(
+    maxsize=int(os.getenv("TRIP_CACHE_SIZE", "10000")),
+    ttl=ENTITY_CACHE_TTL_SECONDS
+)
+
+# Number of User/Trip rows served from the cache instead of being joined
+_rows_avoided = {"users": 0, "trips": 0}
+
+def _load(db: Session, cache: LRUCache, model, snapshot_cls, ids: Iterable[int], counter: str, fresh: bool = False):
+    ids = {i for i in ids if i is not None}
+    found = {}
+    missing = []
+    for entity_id in ids:
+        snapshot = None if fresh else cache.get(entity_id)
+        if snapshot is None:
+            missing.append(entity_id)
+        else:
+            found[entity_id] = snapshot
+    _rows_avoided[counter] += len(found)
+
+    if missing:
+        columns = [getattr(model, name) for name in snapshot_cls.__slots__]
+        for row in db.query(*columns).filter(model.id.in_(missing)):
+            snapshot = snapshot_cls(**row._asdict())
+            cache.set(snapshot.id, snapshot)
+            found[snapshot.id] = snapshot
+    return found
+
+def get_users(db: Session, user_ids: Iterable[int], fresh: bool = False) -> Dict[int, UserSnapshot]:
+    """Profiles for the given user ids, loading misses (or, with fresh, all of them) in a single query"""
+    return _load(db, user_cache, User, UserSnapshot, user_ids, "users", fresh)
+
+def get_trips(db: Session, trip_ids: Iterable[int]) -> Dict[int, TripSnapshot]:
+    """Trip snapshots for the given ids, loading misses in a single query"""
+    return _load(db, trip_cache, Trip, TripSnapshot, trip_ids, "trips")
+
+def with_profiles(db: Session, rows: List[Any], **fields: str) -> List[ProfileView]:
+    """Attach cached user profiles to rows, e.g. with_profiles(db, trips, host="host_id")"""
+    users = get_users(db, (getattr(row, fk) for row in rows for fk in fields.values()))
+    return [
+        ProfileView(row, **{name: users.get(getattr(row, fk)) for name, fk in fields.items()})
+        for row in rows
+    ]
+
+def with_trip_summaries(db: Session, rows: List[Any], **profiles: str) -> List[ProfileView]:
+    """Attach cached trip summaries (with host profiles) and user profiles to request rows"""
+    trips = get_trips(db, (row.trip_id for row in rows))
+    trip_views = {view.id: view for view in with_profiles(db, list(trips.values()), host="host_id")}
+    users = get_users(db, (getattr(row, fk) for row in rows for fk in profiles.values()))
+    return [
+        ProfileView(
+            row,
+            trip=trip_views.get(row.trip_id),
+            **{name: users.get(getattr(row, fk)) for name, fk in profiles.items()}
+        )
+        for row in rows
+    ]
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "users": user_cache.stats(),
+        "trips": trip_cache.stats(),
+        "joined_rows_avoided": dict(_rows_avoided),
+    }
+
+# Invalidation
+#
+# Mapper events fire at flush time, before the writer commits; evicting then
+# would let a concurrent reader cache the old committed row again for a full
+# TTL. Evictions are collected on the session and run after its commit.
+
+_PENDING_EVICTIONS = "pending_evictions"
+
+def on_commit(session: Optional[Session], func: Callable, *args):
+    """Run func(*args) once the session's transaction commits; dropped if it rolls back"""
+    if session is None:
+        func(*args)
+        return
+    session.info.setdefault(_PENDING_EVICTIONS, {})[(func, args)] = None
+
+@event.listens_for(Session, "after_commit")
+def _run_pending_evictions(session):
+    for func, args in session.info.pop(_PENDING_EVICTIONS, {}):
+        func(*args)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_evictions(session):
+    session.info.pop(_PENDING_EVICTIONS, None)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    on_commit(object_session(target), user_cache.pop, target.id)
+
+@event.listens_for(Trip, "after_update")
+@event.listens_for(Trip, "after_delete")
+def _invalidate_trip(mapper, connection, target):
+    on_commit(object_session(target), trip_cache.pop, target.id)
+
+@event.listens_for(TripParticipant, "after_insert")
+@event.listens_for(TripParticipant, "after_delete")
+def _invalidate_trip_participants(mapper, connection, target):
+    # current_participants is maintained by a database trigger
+    on_commit(object_session(target), trip_cache.pop, target.trip_id)
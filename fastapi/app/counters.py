@@ -0,0 +1,231 @@
+from sqlalchemy import event, func, select, and_, text
+from sqlalchemy.orm import Session
+from typing import Dict, List
+import os
+
+from app.models import Trip, TripRequest, TripParticipant, GroupChat, ChatMessage
+from app.cache import trip_cache
+from app.facets import invalidate_facets
+from app.dashboard import invalidate_trip_dashboards
+
+COUNTER_RECONCILE_INTERVAL_SECONDS = float(os.getenv("COUNTER_RECONCILE_INTERVAL_SECONDS", "3600"))
+COUNTER_RECONCILE_BATCH_SIZE = int(os.getenv("COUNTER_RECONCILE_BATCH_SIZE", "1000"))
+
+# Counters are maintained by triggers so every write path (ORM, bulk Core
+# statements, the Node.js backend) keeps them current. The statements are
+# idempotent, so they can be re-run on databases that already have them.
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION update_trip_participants_count()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE trips SET current_participants = current_participants + 1 WHERE id = NEW.trip_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE trips SET current_participants = current_participants - 1 WHERE id = OLD.trip_id;
+        END IF;
+        RETURN COALESCE(NEW, OLD);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS update_participants_count_insert ON trip_participants",
+    """
+    CREATE TRIGGER update_participants_count_insert
+        AFTER INSERT ON trip_participants
+        FOR EACH ROW EXECUTE FUNCTION update_trip_participants_count()
+    """,
+    "DROP TRIGGER IF EXISTS update_participants_count_delete ON trip_participants",
+    """
+    CREATE TRIGGER update_participants_count_delete
+        AFTER DELETE ON trip_participants
+        FOR EACH ROW EXECUTE FUNCTION update_trip_participants_count()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION update_trip_pending_requests()
+    RETURNS TRIGGER AS $$
+    DECLARE
+        delta INTEGER := 0;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'pending' THEN
+            delta := delta - 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'pending' THEN
+            delta := delta + 1;
+        END IF;
+        IF delta <> 0 THEN
+            UPDATE trips SET pending_requests = pending_requests + delta
+            WHERE id = COALESCE(NEW.trip_id, OLD.trip_id);
+        END IF;
+        RETURN COALESCE(NEW, OLD);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS update_pending_requests_count ON trip_requests",
+    """
+    CREATE TRIGGER update_pending_requests_count
+        AFTER INSERT OR DELETE OR UPDATE OF status ON trip_requests
+        FOR EACH ROW EXECUTE FUNCTION update_trip_pending_requests()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION update_chat_message_count()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE group_chats
+            SET message_count = message_count + 1,
+                last_message_id = GREATEST(COALESCE(last_message_id, 0), NEW.id)
+            WHERE id = NEW.chat_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE group_chats
+            SET message_count = message_count - 1,
+                last_message_id = (SELECT MAX(id) FROM chat_messages WHERE chat_id = OLD.chat_id)
+            WHERE id = OLD.chat_id;
+        END IF;
+        RETURN COALESCE(NEW, OLD);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS update_message_count ON chat_messages",
+    """
+    CREATE TRIGGER update_message_count
+        AFTER INSERT OR DELETE ON chat_messages
+        FOR EACH ROW EXECUTE FUNCTION update_chat_message_count()
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS update_participants_count_insert
+    AFTER INSERT ON trip_participants
+    BEGIN
+        UPDATE trips SET current_participants = current_participants + 1 WHERE id = NEW.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_participants_count_delete
+    AFTER DELETE ON trip_participants
+    BEGIN
+        UPDATE trips SET current_participants = current_participants - 1 WHERE id = OLD.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_pending_requests_insert
+    AFTER INSERT ON trip_requests WHEN NEW.status = 'pending'
+    BEGIN
+        UPDATE trips SET pending_requests = pending_requests + 1 WHERE id = NEW.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_pending_requests_delete
+    AFTER DELETE ON trip_requests WHEN OLD.status = 'pending'
+    BEGIN
+        UPDATE trips SET pending_requests = pending_requests - 1 WHERE id = OLD.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_pending_requests_update
+    AFTER UPDATE OF status ON trip_requests
+    WHEN (OLD.status = 'pending') <> (NEW.status = 'pending')
+    BEGIN
+        UPDATE trips
+        SET pending_requests = pending_requests + (NEW.status = 'pending') - (OLD.status = 'pending')
+        WHERE id = NEW.trip_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_message_count_insert
+    AFTER INSERT ON chat_messages
+    BEGIN
+        UPDATE group_chats
+        SET message_count = message_count + 1,
+            last_message_id = MAX(COALESCE(last_message_id, 0), NEW.id)
+        WHERE id = NEW.chat_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS update_message_count_delete
+    AFTER DELETE ON chat_messages
+    BEGIN
+        UPDATE group_chats
+        SET message_count = message_count - 1,
+            last_message_id = (SELECT MAX(id) FROM chat_messages WHERE chat_id = OLD.chat_id)
+        WHERE id = OLD.chat_id;
+    END
+    """,
+]
+
+COUNTER_TRIGGERS = {
+    "postgresql": POSTGRES_TRIGGERS,
+    "sqlite": SQLITE_TRIGGERS,
+}
+
+def install_counter_triggers(connection):
+    """Create (or replace) the counter triggers for the connection's dialect"""
+    for statement in COUNTER_TRIGGERS.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+# Tables created by create_all get their triggers once the last table they touch exists
+@event.listens_for(ChatMessage.__table__, "after_create")
+def _install_on_create(target, connection, **kw):
+    install_counter_triggers(connection)
+
+def _reconcile(db: Session, model, column, actual) -> List[int]:
+    """Set column to its true value on rows where it drifted, returning their ids"""
+    fixed: List[int] = []
+    while True:
+        ids = [
+            row[0] for row in db.query(model.id).filter(
+                column.is_distinct_from(actual)
+            ).order_by(model.id).limit(COUNTER_RECONCILE_BATCH_SIZE)
+        ]
+        if not ids:
+            return fixed
+        db.query(model).filter(model.id.in_(ids)).update(
+            {column: actual}, synchronize_session=False
+        )
+        db.commit()
+        fixed.extend(ids)
+        if len(ids) < COUNTER_RECONCILE_BATCH_SIZE:
+            return fixed
+
+def reconcile_counters(db: Session) -> Dict[str, int]:
+    """Recompute denormalized counters that drifted from the rows they count.
+
+    Triggers keep them current, so drift only comes from writes made while
+    they were missing (databases set up before the counters existed,
+    manual fixes); rows are recounted in batches and only changed ones
+    are written.
+    """
+    participants = select(func.count(TripParticipant.id)).where(
+        TripParticipant.trip_id == Trip.id
+    ).scalar_subquery()
+    pending = select(func.count(TripRequest.id)).where(
+        and_(TripRequest.trip_id == Trip.id, TripRequest.status == "pending")
+    ).scalar_subquery()
+    messages = select(func.count(ChatMessage.id)).where(
+        ChatMessage.chat_id == GroupChat.id
+    ).scalar_subquery()
+    last_message = select(func.max(ChatMessage.id)).where(
+        ChatMessage.chat_id == GroupChat.id
+    ).scalar_subquery()
+
+    participant_trips = _reconcile(db, Trip, Trip.current_participants, participants)
+    pending_trips = _reconcile(db, Trip, Trip.pending_requests, pending)
+    message_chats = _reconcile(db, GroupChat, GroupChat.message_count, messages)
+    last_message_chats = _reconcile(db, GroupChat, GroupChat.last_message_id, last_message)
+
+    # Bulk updates bypass the ORM events that normally evict cached copies
+    trip_ids = set(participant_trips) | set(pending_trips)
+    if trip_ids:
+        for trip_id in trip_ids:
+            trip_cache.pop(trip_id)
+        invalidate_facets()
+        invalidate_trip_dashboards(trip_ids)
+
+    return {
+        "current_participants_fixed": len(participant_trips),
+        "pending_requests_fixed": len(pending_trips),
+        "message_count_fixed": len(message_chats),
+        "last_message_id_fixed": len(last_message_chats),
+    }
@@ -0,0 +1,174 @@
+from sqlalchemy import event, func, case, and_
+from sqlalchemy.orm import Session, object_session
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+import itertools
+import os
+import threading
+
+from app.models import Trip, TripRequest, TripParticipant
+from app.cache import LRUCache, get_users, on_commit
+
+# Pending requests listed per trip, newest first
+DASHBOARD_LATEST_PENDING = int(os.getenv("DASHBOARD_LATEST_PENDING", "5"))
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+
+dashboard_cache = LRUCache(
+    maxsize=int(os.getenv("DASHBOARD_CACHE_SIZE", "1000")),
+    ttl=DASHBOARD_CACHE_TTL_SECONDS
+)
+
+# Bumped on every eviction of a host's dashboard, so a dashboard computed
+# before a write that committed meanwhile is not cached. Only the most
+# recently bumped hosts are kept; the others read as the highest generation
+# dropped, which can only skip caching, never cache a stale dashboard.
+# Trip writes whose host is not known bump the unmapped generation instead.
+_generation = itertools.count(1)
+_host_generations: "OrderedDict[int, int]" = OrderedDict()
+_dropped_generation = 0
+_unmapped_generation = 0
+_generations_lock = threading.Lock()
+
+# Host of every trip appearing in a cached dashboard, so request and
+# participant writes (which only know the trip) can find the entry to evict.
+# Entries expire with the dashboards they were recorded for.
+_trip_hosts = LRUCache(
+    maxsize=int(os.getenv("DASHBOARD_TRIP_HOSTS_SIZE", "100000")),
+    ttl=DASHBOARD_CACHE_TTL_SECONDS
+)
+
+def _count(status: str):
+    return func.coalesce(func.sum(case((TripRequest.status == status, 1), else_=0)), 0)
+
+def compute_host_dashboard(db: Session, host_id: int) -> Dict[str, Any]:
+    """Hosted trips with request counts, occupancy and latest pending requests.
+
+    One query aggregates answered request counts per trip with a grouped
+    outer join (pending ones are a trigger-maintained counter), a second
+    picks the newest pending requests of every hosted trip with a window
+    function.
+    """
+    trips = db.query(
+        Trip.id, Trip.title, Trip.destination, Trip.start_date, Trip.end_date, Trip.status,
+        Trip.open_slots, Trip.current_participants, Trip.pending_requests,
+        _count("accepted").label("accepted_requests"),
+        _count("rejected").label("rejected_requests"),
+    ).outerjoin(
+        TripRequest, and_(TripRequest.trip_id == Trip.id, TripRequest.status != "pending")
+    ).filter(
+        Trip.host_id == host_id
+    ).group_by(Trip.id).order_by(Trip.start_date.desc(), Trip.id.desc()).all()
+
+    position = func.row_number().over(
+        partition_by=TripRequest.trip_id,
+        order_by=(TripRequest.created_at.desc(), TripRequest.id.desc())
+    ).label("position")
+    newest = db.query(
+        TripRequest.id, TripRequest.trip_id, TripRequest.user_id, TripRequest.message,
+        TripRequest.created_at, position
+    ).join(Trip, Trip.id == TripRequest.trip_id).filter(
+        and_(Trip.host_id == host_id, TripRequest.status == "pending")
+    ).subquery()
+    pending = db.query(newest).filter(newest.c.position <= DASHBOARD_LATEST_PENDING).order_by(
+        newest.c.trip_id, newest.c.position
+    ).all()
+
+    latest: Dict[int, List[Dict[str, Any]]] = {}
+    for row in pending:
+        latest.setdefault(row.trip_id, []).append({
+            "id": row.id,
+            "user_id": row.user_id,
+            "message": row.message,
+            "created_at": row.created_at,
+        })
+
+    results = []
+    for row in trips:
+        trip = row._asdict()
+        trip["occupancy"] = round(trip["current_participants"] / trip["open_slots"], 4) if trip["open_slots"] else 0.0
+        trip["latest_pending"] = latest.get(trip["id"], [])
+        results.append(trip)
+
+    return {
+        "trips": results,
+        "total_trips": len(results),
+        "total_pending_requests": sum(trip["pending_requests"] for trip in results),
+        "total_participants": sum(trip["current_participants"] for trip in results),
+    }
+
+def _generations(host_id: int) -> Tuple[int, int]:
+    return _host_generations.get(host_id, _dropped_generation), _unmapped_generation
+
+def get_host_dashboard(db: Session, host_id: int) -> Dict[str, Any]:
+    """Cached compute_host_dashboard with requester profiles attached"""
+    dashboard = dashboard_cache.get(host_id)
+    if dashboard is None:
+        with _generations_lock:
+            generations = _generations(host_id)
+        dashboard = compute_host_dashboard(db, host_id)
+        for trip in dashboard["trips"]:
+            _trip_hosts.set(trip["id"], host_id)
+        with _generations_lock:
+            if _generations(host_id) == generations:
+                dashboard_cache.set(host_id, dashboard)
+
+    # Profiles come from the entity cache, as old as they may be in any other response
+    users = get_users(db, (
+        request["user_id"] for trip in dashboard["trips"] for request in trip["latest_pending"]
+    ))
+    return {
+        **dashboard,
+        "trips": [
+            {
+                **trip,
+                "latest_pending": [
+                    {**request, "user": users.get(request["user_id"])} for request in trip["latest_pending"]
+                ],
+            }
+            for trip in dashboard["trips"]
+        ],
+    }
+
+def invalidate_host_dashboard(host_id: int):
+    global _dropped_generation
+    with _generations_lock:
+        _host_generations[host_id] = next(_generation)
+        _host_generations.move_to_end(host_id)
+        while len(_host_generations) > dashboard_cache.maxsize:
+            _dropped_generation = max(_dropped_generation, _host_generations.popitem(last=False)[1])
+    dashboard_cache.pop(host_id)
+
+def invalidate_trip_dashboards(trip_ids: Iterable[int]):
+    """Evict the dashboards showing any of the given trips"""
+    global _unmapped_generation
+    hosts = {_trip_hosts.get(trip_id) for trip_id in trip_ids}
+    if None in hosts:
+        # A dashboard being computed may show the trip before it is mapped
+        with _generations_lock:
+            _unmapped_generation = next(_generation)
+    for host_id in hosts - {None}:
+        invalidate_host_dashboard(host_id)
+
+def _forget_trip(trip_id: int):
+    _trip_hosts.pop(trip_id)
+
+@event.listens_for(Trip, "after_insert")
+@event.listens_for(Trip, "after_update")
+@event.listens_for(Trip, "after_delete")
+def _invalidate_on_trip_write(mapper, connection, target):
+    session = object_session(target)
+    on_commit(session, invalidate_host_dashboard, target.host_id)
+    on_commit(session, invalidate_trip_dashboards, (target.id,))
+
+@event.listens_for(Trip, "after_delete")
+def _forget_on_trip_delete(mapper, connection, target):
+    on_commit(object_session(target), _forget_trip, target.id)
+
+@event.listens_for(TripRequest, "after_insert")
+@event.listens_for(TripRequest, "after_update")
+@event.listens_for(TripRequest, "after_delete")
+@event.listens_for(TripParticipant, "after_insert")
+@event.listens_for(TripParticipant, "after_delete")
+def _invalidate_on_request_write(mapper, connection, target):
+    on_commit(object_session(target), invalidate_trip_dashboards, (target.trip_id,))
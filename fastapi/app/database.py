@@ -1,19 +1,35 @@
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Executions of a statement after which psycopg (v3) prepares it on the server; "off" disables.
+# Other drivers, psycopg2 included, have no server-side prepared statements.
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "5")
+
+def _connect_args(url: str) -> dict:
+    if make_url(url).get_driver_name() != "psycopg":
+        return {}
+    if DB_PREPARE_THRESHOLD.lower() == "off":
+        return {"prepare_threshold": None}
+    return {"prepare_threshold": int(DB_PREPARE_THRESHOLD)}
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, connect_args=_connect_args(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Set on sub-requests of POST /api/v1/batch so they share the batch's session (see app/batch.py)
+BATCH_DB_SCOPE_KEY = "tripnect.batch.db"
+
 # Dependency to get database session
-def get_db():
+def get_db(request: Request):
+    shared = request.scope.get(BATCH_DB_SCOPE_KEY)
+    if shared is not None:
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
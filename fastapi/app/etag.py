@@ -0,0 +1,88 @@
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, or_
+from typing import Optional
+import hashlib
+
+from app.models import Trip, TripParticipant, User
+from app.filters import TripFeedFilters
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """Build an ETag header value from the given version parts"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the If-None-Match header against an ETag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the current ETag"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+def _participants_version(trip_id):
+    """Scalar subqueries describing the participant list of a trip"""
+    count = select(func.count(TripParticipant.id)).where(
+        TripParticipant.trip_id == trip_id
+    ).scalar_subquery()
+    last_joined = select(func.max(TripParticipant.joined_at)).where(
+        TripParticipant.trip_id == trip_id
+    ).scalar_subquery()
+    max_id = select(func.max(TripParticipant.id)).where(
+        TripParticipant.trip_id == trip_id
+    ).scalar_subquery()
+    users_updated = select(func.max(User.updated_at)).join(
+        TripParticipant, TripParticipant.user_id == User.id
+    ).where(TripParticipant.trip_id == trip_id).scalar_subquery()
+    return count, last_joined, max_id, users_updated
+
+def trip_etag(db: Session, trip_id: int) -> Optional[str]:
+    """Strong ETag for the trip detail payload, or None if the trip does not exist"""
+    profiles_updated = select(func.max(User.updated_at)).where(
+        or_(User.id == Trip.host_id, User.id == Trip.user_id)
+    ).correlate(Trip).scalar_subquery()
+
+    row = db.query(
+        Trip.updated_at,
+        Trip.status,
+        Trip.current_participants,
+        Trip.open_slots,
+        profiles_updated,
+        *_participants_version(trip_id)
+    ).filter(Trip.id == trip_id).first()
+
+    if row is None:
+        return None
+    return make_etag("trip", trip_id, *row)
+
+def participants_etag(db: Session, trip_id: int) -> Optional[str]:
+    """Strong ETag for the participant list of a trip, or None if the trip does not exist"""
+    row = db.query(Trip.id, *_participants_version(trip_id)).filter(Trip.id == trip_id).first()
+
+    if row is None:
+        return None
+    return make_etag("participants", *row)
+
+def feed_etag(db: Session, filters: TripFeedFilters, page: int, per_page: int) -> str:
+    """Weak ETag for a feed page, derived from the version of its filter set"""
+    version = filters.apply(db.query(
+        func.count(Trip.id),
+        func.max(Trip.id),
+        func.max(Trip.updated_at),
+        func.sum(Trip.current_participants)
+    )).one()
+
+    return make_etag("feed", filters.cache_key(), page, per_page, *version, weak=True)
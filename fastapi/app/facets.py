@@ -0,0 +1,107 @@
+from sqlalchemy import event, func, case
+from sqlalchemy.orm import Session, object_session
+from typing import Any, Dict
+import itertools
+import os
+
+from app.database import engine
+from app.models import Trip, TripParticipant
+from app.filters import TripFeedFilters
+from app.cache import LRUCache, on_commit
+
+# Upper bounds (inclusive) of the budget buckets, in rupees
+BUDGET_BUCKETS = [
+    (5000, "under_5k"),
+    (15000, "5k_15k"),
+    (30000, "15k_30k"),
+    (60000, "30k_60k"),
+]
+BUDGET_BUCKET_TOP = "60k_plus"
+BUDGET_BUCKET_UNKNOWN = "unknown"
+
+MAX_DESTINATION_FACETS = 50
+
+facet_cache = LRUCache(
+    maxsize=int(os.getenv("FACET_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("FACET_CACHE_TTL_SECONDS", "30"))
+)
+
+# Bumped on every trip write so cached facets of older generations are never served
+_generation = itertools.count()
+_current_generation = next(_generation)
+
+def _start_month():
+    if engine.dialect.name == "postgresql":
+        return func.to_char(Trip.start_date, "YYYY-MM")
+    return func.strftime("%Y-%m", Trip.start_date)
+
+def _budget_bucket():
+    budget = func.coalesce(Trip.budget_max, Trip.budget_min)
+    return case(
+        (budget.is_(None), BUDGET_BUCKET_UNKNOWN),
+        *[(budget <= bound, label) for bound, label in BUDGET_BUCKETS],
+        else_=BUDGET_BUCKET_TOP
+    )
+
+def compute_facets(db: Session, filters: TripFeedFilters) -> Dict[str, Any]:
+    """Facet counts for the trips matching the filters, from a single scan.
+
+    Trips are grouped once by every facet dimension together and the
+    per-facet counts are rolled up from those groups.
+    """
+    month = _start_month().label("month")
+    bucket = _budget_bucket().label("budget_bucket")
+    has_slots = case((Trip.current_participants < Trip.open_slots, 1), else_=0).label("has_slots")
+
+    rows = filters.apply(db.query(
+        Trip.destination, month, bucket, has_slots, func.count(Trip.id)
+    )).group_by(Trip.destination, month, bucket, has_slots).all()
+
+    total = 0
+    destinations: Dict[str, int] = {}
+    months: Dict[str, int] = {}
+    buckets: Dict[str, int] = {}
+    open_slots = 0
+    for destination, start_month, budget_bucket, slots, count in rows:
+        total += count
+        destinations[destination] = destinations.get(destination, 0) + count
+        months[start_month] = months.get(start_month, 0) + count
+        buckets[budget_bucket] = buckets.get(budget_bucket, 0) + count
+        open_slots += count if slots else 0
+
+    bucket_order = [label for _, label in BUDGET_BUCKETS] + [BUDGET_BUCKET_TOP, BUDGET_BUCKET_UNKNOWN]
+    return {
+        "total": total,
+        "destinations": [
+            {"value": value, "count": count}
+            for value, count in sorted(destinations.items(), key=lambda item: (-item[1], item[0]))
+        ][:MAX_DESTINATION_FACETS],
+        "start_months": [
+            {"value": value, "count": count} for value, count in sorted(months.items())
+        ],
+        "budget_buckets": [
+            {"value": label, "count": buckets[label]} for label in bucket_order if label in buckets
+        ],
+        "has_open_slots": open_slots,
+    }
+
+def get_facets(db: Session, filters: TripFeedFilters) -> Dict[str, Any]:
+    """Cached compute_facets, keyed by the normalized filter set"""
+    key = (_current_generation, filters.cache_key())
+    facets = facet_cache.get(key)
+    if facets is None:
+        facets = compute_facets(db, filters)
+        facet_cache.set(key, facets)
+    return facets
+
+def invalidate_facets():
+    global _current_generation
+    _current_generation = next(_generation)
+
+@event.listens_for(Trip, "after_insert")
+@event.listens_for(Trip, "after_update")
+@event.listens_for(Trip, "after_delete")
+@event.listens_for(TripParticipant, "after_insert")
+@event.listens_for(TripParticipant, "after_delete")
+def _invalidate_on_write(mapper, connection, target):
+    on_commit(object_session(target), invalidate_facets)
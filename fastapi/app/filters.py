@@ -0,0 +1,127 @@
+from fastapi import Query, HTTPException
+from sqlalchemy import or_
+from typing import Optional, Dict, Any, List
+from datetime import date
+import hashlib
+import json
+
+from app.models import Trip
+from app.preferences import parse_preference_filter, filter_by_tags, filter_by_preferences
+from app.ranges import filter_by_date_overlap, filter_by_budget_overlap
+from app.geo import parse_near, within_radius
+from app.utils import normalize_tag
+
+class TripFeedFilters:
+    """Query parameters shared by every endpoint that filters the trip feed"""
+    def __init__(
+        self,
+        destination: Optional[str] = Query(None),
+        start_date_from: Optional[date] = Query(None),
+        start_date_to: Optional[date] = Query(None),
+        budget_min: Optional[float] = Query(None),
+        budget_max: Optional[float] = Query(None),
+        available_slots_only: bool = Query(False),
+        tags_all: Optional[List[str]] = Query(None, description="Trips having every one of these tags"),
+        tags_any: Optional[List[str]] = Query(None, description="Trips having at least one of these tags"),
+        pref: Optional[List[str]] = Query(None, description="Preference matches as key=value"),
+        travel_from: Optional[date] = Query(None, description="Trips overlapping a travel window starting on this date"),
+        travel_to: Optional[date] = Query(None, description="Trips overlapping a travel window ending on this date"),
+        budget_range_min: Optional[float] = Query(None, description="Trips whose budget range overlaps this minimum"),
+        budget_range_max: Optional[float] = Query(None, description="Trips whose budget range overlaps this maximum"),
+        near: Optional[str] = Query(None, description="Centre of a radius search, as lat,lon or a place name"),
+        radius_km: float = Query(50, gt=0, le=500),
+    ):
+        self.destination = destination
+        self.start_date_from = start_date_from
+        self.start_date_to = start_date_to
+        self.budget_min = budget_min
+        self.budget_max = budget_max
+        self.available_slots_only = available_slots_only
+        self.tags_all = tags_all
+        self.tags_any = tags_any
+        self.pref = pref
+        self.travel_from = travel_from
+        self.travel_to = travel_to
+        self.budget_range_min = budget_range_min
+        self.budget_range_max = budget_range_max
+        self.near = near
+        self.radius_km = radius_km
+        
+        # An inverted window is not an empty range on PostgreSQL but an error
+        if travel_from and travel_to and travel_from > travel_to:
+            raise HTTPException(status_code=400, detail="travel_from must not be after travel_to")
+        if budget_range_min is not None and budget_range_max is not None and budget_range_min > budget_range_max:
+            raise HTTPException(status_code=400, detail="budget_range_min must not be greater than budget_range_max")
+        
+        try:
+            self.preference_matches = [parse_preference_filter(value) for value in pref or []]
+            self.near_point = parse_near(near) if near else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def apply(self, query, active_only: bool = True):
+        """Apply the filters to a query or select() selecting from Trip.
+
+        The feed only shows active trips; active_only=False leaves the status
+        to the caller. Radius searches (near) only ever match active trips.
+        """
+        if active_only:
+            query = query.filter(Trip.status == "active")
+
+        if self.destination:
+            query = query.filter(Trip.destination.ilike(f"%{self.destination}%"))
+
+        if self.start_date_from:
+            query = query.filter(Trip.start_date >= self.start_date_from)
+
+        if self.start_date_to:
+            query = query.filter(Trip.start_date <= self.start_date_to)
+
+        if self.budget_min is not None:
+            query = query.filter(
+                or_(Trip.budget_min.is_(None), Trip.budget_min >= self.budget_min)
+            )
+
+        if self.budget_max is not None:
+            query = query.filter(
+                or_(Trip.budget_max.is_(None), Trip.budget_max <= self.budget_max)
+            )
+
+        if self.available_slots_only:
+            query = query.filter(Trip.current_participants < Trip.open_slots)
+
+        query = filter_by_tags(query, tags_all=self.tags_all, tags_any=self.tags_any)
+        query = filter_by_preferences(query, self.preference_matches)
+        query = filter_by_date_overlap(query, self.travel_from, self.travel_to)
+        query = filter_by_budget_overlap(query, self.budget_range_min, self.budget_range_max)
+
+        if self.near_point:
+            query = query.filter(Trip.status == "active", within_radius(*self.near_point, self.radius_km))
+
+        return query
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Filters that are actually set, normalized for use in keys"""
+        values = {
+            "destination": self.destination.strip().lower() if self.destination else None,
+            "start_date_from": self.start_date_from,
+            "start_date_to": self.start_date_to,
+            "budget_min": self.budget_min,
+            "budget_max": self.budget_max,
+            "available_slots_only": self.available_slots_only or None,
+            "tags_all": sorted({normalize_tag(tag) for tag in self.tags_all}) if self.tags_all else None,
+            "tags_any": sorted({normalize_tag(tag) for tag in self.tags_any}) if self.tags_any else None,
+            "pref": sorted(self.pref) if self.pref else None,
+            "travel_from": self.travel_from,
+            "travel_to": self.travel_to,
+            "budget_range_min": self.budget_range_min,
+            "budget_range_max": self.budget_range_max,
+            "near": [round(value, 4) for value in self.near_point] if self.near_point else None,
+            "radius_km": self.radius_km if self.near_point else None,
+        }
+        return {key: value for key, value in values.items() if value is not None}
+
+    def cache_key(self) -> str:
+        """Stable key identifying this filter set"""
+        payload = json.dumps(self.as_dict(), sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
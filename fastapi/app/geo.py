@@ -0,0 +1,137 @@
+from functools import lru_cache
+from pathlib import Path
+from sqlalchemy import event, inspect, func, and_
+from typing import Dict, List, Optional, Tuple
+import csv
+import math
+import re
+
+import numpy as np
+
+from app.database import engine
+from app.models import Trip
+
+GAZETTEER_PATH = Path(__file__).parent / "data" / "gazetteer_in.csv"
+EARTH_RADIUS_KM = 6371.0088
+
+def normalize_place(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", text.lower()).split())
+
+class Gazetteer:
+    """Bundled offline gazetteer of Indian places, backed by coordinate arrays"""
+    def __init__(self, path: Path = GAZETTEER_PATH):
+        names: List[str] = []
+        latitudes: List[float] = []
+        longitudes: List[float] = []
+        self._index: Dict[str, int] = {}
+
+        with open(path, newline="", encoding="utf-8") as f:
+            for position, row in enumerate(csv.DictReader(f)):
+                names.append(row["name"])
+                latitudes.append(float(row["latitude"]))
+                longitudes.append(float(row["longitude"]))
+                aliases = [alias for alias in (row.get("aliases") or "").split("|") if alias]
+                for name in [row["name"]] + aliases:
+                    self._index.setdefault(normalize_place(name), position)
+
+        self.names = names
+        self.latitudes = np.array(latitudes, dtype=np.float64)
+        self.longitudes = np.array(longitudes, dtype=np.float64)
+        self._max_words = max(len(key.split()) for key in self._index)
+
+    def lookup(self, text: str) -> Optional[Tuple[float, float]]:
+        """Coordinates of a free-text destination, or None if no known place is mentioned.
+
+        Tries the whole text, then each comma separated part ("Manali, Himachal"),
+        then the longest known place name appearing in it ("Trek to Kasol").
+        """
+        key = normalize_place(text)
+        candidates = [key] + [normalize_place(part) for part in re.split(r"[,/()\-]", text)]
+        for candidate in candidates:
+            if candidate in self._index:
+                return self._coordinates(self._index[candidate])
+
+        words = key.split()
+        for size in range(min(self._max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if phrase in self._index:
+                    return self._coordinates(self._index[phrase])
+        return None
+
+    def _coordinates(self, position: int) -> Tuple[float, float]:
+        return float(self.latitudes[position]), float(self.longitudes[position])
+
+@lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    return Gazetteer()
+
+def geocode(destination: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not destination:
+        return None
+    return get_gazetteer().lookup(destination)
+
+def parse_near(value: str) -> Tuple[float, float]:
+    """Parse `lat,lon` or a place name into coordinates, raising ValueError if unknown"""
+    parts = value.split(",")
+    if len(parts) == 2:
+        try:
+            latitude, longitude = float(parts[0]), float(parts[1])
+        except ValueError:
+            pass
+        else:
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError("Coordinates out of range")
+            return latitude, longitude
+
+    coordinates = geocode(value)
+    if coordinates is None:
+        raise ValueError(f"Unknown place '{value}'")
+    return coordinates
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    lon_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+def within_radius(latitude: float, longitude: float, radius_km: float):
+    """SQL condition matching trips whose destination is within radius_km of the point.
+
+    The bounding box lets the (latitude, longitude) index narrow the rows;
+    the haversine comparison, using only sin and cos, then runs on those
+    within the caller's query.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    half_degree = math.pi / 360
+    sin_dlat = func.sin((Trip.latitude - latitude) * half_degree)
+    sin_dlon = func.sin((Trip.longitude - longitude) * half_degree)
+    haversine = sin_dlat * sin_dlat + math.cos(math.radians(latitude)) * func.cos(
+        Trip.latitude * (2 * half_degree)
+    ) * sin_dlon * sin_dlon
+    return and_(
+        Trip.latitude.between(min_lat, max_lat),
+        Trip.longitude.between(min_lon, max_lon),
+        haversine <= math.sin(radius_km / (2 * EARTH_RADIUS_KM)) ** 2
+    )
+
+@event.listens_for(engine, "connect")
+def _sqlite_math_functions(dbapi_connection, connection_record):
+    # SQLite only has sin/cos when built with its math functions
+    if engine.dialect.name != "sqlite":
+        return
+    try:
+        dbapi_connection.execute("SELECT sin(0), cos(0)")
+    except Exception:
+        dbapi_connection.create_function("sin", 1, math.sin, deterministic=True)
+        dbapi_connection.create_function("cos", 1, math.cos, deterministic=True)
+
+@event.listens_for(Trip, "before_insert")
+@event.listens_for(Trip, "before_update")
+def _geocode_destination(mapper, connection, target):
+    state = inspect(target)
+    if state.persistent and not state.attrs.destination.history.has_changes():
+        return
+    coordinates = geocode(target.destination)
+    target.latitude, target.longitude = coordinates if coordinates else (None, None)
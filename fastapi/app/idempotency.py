@@ -0,0 +1,294 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import re
+
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+from app.cache import LRUCache
+from app.limits import client_key
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# How long a key's first response is replayed
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a duplicate waits for the in-flight original before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# An in-progress key not completed within this time (its worker died) may be taken over
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", str(1024 * 1024)))
+IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS", "3600"))
+IDEMPOTENCY_CLEANUP_BATCH_SIZE = int(os.getenv("IDEMPOTENCY_CLEANUP_BATCH_SIZE", "1000"))
+
+# POST routes whose responses are stored per key
+IDEMPOTENT_ROUTES = [
+    re.compile(r"^/api/v1/trips/(batch)?$"),
+    re.compile(r"^/api/v1/requests/$"),
+    re.compile(r"^/api/v1/chats/\d+/messages$"),
+]
+
+# Responses that depend on the moment rather than the request are not stored,
+# so a retry runs again: auth failures, rate limiting and load shedding, 5xx
+UNSTORED_STATUSES = {401, 403, 408, 409, 429}
+
+# Replayed as stored, except headers the server sets per response
+_SKIPPED_HEADERS = {b"date", b"server", b"content-length", b"x-profile-id"}
+_POLL_SECONDS = 0.05
+
+# (owner, key) -> completed record, so replays usually skip the database
+idempotency_cache = LRUCache(
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=IDEMPOTENCY_TTL_SECONDS
+)
+# (owner, key) -> future resolved when this worker's original request finishes
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _record(row: IdempotencyKey) -> Dict[str, Any]:
+    return {
+        "fingerprint": row.fingerprint,
+        "status": row.response_status,
+        "headers": row.response_headers or [],
+        "body": row.response_body or b"",
+    }
+
+def claim_key(owner: str, key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Claim a key for execution, or report who has it.
+
+    Returns ("claimed", None) when the caller must run the request,
+    ("completed", record) to replay a stored response, ("in_progress", None)
+    while another worker runs it and ("mismatch", None) when the key was
+    used for a different request. Lookups of existing keys do not write.
+    """
+    db = SessionLocal()
+    try:
+        now = _utcnow()
+        row = db.query(IdempotencyKey).filter(
+            IdempotencyKey.owner == owner,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > now
+        ).first()
+        if row is None:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.owner == owner, IdempotencyKey.key == key
+            ).delete(synchronize_session=False)
+            db.add(IdempotencyKey(
+                owner=owner, key=key, fingerprint=fingerprint, status="in_progress",
+                locked_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            ))
+            try:
+                db.commit()
+                return "claimed", None
+            except IntegrityError:
+                # Another worker claimed it first
+                db.rollback()
+                row = db.query(IdempotencyKey).filter(
+                    IdempotencyKey.owner == owner, IdempotencyKey.key == key
+                ).first()
+                if row is None:
+                    return "in_progress", None
+
+        if row.fingerprint != fingerprint:
+            return "mismatch", None
+        if row.status == "completed":
+            return "completed", _record(row)
+
+        # Take over a claim abandoned by a worker that died mid-request
+        taken = db.query(IdempotencyKey).filter(
+            IdempotencyKey.id == row.id,
+            IdempotencyKey.status == "in_progress",
+            IdempotencyKey.locked_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        ).update({IdempotencyKey.locked_at: now}, synchronize_session=False)
+        db.commit()
+        return ("claimed", None) if taken else ("in_progress", None)
+    finally:
+        db.close()
+
+def complete_key(owner: str, key: str, record: Dict[str, Any]):
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.owner == owner, IdempotencyKey.key == key
+        ).update({
+            IdempotencyKey.status: "completed",
+            IdempotencyKey.response_status: record["status"],
+            IdempotencyKey.response_headers: record["headers"],
+            IdempotencyKey.response_body: record["body"],
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def release_key(owner: str, key: str):
+    """Drop a claim whose request failed, so a retry executes again"""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.owner == owner,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == "in_progress"
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def purge_expired_keys(db: Session) -> Dict[str, int]:
+    """Delete expired keys in batches"""
+    deleted = 0
+    while True:
+        ids = [
+            row[0] for row in db.query(IdempotencyKey.id).filter(
+                IdempotencyKey.expires_at <= _utcnow()
+            ).limit(IDEMPOTENCY_CLEANUP_BATCH_SIZE)
+        ]
+        if not ids:
+            break
+        deleted += db.query(IdempotencyKey).filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    return {"keys_deleted": deleted}
+
+def _fingerprint(scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+class IdempotencyMiddleware:
+    """Replays the stored first response to retries carrying the same Idempotency-Key.
+
+    Applies to authenticated POSTs on IDEMPOTENT_ROUTES. Keys are scoped to
+    the user and checked against a fingerprint of the request, so reusing a
+    key for a different request is a 422. A duplicate arriving while the
+    original runs waits for its result, in this worker through a future and
+    across workers by polling the key's row.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        key = next((value for name, value in scope["headers"] if name == b"idempotency-key"), None)
+        if key is None or not any(route.match(scope["path"]) for route in IDEMPOTENT_ROUTES):
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > 255:
+            return await _error(400, f"{IDEMPOTENCY_HEADER} must be 1 to 255 characters")(scope, receive, send)
+        owner = client_key(scope)
+        if not owner.startswith("user:"):
+            # Unauthenticated; the route itself answers 401
+            return await self.app(scope, receive, send)
+
+        body, more = b"", True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        fingerprint = _fingerprint(scope, body)
+        cache_key = (owner, key)
+
+        while True:
+            record = idempotency_cache.get(cache_key)
+            if record is not None:
+                return await self._replay(record, fingerprint, scope, receive, send)
+            pending = _in_flight.get(cache_key)
+            if pending is None:
+                break
+            try:
+                await asyncio.wait_for(asyncio.shield(pending), IDEMPOTENCY_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                return await self._in_progress(scope, receive, send)
+
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[cache_key] = future
+        try:
+            outcome, record = await self._claim(owner, key, fingerprint)
+            if outcome == "mismatch":
+                return await self._mismatch(scope, receive, send)
+            if outcome == "in_progress":
+                return await self._in_progress(scope, receive, send)
+            if outcome == "completed":
+                idempotency_cache.set(cache_key, record)
+                return await self._replay(record, fingerprint, scope, receive, send)
+            await self._execute(scope, receive, send, body, owner, key, fingerprint)
+        finally:
+            del _in_flight[cache_key]
+            future.set_result(None)
+
+    async def _claim(self, owner: str, key: str, fingerprint: str):
+        """claim_key, polling while another worker holds the key"""
+        deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            outcome, record = await asyncio.to_thread(claim_key, owner, key, fingerprint)
+            if outcome != "in_progress" or asyncio.get_running_loop().time() > deadline:
+                return outcome, record
+            await asyncio.sleep(_POLL_SECONDS)
+
+    async def _execute(self, scope, receive, send, body: bytes, owner: str, key: str, fingerprint: str):
+        response: Dict[str, Any] = {"status": 500, "headers": [], "body": b"", "storable": True}
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", []) if name.lower() not in _SKIPPED_HEADERS
+                ]
+            elif message["type"] == "http.response.body" and response["storable"]:
+                response["body"] += message.get("body", b"")
+                if len(response["body"]) > IDEMPOTENCY_MAX_BODY_BYTES:
+                    response["storable"] = False
+                    response["body"] = b""
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+        except BaseException:
+            await asyncio.to_thread(release_key, owner, key)
+            raise
+
+        status = response["status"]
+        if not response["storable"] or status >= 500 or status in UNSTORED_STATUSES:
+            await asyncio.to_thread(release_key, owner, key)
+            return
+        record = {"fingerprint": fingerprint, "status": status, "headers": response["headers"], "body": response["body"]}
+        await asyncio.to_thread(complete_key, owner, key, record)
+        idempotency_cache.set((owner, key), record)
+
+    async def _replay(self, record: Dict[str, Any], fingerprint: str, scope, receive, send):
+        if record["fingerprint"] != fingerprint:
+            return await self._mismatch(scope, receive, send)
+        headers: List[Tuple[bytes, bytes]] = [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]
+        ]
+        headers += [(b"content-length", str(len(record["body"])).encode()), (b"idempotent-replayed", b"true")]
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": record["body"]})
+
+    async def _mismatch(self, scope, receive, send):
+        await _error(422, f"{IDEMPOTENCY_HEADER} was already used for a different request")(scope, receive, send)
+
+    async def _in_progress(self, scope, receive, send):
+        response = _error(409, f"A request with this {IDEMPOTENCY_HEADER} is still in progress")
+        response.headers["Retry-After"] = "1"
+        await response(scope, receive, send)
@@ -0,0 +1,57 @@
+from datetime import date
+from sqlalchemy.orm import Session
+from typing import Dict
+import os
+
+from app.models import Trip, TripRequest
+from app.cache import trip_cache
+from app.facets import invalidate_facets
+from app.dashboard import invalidate_trip_dashboards
+
+TRIP_LIFECYCLE_INTERVAL_SECONDS = float(os.getenv("TRIP_LIFECYCLE_INTERVAL_SECONDS", "300"))
+TRIP_LIFECYCLE_BATCH_SIZE = int(os.getenv("TRIP_LIFECYCLE_BATCH_SIZE", "500"))
+TRIP_LIFECYCLE_MAX_BATCHES = int(os.getenv("TRIP_LIFECYCLE_MAX_BATCHES", "20"))
+
+def complete_expired_trips(db: Session) -> Dict[str, int]:
+    """Mark active trips whose end date has passed as completed.
+
+    Works in bounded batches, each in its own transaction. Rows are locked
+    with SKIP LOCKED so concurrent updates to a trip are never blocked, and
+    pending join requests of completed trips are rejected.
+    """
+    today = date.today()
+    totals = {"batches": 0, "trips_completed": 0, "requests_closed": 0}
+
+    for _ in range(TRIP_LIFECYCLE_MAX_BATCHES):
+        trip_ids = [
+            row[0] for row in db.query(Trip.id).filter(
+                Trip.status == "active",
+                Trip.end_date < today
+            ).order_by(Trip.id).limit(TRIP_LIFECYCLE_BATCH_SIZE).with_for_update(skip_locked=True)
+        ]
+        if not trip_ids:
+            break
+
+        db.query(Trip).filter(Trip.id.in_(trip_ids)).update(
+            {Trip.status: "completed"}, synchronize_session=False
+        )
+        closed = db.query(TripRequest).filter(
+            TripRequest.trip_id.in_(trip_ids),
+            TripRequest.status == "pending"
+        ).update({TripRequest.status: "rejected"}, synchronize_session=False)
+        db.commit()
+
+        # Bulk updates bypass the ORM events that normally evict snapshots
+        for trip_id in trip_ids:
+            trip_cache.pop(trip_id)
+        invalidate_facets()
+        invalidate_trip_dashboards(trip_ids)
+
+        totals["batches"] += 1
+        totals["trips_completed"] += len(trip_ids)
+        totals["requests_closed"] += closed
+
+        if len(trip_ids) < TRIP_LIFECYCLE_BATCH_SIZE:
+            break
+
+    return totals
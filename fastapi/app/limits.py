@@ -0,0 +1,258 @@
+from collections import deque
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import asyncio
+import math
+import os
+import re
+import time
+
+from app.cache import LRUCache
+
+LOAD_SHEDDING_ENABLED = os.getenv("LOAD_SHEDDING_ENABLED", "True").lower() == "true"
+# Longest a request waits for a slot of its route group before getting a 503
+CONCURRENCY_QUEUE_TIMEOUT_MS = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_MS", "100"))
+# Per-user token bucket: sustained requests per second and burst size
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+
+# Multiplicative decrease applied to a group's limit when it runs slow
+LIMIT_BACKOFF = 0.9
+# A completion this many times slower than the group's unloaded latency counts as slow
+LATENCY_TOLERANCE = 2.0
+# Per-sample upward drift of the unloaded latency estimate, so it follows
+# slow changes such as table growth instead of keeping one lucky minimum
+MIN_LATENCY_DRIFT = 0.001
+
+# (group, methods, path pattern, initial limit, min, max, latency ceiling ms, max queued)
+# matched in order; /health, the docs and the admin API are never shed
+ROUTE_GROUPS: List[Tuple[str, Optional[set], str, int, int, int, float, int]] = [
+    ("feed", {"GET"}, r"^/api/v1/trips/(feed|facets|search/destinations)$", 8, 2, 32, 250, 16),
+    ("my", {"GET"}, r"^/api/v1/(trips|requests|participants|chats)/user/", 8, 2, 32, 200, 16),
+    ("chat_history", {"GET"}, r"^/api/v1/chats/\d+/messages$", 8, 2, 32, 200, 16),
+    ("batch", {"POST"}, r"^/api/v1/batch$", 8, 2, 32, 1000, 16),
+    ("writes", {"POST", "PUT", "PATCH", "DELETE"}, r"^/api/v1/(?!admin/)", 16, 4, 64, 500, 32),
+    ("reads", {"GET"}, r"^/api/v1/(?!admin/)", 16, 4, 64, 200, 32),
+]
+
+class AdaptiveLimit:
+    """Concurrency limit of one route group, adapted from observed latency (AIMD).
+
+    The group's unloaded latency is tracked as a slowly drifting minimum. A
+    completion slower than LATENCY_TOLERANCE times that, or than the
+    `target_ms` ceiling, or failing with a 5xx, cuts the limit by
+    LIMIT_BACKOFF, at most once per slow threshold so one slow burst does
+    not collapse it. Other completions while the limit is in use grow it by
+    1/limit, i.e. by one slot per window of requests. Requests over the limit
+    wait in a short FIFO queue and are rejected when it is full or their
+    wait times out. Only ever used from the event loop thread.
+    """
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int, target_ms: float, max_queue: int):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_ms = target_ms
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.latency_ms: Optional[float] = None
+        self.min_latency_ms: Optional[float] = None
+        self.accepted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self._has_slot() and not self._waiters:
+            self.in_flight += 1
+            self.accepted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted a slot just as the wait ran out
+                self.accepted += 1
+                return True
+            self._waiters.remove(waiter)
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release(None)
+            else:
+                self._waiters.remove(waiter)
+            raise
+        self.accepted += 1
+        return True
+
+    def _wake(self):
+        while self._waiters and self._has_slot():
+            self.in_flight += 1
+            self._waiters.popleft().set_result(None)
+
+    def release(self, latency_ms: Optional[float], failed: bool = False):
+        """Free a slot and adapt the limit; latency None releases without a sample"""
+        at_limit = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+        if latency_ms is not None:
+            self.latency_ms = latency_ms if self.latency_ms is None else 0.9 * self.latency_ms + 0.1 * latency_ms
+            if self.min_latency_ms is None:
+                self.min_latency_ms = latency_ms
+            self.min_latency_ms = min(latency_ms, self.min_latency_ms * (1 + MIN_LATENCY_DRIFT))
+            slow_ms = min(self.target_ms, self.min_latency_ms * LATENCY_TOLERANCE)
+            now = time.monotonic()
+            if failed or latency_ms > slow_ms:
+                if now - self._last_decrease >= slow_ms / 1000:
+                    self.limit = max(self.min_limit, self.limit * LIMIT_BACKOFF)
+                    self._last_decrease = now
+            elif at_limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead would likely have drained"""
+        latency = (self.latency_ms or self.target_ms) / 1000
+        return max(1, math.ceil(latency * (len(self._waiters) + self.in_flight) / max(int(self.limit), 1)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "target_ms": self.target_ms,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "min_latency_ms": round(self.min_latency_ms, 2) if self.min_latency_ms is not None else None,
+            "accepted": self.accepted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+class TokenBucketLimiter:
+    """Per-client token buckets, kept in an LRU so idle clients are forgotten"""
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        # An idle bucket is full again after burst / rate seconds, so it can be dropped then
+        self._buckets = LRUCache(maxsize=max_clients, ttl=burst / rate if rate > 0 else None)
+        self.limited = 0
+
+    def take(self, key) -> float:
+        """Spend a token; returns 0 when allowed, else the seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        bucket = self._buckets.get(key) or [self.burst, now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        # Re-set to push back the expiry of buckets still in use
+        self._buckets.set(key, bucket)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        self.limited += 1
+        return (1 - bucket[0]) / self.rate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "clients": self._buckets.stats()["size"],
+            "limited": self.limited,
+        }
+
+route_groups = [
+    (AdaptiveLimit(name, initial, min_limit, max_limit, target_ms, max_queue), methods, re.compile(pattern))
+    for name, methods, pattern, initial, min_limit, max_limit, target_ms, max_queue in ROUTE_GROUPS
+]
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS)
+
+# Verified bearer token -> user id, so each token is only decoded once
+_token_users = LRUCache(maxsize=10000, ttl=300)
+
+def route_group(method: str, path: str) -> Optional[AdaptiveLimit]:
+    for limit, methods, pattern in route_groups:
+        if method in methods and pattern.match(path):
+            return limit
+    return None
+
+def client_key(scope) -> str:
+    """The authenticated user, else the client address"""
+    for key, value in scope["headers"]:
+        if key == b"authorization":
+            token = value.decode("latin-1").partition(" ")[2]
+            user_id = _token_users.get(token)
+            if user_id is None:
+                try:
+                    payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM", "HS256")])
+                    user_id = f"user:{payload.get('sub')}"
+                except JWTError:
+                    break
+                _token_users.set(token, user_id)
+            return user_id
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+def limit_stats() -> Dict[str, Any]:
+    return {
+        "enabled": LOAD_SHEDDING_ENABLED,
+        "queue_timeout_ms": CONCURRENCY_QUEUE_TIMEOUT_MS,
+        "groups": {limit.name: limit.stats() for limit, _, _ in route_groups},
+        "rate_limit": rate_limiter.stats(),
+    }
+
+class LoadSheddingMiddleware:
+    """Per-user rate limits and per-route-group adaptive concurrency limits.
+
+    Over the rate limit a request gets a 429, over its group's limit (once
+    the short queue is full or its wait times out) a 503; both carry
+    Retry-After and are answered without touching the app or the database.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not LOAD_SHEDDING_ENABLED or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+
+        wait = rate_limiter.take(client_key(scope))
+        if wait:
+            return await self._reject(scope, receive, send, 429, math.ceil(wait), "Rate limit exceeded")
+
+        group = route_group(scope["method"], scope["path"])
+        if group is None:
+            return await self.app(scope, receive, send)
+        if not await group.acquire(CONCURRENCY_QUEUE_TIMEOUT_MS / 1000):
+            return await self._reject(scope, receive, send, 503, group.retry_after(), "Server is busy, retry later")
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            group.release((time.perf_counter() - started) * 1000, failed=status["code"] >= 500)
+
+    async def _reject(self, scope, receive, send, status_code: int, retry_after: int, detail: str):
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": str(retry_after)})
+        await response(scope, receive, send)
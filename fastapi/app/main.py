@@ -1,20 +1,83 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
-from dotenv import load_dotenv
 
-from app.database import engine, Base
-from app.routers import trips, requests, participants, chats
+from app.startup import startup_report
+from app.database import engine
+from app.routers import trips, requests, participants, chats, admin, exports, batch, activity
+from app.scheduler import scheduler, PeriodicJob
+from app.lifecycle import complete_expired_trips, TRIP_LIFECYCLE_INTERVAL_SECONDS
+from app.similarity import (
+    rebuild_neighbors, refresh_queued_neighbors, SIMILAR_TRIPS_REBUILD_INTERVAL_SECONDS,
+    SIMILAR_TRIPS_REFRESH_INTERVAL_SECONDS
+)
+from app.counters import reconcile_counters, COUNTER_RECONCILE_INTERVAL_SECONDS
+from app.profiling import ProfilingMiddleware
+from app.limits import LoadSheddingMiddleware
+from app.idempotency import IdempotencyMiddleware, purge_expired_keys, IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS
+from app.activity import compact_activity, ACTIVITY_RETENTION_INTERVAL_SECONDS
+from app.outbox import outbox_worker, purge_processed_events, OUTBOX_CLEANUP_INTERVAL_SECONDS
+from app.warmup import connect_pool, prime_caches, WARMUP_ENABLED
+
+# Logged through uvicorn's logger so the startup report reaches the server log
+logger = logging.getLogger("uvicorn.error")
 
-# Load environment variables
-load_dotenv()
+# Background jobs
+scheduler.register(PeriodicJob(
+    "trip_lifecycle", complete_expired_trips, interval=TRIP_LIFECYCLE_INTERVAL_SECONDS
+))
+scheduler.register(PeriodicJob(
+    "similar_trips", rebuild_neighbors, interval=SIMILAR_TRIPS_REBUILD_INTERVAL_SECONDS
+))
+scheduler.register(PeriodicJob(
+    "similar_trips_refresh", refresh_queued_neighbors, interval=SIMILAR_TRIPS_REFRESH_INTERVAL_SECONDS
+))
+scheduler.register(PeriodicJob(
+    "counter_reconcile", reconcile_counters, interval=COUNTER_RECONCILE_INTERVAL_SECONDS
+))
+scheduler.register(PeriodicJob(
+    "idempotency_cleanup", purge_expired_keys, interval=IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS
+))
+scheduler.register(PeriodicJob(
+    "activity_retention", compact_activity, interval=ACTIVITY_RETENTION_INTERVAL_SECONDS
+))
+scheduler.register(PeriodicJob(
+    "outbox_cleanup", purge_processed_events, interval=OUTBOX_CLEANUP_INTERVAL_SECONDS
+))
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+async def _startup_phase(name: str, func):
+    """Run a blocking startup step off the event loop; a failure is logged, not fatal"""
+    with startup_report.phase(name):
+        try:
+            await asyncio.to_thread(func)
+        except Exception as e:
+            startup_report.errors[name] = str(e)
+            logger.exception("Startup phase %s failed; requests will initialize lazily", name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker before it accepts connections. The schema is
+    # managed by Alembic, so nothing here creates tables.
+    if WARMUP_ENABLED:
+        await _startup_phase("database_connect", connect_pool)
+        await _startup_phase("warm_up", prime_caches)
+    with startup_report.phase("background_tasks"):
+        scheduler.start()
+        outbox_worker.start()
+    startup_report.ready()
+    logger.info("Startup report: %s", startup_report.as_dict())
+    yield
+    await outbox_worker.stop()
+    await scheduler.stop()
+    engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="TripNect India API",
     description="Backend API for TripNect India - Explore Trips Feature",
     version="1.0.0",
@@ -22,6 +85,12 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Idempotency-Key replays (inside load shedding, so shed requests never reach the key store)
+app.add_middleware(IdempotencyMiddleware)
+
+# Rate limits and load shedding (added before CORS so headers reach its 429/503 responses)
+app.add_middleware(LoadSheddingMiddleware)
+
 # CORS middleware
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 app.add_middleware(
@@ -38,11 +107,18 @@ app.add_middleware(
     allowed_hosts=["*"]  # Configure this properly for production
 )
 
+# On-demand request profiling (added last so it wraps the other middleware)
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(trips.router, prefix="/api/v1/trips", tags=["trips"])
 app.include_router(requests.router, prefix="/api/v1/requests", tags=["requests"])
 app.include_router(participants.router, prefix="/api/v1/participants", tags=["participants"])
 app.include_router(chats.router, prefix="/api/v1/chats", tags=["chats"])
+app.include_router(activity.router, prefix="/api/v1/activity", tags=["activity"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(exports.router, prefix="/api/v1/admin/export", tags=["admin"])
+app.include_router(batch.router, prefix="/api/v1", tags=["batch"])
 
 @app.get("/")
 async def root():
@@ -57,11 +133,13 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "tripnect-api"}
 
+startup_report.finish_import()
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    )
\ No newline at end of file
+    import sys
+    from app.server import serve
+
+    # Same pre-forked server and lifespan as run.py --production; serve()
+    # imports app.main, which must be this module rather than a second copy
+    sys.modules.setdefault("app.main", sys.modules[__name__])
+    serve()
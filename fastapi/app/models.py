@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, DECIMAL, Date, Boolean
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, DECIMAL, Date, Boolean, Index, Float, LargeBinary, CheckConstraint
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -36,10 +36,35 @@ class Trip(Base):
     budget_max = Column(DECIMAL(10, 2))
     preferences = Column(JSON, default={})
     status = Column(String(20), default="active", index=True)  # active, completed, cancelled
-    current_participants = Column(Integer, default=1)
+    # Counters maintained by database triggers (see app/counters.py)
+    current_participants = Column(Integer, default=0, server_default="0")
+    pending_requests = Column(Integer, nullable=False, default=0, server_default="0")
+    latitude = Column(Float)  # geocoded from destination
+    longitude = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        # Bounds also validated by the API (see app/schemas.trip_bounds_error)
+        CheckConstraint("start_date <= end_date", name="ck_trips_dates"),
+        CheckConstraint("budget_min <= budget_max", name="ck_trips_budget"),
+        Index("idx_trips_latitude_longitude", "latitude", "longitude"),
+        # Feed: status = 'active' ORDER BY start_date
+        Index(
+            "idx_trips_active_start_date", "start_date", "id",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+        # Destination autocomplete over active trips
+        Index(
+            "idx_trips_active_destination", "destination",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+        # My trips and the host dashboard: host_id = ? ORDER BY start_date DESC, id DESC
+        Index("idx_trips_host_id_start_date", "host_id", "start_date", "id"),
+    )
+    
     # Relationships
     creator = relationship("User", foreign_keys=[user_id], back_populates="created_trips")
     host = relationship("User", foreign_keys=[host_id], back_populates="hosted_trips")
@@ -47,6 +72,37 @@ class Trip(Base):
     participants = relationship("TripParticipant", back_populates="trip", cascade="all, delete-orphan")
     group_chat = relationship("GroupChat", back_populates="trip", uselist=False, cascade="all, delete-orphan")
 
+class TripTag(Base):
+    """Normalized, indexable tags derived from Trip.preferences"""
+    __tablename__ = "trip_tags"
+    
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(100), primary_key=True)
+    
+    __table_args__ = (
+        Index("idx_trip_tags_tag_trip_id", "tag", "trip_id"),
+    )
+
+class TripNeighbor(Base):
+    """Precomputed top-K similar trips of a trip, refreshed incrementally"""
+    __tablename__ = "trip_neighbors"
+    
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+
+class TripNeighborRefresh(Base):
+    """Trips written since the last neighbor refresh, drained by the scheduler.
+
+    No foreign key: a deleted trip still has to be removed from the lists
+    of the trips that show it.
+    """
+    __tablename__ = "trip_neighbor_refreshes"
+    
+    trip_id = Column(Integer, primary_key=True)
+    queued_at = Column(DateTime(timezone=True), nullable=False)
+
 class TripRequest(Base):
     __tablename__ = "trip_requests"
     
@@ -58,6 +114,12 @@ class TripRequest(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        Index("idx_trip_requests_trip_id_user_id", "trip_id", "user_id", unique=True),
+        # Pending requests of a trip, newest first
+        Index("idx_trip_requests_trip_id_status_created_at", "trip_id", "status", "created_at"),
+    )
+    
     # Relationships
     trip = relationship("Trip", back_populates="trip_requests")
     user = relationship("User", back_populates="trip_requests")
@@ -71,6 +133,12 @@ class TripParticipant(Base):
     role = Column(String(20), default="participant")  # host, participant
     joined_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        # Membership checks: trip_id = ? AND user_id = ?
+        Index("idx_trip_participants_trip_id_user_id", "trip_id", "user_id", unique=True),
+        Index("idx_trip_participants_user_id_role", "user_id", "role", "trip_id"),
+    )
+    
     # Relationships
     trip = relationship("Trip", back_populates="participants")
     user = relationship("User", back_populates="participations")
@@ -81,6 +149,9 @@ class GroupChat(Base):
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), unique=True, nullable=False)
     name = Column(String(255))
+    # Counters maintained by database triggers (see app/counters.py)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_id = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -100,4 +171,72 @@ class ChatMessage(Base):
     
     # Relationships
     chat = relationship("GroupChat", back_populates="messages")
-    user = relationship("User", back_populates="chat_messages")
\ No newline at end of file
+    user = relationship("User", back_populates="chat_messages")
+
+# Chat history: chat_id = ? ORDER BY created_at DESC
+Index("idx_chat_messages_chat_id_created_at", ChatMessage.chat_id, ChatMessage.created_at.desc())
+
+class IdempotencyKey(Base):
+    """First response of a mutating request sent with an Idempotency-Key, replayed to retries"""
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True)
+    owner = Column(String(64), nullable=False)  # user:<id>
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of method, path and body
+    status = Column(String(20), nullable=False, default="in_progress")  # in_progress, completed
+    response_status = Column(Integer)
+    response_headers = Column(JSON)
+    response_body = Column(LargeBinary)
+    locked_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    
+    __table_args__ = (
+        Index("idx_idempotency_keys_owner_key", "owner", "key", unique=True),
+    )
+
+class OutboxEvent(Base):
+    """Deferred side effect of a write, committed in the same transaction and run by app/outbox.py"""
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=False)  # next attempt, or claim expiry
+    claim_token = Column(String(32))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    processed_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        # Workers claim pending events in id order once they are due
+        Index(
+            "idx_outbox_events_pending_available_at", "available_at", "id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'")
+        ),
+        Index("idx_outbox_events_status_processed_at", "status", "processed_at"),
+    )
+
+class ActivityEvent(Base):
+    """Append-only log of what happened on a trip, fanned out to users through UserActivity"""
+    __tablename__ = "activity_events"
+    
+    id = Column(Integer, primary_key=True)
+    # request.created, request.accepted, request.rejected, participant.joined,
+    # participant.left, participant.removed, trip.cancelled, chat.message
+    event_type = Column(String(50), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    actor_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    subject_id = Column(Integer)  # the request, message or removed user the event is about
+    data = Column(JSON)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class UserActivity(Base):
+    """One row per recipient of an activity event; a user's timeline is a range of their rows"""
+    __tablename__ = "user_activity"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    event_id = Column(Integer, ForeignKey("activity_events.id", ondelete="CASCADE"), primary_key=True, index=True)
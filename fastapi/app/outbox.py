@@ -0,0 +1,428 @@
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Deque, Dict, List, Optional
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+
+from app.database import SessionLocal, engine
+from app.models import OutboxEvent, Trip, GroupChat, ChatMessage, TripParticipant
+from app.cache import get_users, trip_cache
+from app.facets import invalidate_facets
+from app.dashboard import invalidate_trip_dashboards
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKER_ENABLED = os.getenv("OUTBOX_WORKER_ENABLED", "True").lower() == "true"
+# Events processed at once per worker process, and claimed per database round trip
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+# Fallback poll for events committed by other processes; local commits wake the worker at once
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+# A claimed event not finished within this time (its worker died) is claimed again
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "1"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+OUTBOX_RETENTION_SECONDS = int(os.getenv("OUTBOX_RETENTION_SECONDS", "86400"))
+OUTBOX_CLEANUP_INTERVAL_SECONDS = float(os.getenv("OUTBOX_CLEANUP_INTERVAL_SECONDS", "3600"))
+OUTBOX_CLEANUP_BATCH_SIZE = int(os.getenv("OUTBOX_CLEANUP_BATCH_SIZE", "1000"))
+
+# Window over which throughput is reported
+THROUGHPUT_WINDOW_SECONDS = 60
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes; everything here is stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def enqueue(db: Session, event_type: str, **payload):
+    """Add an event to the session, to be committed (or rolled back) with the caller's changes"""
+    now = _utcnow()
+    db.add(OutboxEvent(
+        event_type=event_type, payload=payload, status="pending",
+        attempts=0, available_at=now, created_at=now
+    ))
+    db.info["outbox_enqueued"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_on_commit(session):
+    if session.info.pop("outbox_enqueued", False):
+        outbox_worker.wake()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("outbox_enqueued", None)
+
+# Notifications
+
+# Callables receiving (user_ids, kind, data) for each notification
+notifiers: List[Callable[[List[int], str, Dict[str, Any]], None]] = []
+
+def register_notifier(func: Callable[[List[int], str, Dict[str, Any]], None]):
+    notifiers.append(func)
+    return func
+
+@register_notifier
+def _log_notification(user_ids: List[int], kind: str, data: Dict[str, Any]):
+    logger.debug("Notify %s of %s: %s", user_ids, kind, data)
+
+class EventContext:
+    """Notifications and cache evictions requested by a handler.
+
+    Notifications are sent before the event is marked done, so a failing
+    notifier retries the event (at-least-once); evictions run once the
+    handler's writes are committed, so no reader can cache the old rows again.
+    """
+    def __init__(self):
+        self.notifications: List[tuple] = []
+        self.trip_ids = set()
+
+    def notify(self, user_ids, kind: str, **data):
+        user_ids = sorted(set(user_ids))
+        if user_ids:
+            self.notifications.append((user_ids, kind, data))
+
+    def invalidate_trip(self, trip_id: int):
+        self.trip_ids.add(trip_id)
+
+    def send_notifications(self):
+        for user_ids, kind, data in self.notifications:
+            for notifier in notifiers:
+                notifier(user_ids, kind, data)
+
+    def invalidate(self):
+        if self.trip_ids:
+            for trip_id in self.trip_ids:
+                trip_cache.pop(trip_id)
+            invalidate_facets()
+            invalidate_trip_dashboards(self.trip_ids)
+
+# Handlers
+
+HANDLERS: Dict[str, Callable[[Session, Dict[str, Any], EventContext], None]] = {}
+
+def handler(event_type: str):
+    def register(func):
+        HANDLERS[event_type] = func
+        return func
+    return register
+
+def create_group_chat(db: Session, trip_id: int) -> Optional[GroupChat]:
+    """Add the trip's group chat to the session; the unique trip_id rejects a racing duplicate"""
+    destination = db.query(Trip.destination).filter(Trip.id == trip_id).scalar()
+    if destination is None:
+        return None
+    chat = GroupChat(trip_id=trip_id, name=f"Trip to {destination}")
+    db.add(chat)
+    db.flush()
+    return chat
+
+def get_or_create_group_chat(db: Session, trip_id: int) -> Optional[GroupChat]:
+    chat = db.query(GroupChat).filter(GroupChat.trip_id == trip_id).first()
+    return chat or create_group_chat(db, trip_id)
+
+def _participant_ids(db: Session, trip_id: int) -> List[int]:
+    return [row[0] for row in db.query(TripParticipant.user_id).filter(TripParticipant.trip_id == trip_id)]
+
+def _system_message(db: Session, trip_id: int, user_id: int, text: str):
+    chat = get_or_create_group_chat(db, trip_id)
+    if chat is not None:
+        db.add(ChatMessage(chat_id=chat.id, user_id=user_id, message=text, message_type="system"))
+
+@handler("trip.created")
+def _on_trip_created(db: Session, payload: Dict[str, Any], context: EventContext):
+    for trip_id in payload["trip_ids"]:
+        get_or_create_group_chat(db, trip_id)
+
+@handler("trip.cancelled")
+def _on_trip_cancelled(db: Session, payload: Dict[str, Any], context: EventContext):
+    others = set(_participant_ids(db, payload["trip_id"])) - {payload["host_id"]}
+    context.notify(others, "trip.cancelled", trip_id=payload["trip_id"])
+
+@handler("request.created")
+def _on_request_created(db: Session, payload: Dict[str, Any], context: EventContext):
+    host_id = db.query(Trip.host_id).filter(Trip.id == payload["trip_id"]).scalar()
+    if host_id is not None:
+        context.notify([host_id], "request.created", trip_id=payload["trip_id"], request_id=payload["request_id"])
+
+@handler("request.updated")
+def _on_request_updated(db: Session, payload: Dict[str, Any], context: EventContext):
+    trip_id, user_id, status = payload["trip_id"], payload["user_id"], payload["status"]
+    context.notify([user_id], f"request.{status}", trip_id=trip_id, request_id=payload["request_id"])
+    if status == "accepted":
+        user = get_users(db, [user_id]).get(user_id)
+        _system_message(db, trip_id, user_id, f"{user.name if user else 'A new traveller'} joined the trip")
+        others = set(_participant_ids(db, trip_id)) - {user_id}
+        context.notify(others, "participant.joined", trip_id=trip_id, user_id=user_id)
+        context.invalidate_trip(trip_id)
+
+@handler("participant.left")
+def _on_participant_left(db: Session, payload: Dict[str, Any], context: EventContext):
+    trip_id, user_id = payload["trip_id"], payload["user_id"]
+    user = get_users(db, [user_id]).get(user_id)
+    name = user.name if user else "A traveller"
+    removed = payload.get("removed_by") not in (None, user_id)
+    _system_message(db, trip_id, user_id, f"{name} was removed from the trip" if removed else f"{name} left the trip")
+    others = set(_participant_ids(db, trip_id))
+    context.notify(others | {user_id} if removed else others, "participant.left", trip_id=trip_id, user_id=user_id)
+    context.invalidate_trip(trip_id)
+
+@handler("chat.message_sent")
+def _on_message_sent(db: Session, payload: Dict[str, Any], context: EventContext):
+    others = set(_participant_ids(db, payload["trip_id"])) - {payload["user_id"]}
+    context.notify(others, "chat.message", chat_id=payload["chat_id"], message_id=payload["message_id"])
+
+# Claiming and processing
+
+def claim_batch(token: str, limit: int) -> List[Dict[str, Any]]:
+    """Claim up to `limit` due events for OUTBOX_LEASE_SECONDS, marking them with `token`"""
+    db = SessionLocal()
+    try:
+        now = _utcnow()
+        due = select(OutboxEvent.id).where(
+            OutboxEvent.status == "pending",
+            OutboxEvent.available_at <= now
+        ).order_by(OutboxEvent.id).limit(limit)
+        if engine.dialect.name == "postgresql":
+            # Concurrent claimers skip each other's rows instead of queueing on them
+            due = due.with_for_update(skip_locked=True)
+        db.execute(
+            update(OutboxEvent).where(OutboxEvent.id.in_(due)).values(
+                claim_token=token,
+                available_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                attempts=OutboxEvent.attempts + 1
+            ).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        rows = db.query(
+            OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload,
+            OutboxEvent.attempts, OutboxEvent.created_at
+        ).filter(
+            OutboxEvent.claim_token == token,
+            OutboxEvent.status == "pending"
+        ).order_by(OutboxEvent.id).all()
+        return [{**row._asdict(), "claim_token": token} for row in rows]
+    finally:
+        db.close()
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so failing events do not retry in lockstep"""
+    delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def _owned(db: Session, claimed: Dict[str, Any]):
+    return db.query(OutboxEvent).filter(
+        OutboxEvent.id == claimed["id"],
+        OutboxEvent.claim_token == claimed["claim_token"]
+    )
+
+def process_event(claimed: Dict[str, Any]) -> str:
+    """Run a claimed event's handler and record the result.
+
+    The handler's writes and marking the event done commit together, so
+    they happen exactly once. Returns "done", "retry", "failed" (attempts
+    exhausted) or "lost" (the lease expired and another worker took it).
+    """
+    db = SessionLocal()
+    context = EventContext()
+    try:
+        try:
+            event_handler = HANDLERS.get(claimed["event_type"])
+            if event_handler is None:
+                raise ValueError(f"No handler for event type {claimed['event_type']}")
+            event_handler(db, claimed["payload"], context)
+            context.send_notifications()
+            if not _owned(db, claimed).update({
+                OutboxEvent.status: "done",
+                OutboxEvent.processed_at: _utcnow(),
+                OutboxEvent.claim_token: None,
+                OutboxEvent.last_error: None,
+            }, synchronize_session=False):
+                db.rollback()
+                return "lost"
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Outbox event %s (%s) failed: %s", claimed["id"], claimed["event_type"], e)
+            exhausted = claimed["attempts"] >= OUTBOX_MAX_ATTEMPTS
+            _owned(db, claimed).update({
+                OutboxEvent.status: "failed" if exhausted else "pending",
+                OutboxEvent.available_at: _utcnow() + timedelta(seconds=retry_delay(claimed["attempts"])),
+                OutboxEvent.claim_token: None,
+                OutboxEvent.last_error: str(e)[:1000],
+            }, synchronize_session=False)
+            db.commit()
+            return "failed" if exhausted else "retry"
+    finally:
+        db.close()
+    context.invalidate()
+    return "done"
+
+def release_events(claimed: List[Dict[str, Any]]):
+    """Hand back claimed events not started, so they need not wait for the lease to expire"""
+    db = SessionLocal()
+    try:
+        for event in claimed:
+            _owned(db, event).update({
+                OutboxEvent.available_at: _utcnow(),
+                OutboxEvent.claim_token: None,
+                OutboxEvent.attempts: OutboxEvent.attempts - 1,
+            }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def retry_failed_events(db: Session) -> int:
+    """Give events that exhausted their attempts a fresh set"""
+    count = db.query(OutboxEvent).filter(OutboxEvent.status == "failed").update({
+        OutboxEvent.status: "pending",
+        OutboxEvent.attempts: 0,
+        OutboxEvent.available_at: _utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+    if count:
+        outbox_worker.wake()
+    return count
+
+def purge_processed_events(db: Session) -> Dict[str, int]:
+    """Delete events processed more than OUTBOX_RETENTION_SECONDS ago, in batches; failed ones are kept"""
+    cutoff = _utcnow() - timedelta(seconds=OUTBOX_RETENTION_SECONDS)
+    deleted = 0
+    while True:
+        ids = [
+            row[0] for row in db.query(OutboxEvent.id).filter(
+                OutboxEvent.status == "done",
+                OutboxEvent.processed_at < cutoff
+            ).limit(OUTBOX_CLEANUP_BATCH_SIZE)
+        ]
+        if not ids:
+            break
+        deleted += db.query(OutboxEvent).filter(OutboxEvent.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    return {"events_deleted": deleted}
+
+def outbox_backlog(db: Session) -> Dict[str, Any]:
+    """Event counts per status and the age of the oldest pending event"""
+    counts = dict(db.query(OutboxEvent.status, func.count(OutboxEvent.id)).group_by(OutboxEvent.status))
+    oldest = db.query(func.min(OutboxEvent.created_at)).filter(OutboxEvent.status == "pending").scalar()
+    return {
+        "pending": counts.get("pending", 0),
+        "done": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending_age_seconds": round((_utcnow() - _aware(oldest)).total_seconds(), 3) if oldest else None,
+    }
+
+class OutboxWorker:
+    """Drains the outbox in batches with a pool of asyncio tasks.
+
+    A dispatcher claims due events and feeds them to OUTBOX_CONCURRENCY
+    processors, each running one event at a time in a thread. When the
+    outbox is drained it sleeps until a local commit enqueues an event or
+    the poll interval passes. Every worker process runs one; claims keep
+    them from processing the same event.
+    """
+    def __init__(self, concurrency: int, batch_size: int):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.batches = 0
+        self.outcomes: Counter = Counter()
+        self.processed_by_type: Counter = Counter()
+        self._completed: Deque[float] = deque(maxlen=100000)
+        self.lag_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if not OUTBOX_WORKER_ENABLED:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._queue = asyncio.Queue()
+        self._tasks.append(asyncio.create_task(self._dispatch(), name="outbox:dispatch"))
+        for index in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._process(), name=f"outbox:process:{index}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        unstarted = []
+        while self._queue is not None and not self._queue.empty():
+            unstarted.append(self._queue.get_nowait())
+        if unstarted:
+            await asyncio.to_thread(release_events, unstarted)
+        self._loop = None
+
+    def wake(self):
+        """Start a claim now; safe to call from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await asyncio.to_thread(claim_batch, uuid.uuid4().hex, self.batch_size)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("Claiming outbox events failed")
+                claimed = []
+            if claimed:
+                self.batches += 1
+                for event in claimed:
+                    self._queue.put_nowait(event)
+                await self._queue.join()
+            if len(claimed) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _process(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                outcome = await asyncio.to_thread(process_event, event)
+            except Exception as e:
+                # Recording the outcome failed; the lease expires and the event is retried
+                outcome = "error"
+                self.last_error = str(e)
+                logger.exception("Processing outbox event %s failed", event["id"])
+            finally:
+                self._queue.task_done()
+            self.outcomes[outcome] += 1
+            if outcome == "done":
+                self.processed_by_type[event["event_type"]] += 1
+                self._completed.append(time.monotonic())
+                self.lag_ms = round((_utcnow() - _aware(event["created_at"])).total_seconds() * 1000, 2)
+
+    def metrics(self) -> Dict[str, Any]:
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW_SECONDS
+        recent = sum(1 for completed in self._completed if completed >= cutoff)
+        return {
+            "enabled": OUTBOX_WORKER_ENABLED,
+            "running": bool(self._tasks),
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "outcomes": dict(self.outcomes),
+            "processed_by_type": dict(self.processed_by_type),
+            "throughput_per_second": round(recent / THROUGHPUT_WINDOW_SECONDS, 2),
+            "last_lag_ms": self.lag_ms,
+            "last_error": self.last_error,
+        }
+
+outbox_worker = OutboxWorker(OUTBOX_CONCURRENCY, OUTBOX_BATCH_SIZE)
@@ -0,0 +1,67 @@
+from sqlalchemy import event, delete, insert, inspect, select, func
+from sqlalchemy.engine import Connection
+from typing import Any, Dict, List, Optional
+import json
+
+from app.models import Trip, TripTag
+from app.utils import normalize_tag, preference_tags
+
+def parse_preference_filter(value: str) -> Dict[str, Any]:
+    """Parse a key=value preference filter, decoding JSON scalars ("true", "3")"""
+    key, separator, raw = value.partition("=")
+    if not separator or not key.strip():
+        raise ValueError(f"Invalid preference filter '{value}', expected key=value")
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        parsed = raw
+    return {key.strip(): parsed}
+
+def filter_by_tags(query, tags_all: Optional[List[str]] = None, tags_any: Optional[List[str]] = None):
+    """Filter a Trip query on the trip_tags side table, normalizing tags as stored"""
+    if tags_all:
+        tags = sorted({normalize_tag(tag) for tag in tags_all})
+        query = query.filter(Trip.id.in_(
+            select(TripTag.trip_id).where(TripTag.tag.in_(tags)).group_by(
+                TripTag.trip_id
+            ).having(func.count(TripTag.tag) == len(tags))
+        ))
+
+    if tags_any:
+        tags = sorted({normalize_tag(tag) for tag in tags_any})
+        query = query.filter(Trip.id.in_(
+            select(TripTag.trip_id).where(TripTag.tag.in_(tags))
+        ))
+
+    return query
+
+def filter_by_preferences(query, matches: List[Dict[str, Any]]):
+    """Filter a Trip query on key=value preference matches.
+
+    Matches are normalized into tags like the trips' own preferences and
+    looked up in the trip_tags table, so matching is case-insensitive and
+    a scalar matches the same value inside a list on every database.
+    """
+    if not matches:
+        return query
+
+    tags = []
+    for match in matches:
+        tags += preference_tags(match)
+    return filter_by_tags(query, tags_all=tags)
+
+def sync_trip_tags(connection: Connection, trip_id: int, preferences: Optional[Dict[str, Any]]):
+    """Replace the trip_tags rows of a trip with the tags of its preferences"""
+    connection.execute(delete(TripTag).where(TripTag.trip_id == trip_id))
+    tags = preference_tags(preferences)
+    if tags:
+        connection.execute(insert(TripTag), [{"trip_id": trip_id, "tag": tag} for tag in tags])
+
+@event.listens_for(Trip, "after_insert")
+def _tags_on_insert(mapper, connection, target):
+    sync_trip_tags(connection, target.id, target.preferences)
+
+@event.listens_for(Trip, "after_update")
+def _tags_on_update(mapper, connection, target):
+    if inspect(target).attrs.preferences.history.has_changes():
+        sync_trip_tags(connection, target.id, target.preferences)
@@ -0,0 +1,246 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# Header carrying a signed profiling token; profiling by header is off without a secret
+PROFILE_HEADER = "X-Profile"
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+# Ring buffer of collapsed-stack profiles, shared by the workers of one host
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "tripnect-profiles"))
+PROFILE_MAX_FILES = max(int(os.getenv("PROFILE_MAX_FILES", "100")), 1)
+# The interpreter only switches threads every 5 ms by default, so shorter
+# intervals do not add samples of CPU-bound code
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Seconds between re-reads of the sampling rate set through the admin API
+PROFILE_SETTINGS_REFRESH_SECONDS = 1.0
+
+_HEADER_KEY = PROFILE_HEADER.lower().encode()
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+_SETTINGS_FILE = "sampling.json"
+
+def sign_profile_token(expires_at: int) -> str:
+    """Header value that triggers profiling until the given unix time"""
+    signature = hmac.new(PROFILE_SECRET.encode(), str(expires_at).encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{signature}"
+
+def verify_profile_token(token: str) -> bool:
+    if not PROFILE_SECRET:
+        return False
+    expires_at, _, signature = token.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(sign_profile_token(int(expires_at)), token)
+
+class Sampler(threading.Thread):
+    """Counts the stacks of one thread, sampled every `interval` seconds"""
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+        self._labels: Dict[Any, str] = {}
+
+    def _label(self, frame) -> str:
+        code = frame.f_code
+        label = self._labels.get(code)
+        if label is None:
+            module = frame.f_globals.get("__name__", "?")
+            label = f"{module}:{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        """Stacks in the folded format read by flamegraph.pl, speedscope and inferno"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfileStore:
+    """Profiles on disk, keeping only the newest `max_files`"""
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def new_id(self) -> str:
+        # Sorts by creation time, so the oldest profile is always first
+        return f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, profile_id: str, collapsed: str, meta: Dict[str, Any]):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile_id, ".folded"), "w") as f:
+                f.write(collapsed)
+            # Metadata last: a profile is only listed once both files exist
+            with open(self._path(profile_id, ".json"), "w") as f:
+                json.dump(meta, f, default=str)
+            ids = self.ids()
+            for stale in ids[:max(len(ids) - self.max_files, 0)]:
+                for suffix in (".json", ".folded"):
+                    try:
+                        os.remove(self._path(stale, suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (name[:-5] for name in names if name.endswith(".json") and _PROFILE_ID.match(name[:-5])),
+            key=lambda profile_id: int(profile_id.split("-")[0])
+        )
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for profile_id in reversed(self.ids()):
+            try:
+                with open(self._path(profile_id, ".json")) as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Path of a profile's collapsed stacks, None if unknown or evicted"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = self._path(profile_id, ".folded")
+        return path if os.path.exists(path) else None
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+
+class SamplingSettings:
+    """Fraction of requests profiled, shared with the host's other workers through the profile directory"""
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, _SETTINGS_FILE)
+        self.rate = 0.0
+        self.until = 0.0
+        self._checked_at = float("-inf")
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                settings = json.load(f)
+            self.rate, self.until = float(settings["rate"]), float(settings["until"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            self.rate, self.until = 0.0, 0.0
+
+    def current_rate(self) -> float:
+        now = time.monotonic()
+        if now - self._checked_at >= PROFILE_SETTINGS_REFRESH_SECONDS:
+            self._checked_at = now
+            self._load()
+        return self.rate if self.rate and time.time() < self.until else 0.0
+
+    def set(self, rate: float, duration_seconds: float):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        until = time.time() + duration_seconds if rate else 0.0
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"rate": rate, "until": until}, f)
+        os.replace(self.path + ".tmp", self.path)
+        self.rate, self.until = rate, until
+        self._checked_at = time.monotonic()
+
+    def describe(self) -> Dict[str, Any]:
+        rate = self.current_rate()
+        return {
+            "rate": rate,
+            "until": datetime.fromtimestamp(self.until, timezone.utc) if rate else None,
+        }
+
+sampling = SamplingSettings(PROFILE_DIR)
+
+def _trigger(scope) -> Optional[str]:
+    rate = sampling.current_rate()
+    if rate and random.random() < rate:
+        return "sampled"
+    if PROFILE_SECRET:
+        for key, value in scope["headers"]:
+            if key == _HEADER_KEY:
+                return "header" if verify_profile_token(value.decode("latin-1")) else None
+    return None
+
+class ProfilingMiddleware:
+    """Profiles requests carrying a signed X-Profile header or picked by the sampling rate.
+
+    A plain ASGI middleware, so untriggered requests cost one rate check
+    (plus a header scan when PROFILE_SECRET is set). Triggered requests run
+    with a sampler thread reading the event loop thread's stack; other
+    requests interleaved on the loop at the same time show up in the profile
+    too. The profile id is returned in the X-Profile-Id response header.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trigger = _trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = profile_store.new_id()
+        status = {"code": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        sampler = Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "trigger": trigger,
+                "started_at": started_at,
+                "duration_ms": duration_ms,
+                "samples": sum(sampler.stacks.values()),
+                "interval_ms": PROFILE_INTERVAL_MS,
+            }
+            await asyncio.to_thread(profile_store.save, profile_id, sampler.collapsed(), meta)
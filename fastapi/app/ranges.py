@@ -0,0 +1,54 @@
+from sqlalchemy import func, literal_column, or_
+from typing import Optional
+from datetime import date
+
+from app.database import engine
+from app.models import Trip
+
+# Inclusive bounds, rendered inline so the expressions match the index definitions
+INCLUSIVE = literal_column("'[]'")
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+def filter_by_date_overlap(query, travel_from: Optional[date] = None, travel_to: Optional[date] = None):
+    """Trips whose [start_date, end_date] overlaps the travel window.
+
+    PostgreSQL compares daterange values so the GiST index on
+    daterange(start_date, end_date, '[]') is used; elsewhere the
+    equivalent bound comparisons are applied.
+    """
+    if travel_from is None and travel_to is None:
+        return query
+
+    if _is_postgres():
+        trip_range = func.daterange(Trip.start_date, Trip.end_date, INCLUSIVE)
+        window = func.daterange(travel_from, travel_to, INCLUSIVE)
+        return query.filter(trip_range.op("&&")(window))
+
+    if travel_to is not None:
+        query = query.filter(Trip.start_date <= travel_to)
+    if travel_from is not None:
+        query = query.filter(Trip.end_date >= travel_from)
+    return query
+
+def filter_by_budget_overlap(query, budget_min: Optional[float] = None, budget_max: Optional[float] = None):
+    """Trips whose [budget_min, budget_max] overlaps the given budget range.
+
+    A missing trip bound is unbounded on that side. PostgreSQL compares
+    numrange values so the GiST index on numrange(budget_min, budget_max, '[]')
+    is used.
+    """
+    if budget_min is None and budget_max is None:
+        return query
+
+    if _is_postgres():
+        trip_range = func.numrange(Trip.budget_min, Trip.budget_max, INCLUSIVE)
+        wanted = func.numrange(budget_min, budget_max, INCLUSIVE)
+        return query.filter(trip_range.op("&&")(wanted))
+
+    if budget_max is not None:
+        query = query.filter(or_(Trip.budget_min.is_(None), Trip.budget_min <= budget_max))
+    if budget_min is not None:
+        query = query.filter(or_(Trip.budget_max.is_(None), Trip.budget_max >= budget_min))
+    return query
@@ -0,0 +1,311 @@
+from datetime import timezone
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session, object_session
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app.database import SessionLocal
+from app.cache import on_commit
+from app.models import Trip, TripParticipant, TripRequest
+from app.utils import preference_tags
+
+logger = logging.getLogger(__name__)
+
+# Preference tags are hashed into a fixed number of buckets
+TAG_BUCKETS = 64
+
+# Feature matrix columns
+(
+    COL_MONTH, COL_BUDGET, COL_AVAILABILITY, COL_CREATED, COL_DESTINATION,
+    COL_START, COL_END, COL_LATITUDE, COL_LONGITUDE
+) = range(9)
+COL_TAGS = 9
+N_FEATURES = COL_TAGS + TAG_BUCKETS
+
+# Relative weight of each signal in the final score
+WEIGHTS = {
+    "destination": 3.0,
+    "month": 1.5,
+    "budget": 1.5,
+    "tags": 2.0,
+    "availability": 1.0,
+    "recency": 0.5,
+}
+
+# Age (in days) at which the recency signal has decayed to ~37%
+RECENCY_SCALE_DAYS = 14.0
+
+FEATURE_STORE_TTL_SECONDS = float(os.getenv("FEATURE_STORE_TTL_SECONDS", "60"))
+RANKING_MAX_CANDIDATES = int(os.getenv("RANKING_MAX_CANDIDATES", "5000"))
+
+def tag_bucket(tag: str) -> int:
+    return zlib.crc32(tag.encode()) % TAG_BUCKETS
+
+def budget_midpoint(budget_min, budget_max) -> float:
+    values = [float(v) for v in (budget_min, budget_max) if v is not None]
+    return sum(values) / len(values) if values else math.nan
+
+def _timestamp(value) -> float:
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class TripFeatureStore:
+    """Precomputed feature vectors of active trips, stacked into one matrix for scoring.
+
+    Each trip's vector is computed once when the trip is loaded or changes;
+    ORM events mark changed trips dirty and they are reloaded on next use.
+    The whole store is reloaded every FEATURE_STORE_TTL_SECONDS to pick up
+    writes made by other workers, in a background thread while requests
+    keep using the previous contents.
+    """
+    def __init__(self, ttl: float = FEATURE_STORE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors: Dict[int, np.ndarray] = {}
+        self._destination_codes: Dict[str, int] = {}
+        self._dirty: set = set()
+        self._loaded_at: Optional[float] = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = np.zeros((0, N_FEATURES), dtype=np.float64)
+        self._stale_matrix = False
+        # Set while a background reload runs: ids updated meanwhile, which
+        # the reloaded contents may predate
+        self._updated_during_reload: Optional[set] = None
+
+    # Loading
+
+    def _vector(self, trip, destination_codes: Dict[str, int]) -> np.ndarray:
+        vector = np.zeros(N_FEATURES, dtype=np.float64)
+        destination = trip.destination.strip().lower()
+        code = destination_codes.setdefault(destination, len(destination_codes))
+
+        vector[COL_MONTH] = trip.start_date.month - 1
+        vector[COL_BUDGET] = budget_midpoint(trip.budget_min, trip.budget_max)
+        slots = trip.open_slots or 1
+        vector[COL_AVAILABILITY] = max(0.0, (slots - (trip.current_participants or 0)) / slots)
+        vector[COL_CREATED] = _timestamp(trip.created_at)
+        vector[COL_DESTINATION] = code
+        vector[COL_START] = trip.start_date.toordinal()
+        vector[COL_END] = trip.end_date.toordinal()
+        vector[COL_LATITUDE] = trip.latitude if trip.latitude is not None else math.nan
+        vector[COL_LONGITUDE] = trip.longitude if trip.longitude is not None else math.nan
+        for tag in preference_tags(trip.preferences):
+            vector[COL_TAGS + tag_bucket(tag)] = 1.0
+        return vector
+
+    def load(self, trips: Iterable[Any]):
+        """Replace the store contents with the given active trip rows.
+
+        Destination codes are rebuilt too, so those of trips gone since
+        the last load are dropped.
+        """
+        destination_codes: Dict[str, int] = {}
+        vectors = {trip.id: self._vector(trip, destination_codes) for trip in trips}
+        with self._lock:
+            self._vectors = vectors
+            self._destination_codes = destination_codes
+            if self._updated_during_reload is not None:
+                self._dirty |= self._updated_during_reload
+                self._updated_during_reload = set()
+            self._loaded_at = time.monotonic()
+            self._stale_matrix = True
+
+    def _reload(self):
+        db = SessionLocal()
+        try:
+            self.load(db.query(Trip).filter(Trip.status == "active").yield_per(1000))
+        except Exception:
+            logger.exception("Feature store reload failed")
+        finally:
+            db.close()
+            with self._lock:
+                self._updated_during_reload = None
+
+    def upsert(self, trips: Iterable[Any]):
+        with self._lock:
+            for trip in trips:
+                if trip.status == "active":
+                    self._vectors[trip.id] = self._vector(trip, self._destination_codes)
+                else:
+                    self._vectors.pop(trip.id, None)
+            self._stale_matrix = True
+
+    def remove(self, trip_ids: Iterable[int]):
+        with self._lock:
+            for trip_id in trip_ids:
+                self._vectors.pop(trip_id, None)
+            self._stale_matrix = True
+
+    def mark_dirty(self, trip_id: int):
+        with self._lock:
+            self._dirty.add(trip_id)
+
+    def refresh(self, db: Session):
+        """Bring the store up to date with the database.
+
+        Only the first load runs in the caller (the app warms it up at
+        startup); once the TTL expires the full reload starts in the
+        background and the caller only applies the trips marked dirty.
+        """
+        if self._loaded_at is None:
+            self.load(db.query(Trip).filter(Trip.status == "active").yield_per(1000))
+            return
+
+        with self._lock:
+            reload = self._updated_during_reload is None and time.monotonic() - self._loaded_at > self.ttl
+            if reload:
+                self._updated_during_reload = set()
+            dirty, self._dirty = self._dirty, set()
+            if self._updated_during_reload is not None:
+                self._updated_during_reload |= dirty
+        if reload:
+            threading.Thread(target=self._reload, name="feature-store-reload", daemon=True).start()
+        if dirty:
+            trips = db.query(Trip).filter(Trip.id.in_(dirty)).all()
+            self.remove(dirty - {trip.id for trip in trips})
+            self.upsert(trips)
+
+    def snapshot(self):
+        """Current (ids, feature matrix, destination codes); rebuilt lazily after changes"""
+        with self._lock:
+            if self._stale_matrix:
+                ids = sorted(self._vectors)
+                self._ids = np.array(ids, dtype=np.int64)
+                self._matrix = (
+                    np.vstack([self._vectors[i] for i in ids]) if ids
+                    else np.zeros((0, N_FEATURES), dtype=np.float64)
+                )
+                self._stale_matrix = False
+            return self._ids, self._matrix, dict(self._destination_codes)
+
+class TasteProfile:
+    """What a user has gone for in the past, built from their participations and requests"""
+    def __init__(self):
+        self.destinations: Dict[str, float] = {}
+        self.months = np.zeros(12, dtype=np.float64)
+        self.tags = np.zeros(TAG_BUCKETS, dtype=np.float64)
+        self.budget: Optional[float] = None
+
+    @classmethod
+    def from_trips(cls, trips: Sequence[Any]) -> "TasteProfile":
+        profile = cls()
+        if not trips:
+            return profile
+
+        budgets = []
+        for trip in trips:
+            destination = trip.destination.strip().lower()
+            profile.destinations[destination] = profile.destinations.get(destination, 0.0) + 1.0
+            month = trip.start_date.month - 1
+            # Neighbouring months count for half, travel windows are fuzzy
+            profile.months[month] += 1.0
+            profile.months[(month - 1) % 12] += 0.5
+            profile.months[(month + 1) % 12] += 0.5
+            for tag in preference_tags(trip.preferences):
+                profile.tags[tag_bucket(tag)] += 1.0
+            midpoint = budget_midpoint(trip.budget_min, trip.budget_max)
+            if not math.isnan(midpoint):
+                budgets.append(midpoint)
+
+        total = float(len(trips))
+        profile.destinations = {key: value / total for key, value in profile.destinations.items()}
+        profile.months /= profile.months.max()
+        if profile.tags.any():
+            profile.tags /= profile.tags.sum()
+        if budgets:
+            profile.budget = float(np.median(budgets))
+        return profile
+
+def score_trips(
+    ids: np.ndarray,
+    matrix: np.ndarray,
+    destination_codes: Dict[str, int],
+    profile: TasteProfile,
+    now: Optional[float] = None
+) -> np.ndarray:
+    """Relevance score of every row of the feature matrix for the given profile"""
+    now = time.time() if now is None else now
+    scores = np.zeros(len(ids), dtype=np.float64)
+    if not len(ids):
+        return scores
+
+    if profile.destinations:
+        weights = np.zeros(len(destination_codes) + 1, dtype=np.float64)
+        for destination, weight in profile.destinations.items():
+            code = destination_codes.get(destination)
+            if code is not None:
+                weights[code] = weight
+        scores += WEIGHTS["destination"] * weights[matrix[:, COL_DESTINATION].astype(np.int64)]
+
+    if profile.months.any():
+        scores += WEIGHTS["month"] * profile.months[matrix[:, COL_MONTH].astype(np.int64)]
+
+    if profile.budget:
+        budgets = matrix[:, COL_BUDGET]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            closeness = np.exp(-np.abs(np.log(budgets / profile.budget)))
+        scores += WEIGHTS["budget"] * np.where(np.isnan(closeness), 0.5, closeness)
+
+    if profile.tags.any():
+        scores += WEIGHTS["tags"] * (matrix[:, COL_TAGS:] @ profile.tags)
+
+    scores += WEIGHTS["availability"] * matrix[:, COL_AVAILABILITY]
+
+    age_days = np.maximum(now - matrix[:, COL_CREATED], 0.0) / 86400.0
+    scores += WEIGHTS["recency"] * np.exp(-age_days / RECENCY_SCALE_DAYS)
+    return scores
+
+def build_taste_profile(db: Session, user_id: Optional[int]) -> TasteProfile:
+    """Profile from the trips a user has joined or requested to join"""
+    if user_id is None:
+        return TasteProfile()
+
+    joined = db.query(TripParticipant.trip_id).filter(TripParticipant.user_id == user_id)
+    requested = db.query(TripRequest.trip_id).filter(TripRequest.user_id == user_id)
+    trips = db.query(
+        Trip.destination, Trip.start_date, Trip.budget_min, Trip.budget_max, Trip.preferences
+    ).filter(or_(Trip.id.in_(joined), Trip.id.in_(requested))).order_by(
+        Trip.start_date.desc()
+    ).limit(200).all()
+    return TasteProfile.from_trips(trips)
+
+def rank_trips(db: Session, user_id: Optional[int], candidate_ids: Iterable[int]) -> List[int]:
+    """Order candidate trip ids by relevance to the user, best first"""
+    feature_store.refresh(db)
+    ids, matrix, destination_codes = feature_store.snapshot()
+
+    candidates = np.fromiter(candidate_ids, dtype=np.int64)
+    mask = np.isin(ids, candidates)
+    ids, matrix = ids[mask], matrix[mask]
+
+    scores = score_trips(ids, matrix, destination_codes, build_taste_profile(db, user_id))
+    # Stable sort so ties keep ascending id order
+    order = np.argsort(-scores, kind="stable")
+
+    # Candidates the store has not seen yet (e.g. bulk inserts) go last
+    unseen = np.setdiff1d(candidates, ids)
+    return ids[order].tolist() + unseen.tolist()
+
+feature_store = TripFeatureStore()
+
+@event.listens_for(Trip, "after_insert")
+@event.listens_for(Trip, "after_update")
+@event.listens_for(Trip, "after_delete")
+def _mark_trip_dirty(mapper, connection, target):
+    on_commit(object_session(target), feature_store.mark_dirty, target.id)
+
+@event.listens_for(TripParticipant, "after_insert")
+@event.listens_for(TripParticipant, "after_delete")
+def _mark_participant_trip_dirty(mapper, connection, target):
+    # Availability depends on the trigger-maintained participant count
+    on_commit(object_session(target), feature_store.mark_dirty, target.trip_id)
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import ActivityEvent, UserActivity, User
+from app.schemas import ActivityItem
+from app.auth import get_current_user
+from app.cache import with_trip_summaries
+from app.utils import encode_cursor, decode_cursor
+
+router = APIRouter()
+
+@router.get("/", response_model=List[ActivityItem])
+async def get_activity_timeline(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get what happened on the current user's trips, newest first.
+    
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    try:
+        start_after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        # Events were fanned out at write time, so a page is one range of
+        # the (user_id, event_id) primary key
+        query = db.query(ActivityEvent).join(
+            UserActivity, UserActivity.event_id == ActivityEvent.id
+        ).filter(UserActivity.user_id == current_user.id)
+        
+        if start_after:
+            query = query.filter(UserActivity.event_id < start_after[0])
+        
+        events = query.order_by(UserActivity.event_id.desc()).limit(limit + 1).all()
+        
+        if len(events) > limit:
+            events = events[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(events[-1].id)
+        
+        # Trip summaries and actor profiles come from the entity cache
+        return with_trip_summaries(db, events, actor="actor_id")
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error fetching activity: {str(e)}")
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+import time
+
+from app.database import get_db
+from app.models import User
+from app.auth import get_current_admin
+from app.cache import cache_stats
+from app.scheduler import scheduler
+from app.startup import startup_report
+from app.limits import limit_stats
+from app.outbox import outbox_worker, outbox_backlog, retry_failed_events
+from app.profiling import profile_store, sampling, sign_profile_token, PROFILE_HEADER, PROFILE_SECRET
+
+router = APIRouter()
+
+@router.get("/cache")
+async def get_cache_stats(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get entity cache hit ratios and the number of joined rows avoided"""
+    return cache_stats()
+
+@router.get("/jobs")
+async def get_job_metrics(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get per-run metrics of the background jobs"""
+    return scheduler.metrics()
+
+@router.get("/limits")
+async def get_limits(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get the adaptive concurrency limit of each route group and rate limit counters"""
+    return limit_stats()
+
+@router.get("/outbox")
+async def get_outbox_metrics(
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Get the outbox backlog and this worker's processing throughput"""
+    return {"backlog": outbox_backlog(db), "worker": outbox_worker.metrics()}
+
+@router.post("/outbox/retry")
+async def retry_outbox_events(
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Queue events that exhausted their retries again"""
+    return {"requeued": retry_failed_events(db)}
+
+@router.get("/startup")
+async def get_startup_report(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get this worker's startup time per phase"""
+    return startup_report.as_dict()
+
+@router.get("/profiles")
+async def list_profiles(
+    current_admin: User = Depends(get_current_admin)
+):
+    """List stored request profiles, newest first"""
+    return profile_store.list()
+
+@router.get("/profiles/sampling")
+async def get_profile_sampling(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get the fraction of requests currently profiled"""
+    return sampling.describe()
+
+@router.put("/profiles/sampling")
+async def set_profile_sampling(
+    rate: float = Query(..., ge=0, le=1),
+    duration_seconds: int = Query(600, gt=0, le=86400),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Profile a random fraction of requests for a limited time (rate=0 stops)"""
+    sampling.set(rate, duration_seconds)
+    return sampling.describe()
+
+@router.post("/profiles/token")
+async def create_profile_token(
+    ttl_seconds: int = Query(300, gt=0, le=3600),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get a signed header value that profiles any request carrying it until it expires"""
+    if not PROFILE_SECRET:
+        raise HTTPException(status_code=400, detail="PROFILE_SECRET is not configured")
+    expires_at = int(time.time()) + ttl_seconds
+    return {"header": PROFILE_HEADER, "value": sign_profile_token(expires_at), "expires_at": expires_at}
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Download a profile as collapsed stacks for flamegraph.pl or speedscope"""
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import User
+from app.schemas import BatchRequest, BatchResponse
+from app.auth import get_current_user
+from app.batch import run_batch, BATCH_MAX_REQUESTS
+
+router = APIRouter()
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(
+    batch_request: BatchRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run several API calls in one round trip, authenticated once and on one database session"""
+    if not 1 <= len(batch_request.requests) <= BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch must contain between 1 and {BATCH_MAX_REQUESTS} requests"
+        )
+    responses = await run_batch(request, db, current_user, batch_request.requests, background_tasks)
+    return BatchResponse(responses=responses)
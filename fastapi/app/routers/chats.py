@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, desc
+from sqlalchemy.orm import Session
+from sqlalchemy import desc
+from sqlalchemy.exc import IntegrityError
 from typing import List
 
 from app.database import get_db
 from app.models import Trip, GroupChat, ChatMessage, User, TripParticipant
 from app.schemas import GroupChat as GroupChatSchema, ChatMessage as ChatMessageSchema, ChatMessageCreate
 from app.auth import get_current_user
+from app.cache import with_profiles
+from app.outbox import enqueue, create_group_chat
+from app.activity import record_activity, trip_members, message_preview
+from app.statements import chat_by_id, membership
 
 router = APIRouter()
 
@@ -19,29 +24,24 @@ async def get_trip_chat(
     """Get group chat for a trip"""
     try:
         # Check if user is participant
-        participant = db.query(TripParticipant).filter(
-            and_(
-                TripParticipant.trip_id == trip_id,
-                TripParticipant.user_id == current_user.id
-            )
-        ).first()
+        participant = membership(db, trip_id, current_user.id)
         
         if not participant:
             raise HTTPException(status_code=403, detail="Only trip participants can access chat")
         
-        # Get or create group chat
+        # The outbox worker creates the chat with the trip; this covers
+        # trips it has not processed yet
         chat = db.query(GroupChat).filter(GroupChat.trip_id == trip_id).first()
         
         if not chat:
-            # Create group chat if it doesn't exist
-            trip = db.query(Trip).filter(Trip.id == trip_id).first()
-            chat = GroupChat(
-                trip_id=trip_id,
-                name=f"Trip to {trip.destination}"
-            )
-            db.add(chat)
-            db.commit()
-            db.refresh(chat)
+            try:
+                chat = create_group_chat(db, trip_id)
+                db.commit()
+                db.refresh(chat)
+            except IntegrityError:
+                # Created concurrently by the worker or another request
+                db.rollback()
+                chat = db.query(GroupChat).filter(GroupChat.trip_id == trip_id).first()
         
         return chat
         
@@ -61,24 +61,17 @@ async def get_chat_messages(
     """Get chat messages with pagination"""
     try:
         # Check if user has access to this chat
-        chat = db.query(GroupChat).filter(GroupChat.id == chat_id).first()
+        chat = chat_by_id(db, chat_id)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
         
-        participant = db.query(TripParticipant).filter(
-            and_(
-                TripParticipant.trip_id == chat.trip_id,
-                TripParticipant.user_id == current_user.id
-            )
-        ).first()
+        participant = membership(db, chat.trip_id, current_user.id)
         
         if not participant:
             raise HTTPException(status_code=403, detail="Access denied to this chat")
         
         # Get messages with pagination
-        messages = db.query(ChatMessage).options(
-            joinedload(ChatMessage.user)
-        ).filter(
+        messages = db.query(ChatMessage).filter(
             ChatMessage.chat_id == chat_id
         ).order_by(
             desc(ChatMessage.created_at)
@@ -89,7 +82,7 @@ async def get_chat_messages(
         # Reverse to get chronological order
         messages.reverse()
         
-        return messages
+        return with_profiles(db, messages, user="user_id")
         
     except HTTPException:
         raise
@@ -106,16 +99,11 @@ async def send_message(
     """Send a message to group chat"""
     try:
         # Check if user has access to this chat
-        chat = db.query(GroupChat).filter(GroupChat.id == chat_id).first()
+        chat = chat_by_id(db, chat_id)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
         
-        participant = db.query(TripParticipant).filter(
-            and_(
-                TripParticipant.trip_id == chat.trip_id,
-                TripParticipant.user_id == current_user.id
-            )
-        ).first()
+        participant = membership(db, chat.trip_id, current_user.id)
         
         if not participant:
             raise HTTPException(status_code=403, detail="Access denied to this chat")
@@ -129,15 +117,20 @@ async def send_message(
         )
         
         db.add(db_message)
+        db.flush()
+        enqueue(
+            db, "chat.message_sent",
+            chat_id=chat_id, message_id=db_message.id, trip_id=chat.trip_id, user_id=current_user.id
+        )
+        record_activity(
+            db, "chat.message", chat.trip_id, current_user.id,
+            set(trip_members(db, chat.trip_id)) - {current_user.id},
+            subject_id=db_message.id, chat_id=chat_id, preview=message_preview(db_message.message)
+        )
         db.commit()
         db.refresh(db_message)
         
-        # Load user relationship
-        db_message = db.query(ChatMessage).options(
-            joinedload(ChatMessage.user)
-        ).filter(ChatMessage.id == db_message.id).first()
-        
-        return db_message
+        return with_profiles(db, [db_message], user="user_id")[0]
         
     except HTTPException:
         raise
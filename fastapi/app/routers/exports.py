@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Optional
+import csv
+import io
+import json
+
+from app.database import SessionLocal
+from app.models import Trip, TripRequest, TripParticipant, User
+from app.auth import get_current_admin
+from app.filters import TripFeedFilters
+
+router = APIRouter()
+
+# Rows fetched per server-side cursor round trip
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def _encode_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def _stream_rows(statement, fmt: str):
+    """Yield encoded chunks of rows read through a server-side cursor.
+
+    The generator owns its session so the cursor outlives the request handler,
+    and the next batch is only fetched once the previous chunk has been sent.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        columns = list(result.keys())
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        for rows in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([_encode_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows
+                )
+    finally:
+        db.close()
+
+def _export_response(statement, fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_rows(statement, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    )
+
+@router.get("/trips")
+async def export_trips(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = Query(None, pattern="^(active|completed|cancelled)$", description="Every status when omitted"),
+    filters: TripFeedFilters = Depends(),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream all trips matching the feed filters, of any status unless one is given"""
+    statement = filters.apply(select(
+        Trip.id, Trip.user_id, Trip.host_id, Trip.title, Trip.destination,
+        Trip.start_date, Trip.end_date, Trip.description, Trip.open_slots,
+        Trip.budget_min, Trip.budget_max, Trip.preferences, Trip.status,
+        Trip.current_participants, Trip.created_at, Trip.updated_at
+    ), active_only=False).order_by(Trip.id)
+
+    if status:
+        statement = statement.filter(Trip.status == status)
+
+    return _export_response(statement, format, "trips")
+
+@router.get("/requests")
+async def export_requests(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    trip_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream all trip requests"""
+    statement = select(
+        TripRequest.id, TripRequest.trip_id, TripRequest.user_id, TripRequest.status,
+        TripRequest.message, TripRequest.created_at, TripRequest.updated_at
+    ).order_by(TripRequest.id)
+
+    if trip_id is not None:
+        statement = statement.filter(TripRequest.trip_id == trip_id)
+    if status:
+        statement = statement.filter(TripRequest.status == status)
+
+    return _export_response(statement, format, "requests")
+
+@router.get("/participants")
+async def export_participants(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    trip_id: Optional[int] = Query(None),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream all trip participants"""
+    statement = select(
+        TripParticipant.id, TripParticipant.trip_id, TripParticipant.user_id,
+        TripParticipant.role, TripParticipant.joined_at
+    ).order_by(TripParticipant.id)
+
+    if trip_id is not None:
+        statement = statement.filter(TripParticipant.trip_id == trip_id)
+
+    return _export_response(statement, format, "participants")
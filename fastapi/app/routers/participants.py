@@ -1,32 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
 from typing import List
 
 from app.database import get_db
 from app.models import Trip, TripParticipant, User
 from app.schemas import TripParticipant as TripParticipantSchema
 from app.auth import get_current_user
+from app.etag import participants_etag, etag_matches, not_modified
+from app.cache import with_profiles
+from app.similarity import queue_neighbor_refresh
+from app.outbox import enqueue
+from app.activity import record_activity, trip_members
+from app.statements import trip_by_id, membership
 
 router = APIRouter()
 
 @router.get("/trip/{trip_id}", response_model=List[TripParticipantSchema])
 async def get_trip_participants(
     trip_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get all participants for a trip"""
     try:
-        # Check if trip exists
-        trip = db.query(Trip).filter(Trip.id == trip_id).first()
-        if not trip:
+        # Check if trip exists; the ETag lookup doubles as the existence check
+        etag = participants_etag(db, trip_id)
+        if etag is None:
             raise HTTPException(status_code=404, detail="Trip not found")
         
-        participants = db.query(TripParticipant).options(
-            joinedload(TripParticipant.user)
-        ).filter(TripParticipant.trip_id == trip_id).all()
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+        
+        participants = db.query(TripParticipant).filter(TripParticipant.trip_id == trip_id).all()
         
-        return participants
+        return with_profiles(db, participants, user="user_id")
         
     except HTTPException:
         raise
@@ -43,16 +52,11 @@ async def remove_participant(
     """Remove a participant from trip (by host) or leave trip (by participant)"""
     try:
         # Get trip and participant
-        trip = db.query(Trip).filter(Trip.id == trip_id).first()
+        trip = trip_by_id(db, trip_id)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found")
         
-        participant = db.query(TripParticipant).filter(
-            and_(
-                TripParticipant.trip_id == trip_id,
-                TripParticipant.user_id == user_id
-            )
-        ).first()
+        participant = membership(db, trip_id, user_id)
         
         if not participant:
             raise HTTPException(status_code=404, detail="Participant not found")
@@ -73,6 +77,15 @@ async def remove_participant(
         
         # Remove participant
         db.delete(participant)
+        enqueue(db, "participant.left", trip_id=trip_id, user_id=user_id, removed_by=current_user.id)
+        db.flush()
+        recipients = (set(trip_members(db, trip_id)) | {user_id}) - {current_user.id}
+        if is_self:
+            record_activity(db, "participant.left", trip_id, user_id, recipients)
+        else:
+            # The host acted; the removed user is the subject
+            record_activity(db, "participant.removed", trip_id, current_user.id, recipients, subject_id=user_id)
+        queue_neighbor_refresh(db, [trip_id])
         db.commit()
         
         action = "left" if is_self else "removed from"
@@ -91,11 +104,11 @@ async def get_user_participations(
 ):
     """Get current user's trip participations"""
     try:
-        participations = db.query(TripParticipant).options(
-            joinedload(TripParticipant.user)
-        ).filter(TripParticipant.user_id == current_user.id).all()
+        participations = db.query(TripParticipant).filter(
+            TripParticipant.user_id == current_user.id
+        ).all()
         
-        return participations
+        return with_profiles(db, participations, user="user_id")
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error fetching participations: {str(e)}")
\ No newline at end of file
@@ -7,6 +7,11 @@ from app.database import get_db
 from app.models import Trip, TripRequest, User, TripParticipant, GroupChat
 from app.schemas import TripRequest as TripRequestSchema, TripRequestCreate, TripRequestUpdate, RequestStatusUpdate
 from app.auth import get_current_user
+from app.cache import with_trip_summaries
+from app.similarity import queue_neighbor_refresh
+from app.outbox import enqueue
+from app.activity import record_activity, trip_members
+from app.statements import trip_by_id, active_trip_by_id, membership
 
 router = APIRouter()
 
@@ -19,9 +24,7 @@ async def create_trip_request(
     """Request to join a trip"""
     try:
         # Check if trip exists and is active
-        trip = db.query(Trip).filter(
-            and_(Trip.id == request_data.trip_id, Trip.status == "active")
-        ).first()
+        trip = active_trip_by_id(db, request_data.trip_id)
         
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found or not active")
@@ -41,12 +44,7 @@ async def create_trip_request(
         if existing_request:
             raise HTTPException(status_code=400, detail="Request already exists for this trip")
         
-        existing_participant = db.query(TripParticipant).filter(
-            and_(
-                TripParticipant.trip_id == request_data.trip_id,
-                TripParticipant.user_id == current_user.id
-            )
-        ).first()
+        existing_participant = membership(db, request_data.trip_id, current_user.id)
         
         if existing_participant:
             raise HTTPException(status_code=400, detail="Already a participant in this trip")
@@ -63,16 +61,14 @@ async def create_trip_request(
         )
         
         db.add(db_request)
+        db.flush()
+        enqueue(db, "request.created", request_id=db_request.id, trip_id=db_request.trip_id, user_id=current_user.id)
+        record_activity(db, "request.created", trip.id, current_user.id, [trip.host_id], subject_id=db_request.id)
         db.commit()
         db.refresh(db_request)
         
-        # Load relationships for response
-        db_request = db.query(TripRequest).options(
-            joinedload(TripRequest.user),
-            joinedload(TripRequest.trip).joinedload(Trip.host)
-        ).filter(TripRequest.id == db_request.id).first()
-        
-        return db_request
+        # Attach user and trip summaries for response
+        return with_trip_summaries(db, [db_request], user="user_id")[0]
         
     except HTTPException:
         raise
@@ -88,7 +84,7 @@ async def get_trip_requests(
 ):
     """Get all requests for a trip (only by host)"""
     # Check if user is the host
-    trip = db.query(Trip).filter(Trip.id == trip_id).first()
+    trip = trip_by_id(db, trip_id)
     
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -97,12 +93,9 @@ async def get_trip_requests(
         raise HTTPException(status_code=403, detail="Only trip host can view requests")
     
     try:
-        requests = db.query(TripRequest).options(
-            joinedload(TripRequest.user),
-            joinedload(TripRequest.trip).joinedload(Trip.host)
-        ).filter(TripRequest.trip_id == trip_id).all()
+        requests = db.query(TripRequest).filter(TripRequest.trip_id == trip_id).all()
         
-        return requests
+        return with_trip_summaries(db, requests, user="user_id")
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error fetching requests: {str(e)}")
@@ -114,12 +107,9 @@ async def get_user_requests(
 ):
     """Get current user's trip requests"""
     try:
-        requests = db.query(TripRequest).options(
-            joinedload(TripRequest.user),
-            joinedload(TripRequest.trip).joinedload(Trip.host)
-        ).filter(TripRequest.user_id == current_user.id).all()
+        requests = db.query(TripRequest).filter(TripRequest.user_id == current_user.id).all()
         
-        return requests
+        return with_trip_summaries(db, requests, user="user_id")
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error fetching user requests: {str(e)}")
@@ -135,8 +125,7 @@ async def update_request_status(
     try:
         # Get request with trip info
         request = db.query(TripRequest).options(
-            joinedload(TripRequest.trip),
-            joinedload(TripRequest.user)
+            joinedload(TripRequest.trip)
         ).filter(TripRequest.id == request_id).first()
         
         if not request:
@@ -163,15 +152,28 @@ async def update_request_status(
             )
             db.add(participant)
         
-        # Update request status
+        # Update request status; the join message and notifications are sent by the outbox worker
         request.status = status_update.status
+        enqueue(
+            db, "request.updated",
+            request_id=request.id, trip_id=request.trip_id, user_id=request.user_id, status=status_update.status
+        )
+        record_activity(
+            db, f"request.{status_update.status}", request.trip_id, current_user.id,
+            [request.user_id], subject_id=request.id
+        )
+        if status_update.status == "accepted":
+            db.flush()
+            record_activity(
+                db, "participant.joined", request.trip_id, request.user_id,
+                set(trip_members(db, request.trip_id)) - {current_user.id, request.user_id}, subject_id=request.id
+            )
+            # Open slots changed, which affects similar trip suggestions
+            queue_neighbor_refresh(db, [request.trip_id])
         db.commit()
         
-        # Reload request with all relationships
-        request = db.query(TripRequest).options(
-            joinedload(TripRequest.user),
-            joinedload(TripRequest.trip).joinedload(Trip.host)
-        ).filter(TripRequest.id == request_id).first()
+        # Attach user and trip summaries for response
+        request = with_trip_summaries(db, [request], user="user_id")[0]
         
         message = f"Request {status_update.status} successfully"
         return RequestStatusUpdate(message=message, request=request)
@@ -1,13 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, case, insert
+from pydantic import ValidationError
 from typing import List, Optional
 from datetime import date
 
 from app.database import get_db
-from app.models import Trip, User, TripParticipant
+from app.models import Trip, User, TripParticipant, TripTag, TripNeighbor
 from app.schemas import Trip as TripSchema, TripCreate, TripUpdate, TripFeedResponse, TripDetail, TripSummary
-from app.auth import get_current_user
+from app.schemas import TripBatchCreate, TripBatchItemResult, TripBatchResponse, MyTrip, TripFacetsResponse
+from app.schemas import HostDashboardResponse, trip_bounds_error
+from app.auth import get_current_user, get_optional_user
+from app.filters import TripFeedFilters
+from app.etag import feed_etag, trip_etag, etag_matches, not_modified
+from app.cache import with_profiles, get_users, get_trips, ProfileView
+from app.utils import encode_cursor, decode_cursor, preference_tags
+from app.ranking import rank_trips, feature_store, RANKING_MAX_CANDIDATES
+from app.facets import get_facets, invalidate_facets
+from app.similarity import queue_neighbor_refresh
+from app.geo import geocode
+from app.dashboard import get_host_dashboard, invalidate_host_dashboard
+from app.outbox import enqueue
+from app.activity import record_activity, trip_members
+from app.statements import trip_by_id, feed_total, feed_page
 
 router = APIRouter()
 
@@ -27,79 +42,139 @@ async def create_trip(
         )
         
         db.add(db_trip)
-        db.commit()
-        db.refresh(db_trip)
+        db.flush()
         
-        # Add host as participant
+        # Add host as participant in the same transaction
         host_participant = TripParticipant(
             trip_id=db_trip.id,
             user_id=current_user.id,
             role="host"
         )
         db.add(host_participant)
+        # The group chat is created by the outbox worker
+        enqueue(db, "trip.created", trip_ids=[db_trip.id], host_id=current_user.id)
+        queue_neighbor_refresh(db, [db_trip.id])
         db.commit()
         
-        # Refresh to get relationships
+        # Refresh for trigger-maintained counters; profiles come from the entity cache
         db.refresh(db_trip)
-        return db_trip
+        return with_profiles(db, [db_trip], host="host_id", creator="user_id")[0]
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating trip: {str(e)}")
 
+@router.post("/batch", response_model=TripBatchResponse)
+async def create_trips_batch(
+    batch: TripBatchCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create many trips in one transaction, hosted by the current user"""
+    results = []
+    rows = []
+    for index, item in enumerate(batch.trips):
+        try:
+            trip_data = TripCreate(**item)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            results.append(TripBatchItemResult(index=index, status="invalid", error=error))
+            continue
+        latitude, longitude = geocode(trip_data.destination) or (None, None)
+        rows.append((index, {
+            **trip_data.dict(),
+            "user_id": current_user.id,
+            "host_id": current_user.id,
+            "latitude": latitude,
+            "longitude": longitude
+        }))
+    
+    try:
+        if rows:
+            # Bulk insert trips and host participants with one statement each
+            trip_ids = db.execute(
+                insert(Trip).returning(Trip.id, sort_by_parameter_order=True),
+                [values for _, values in rows]
+            ).scalars().all()
+            
+            db.execute(insert(TripParticipant), [
+                {"trip_id": trip_id, "user_id": current_user.id, "role": "host"}
+                for trip_id in trip_ids
+            ])
+            
+            # Bulk inserts skip ORM events, so write preference tags here
+            tag_rows = [
+                {"trip_id": trip_id, "tag": tag}
+                for (_, values), trip_id in zip(rows, trip_ids)
+                for tag in preference_tags(values["preferences"])
+            ]
+            if tag_rows:
+                db.execute(insert(TripTag), tag_rows)
+            enqueue(db, "trip.created", trip_ids=list(trip_ids), host_id=current_user.id)
+            queue_neighbor_refresh(db, trip_ids)
+            db.commit()
+            invalidate_facets()
+            invalidate_host_dashboard(current_user.id)
+            # Bulk inserts skip the ORM events that mark trips for the feature store
+            for trip_id in trip_ids:
+                feature_store.mark_dirty(trip_id)
+            
+            for (index, _), trip_id in zip(rows, trip_ids):
+                results.append(TripBatchItemResult(index=index, status="created", trip_id=trip_id))
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error creating trips: {str(e)}")
+    
+    results.sort(key=lambda result: result.index)
+    return TripBatchResponse(
+        created=len(rows),
+        failed=len(results) - len(rows),
+        results=results
+    )
+
 @router.get("/feed", response_model=TripFeedResponse)
 async def get_trip_feed(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=50),
-    destination: Optional[str] = Query(None),
-    start_date_from: Optional[date] = Query(None),
-    start_date_to: Optional[date] = Query(None),
-    budget_min: Optional[float] = Query(None),
-    budget_max: Optional[float] = Query(None),
-    available_slots_only: bool = Query(False),
+    sort: str = Query("start_date", pattern="^(start_date|relevance)$"),
+    filters: TripFeedFilters = Depends(),
+    current_user: Optional[User] = Depends(get_optional_user),
     db: Session = Depends(get_db)
 ):
-    """Get paginated trip feed with filters"""
+    """Get paginated trip feed with filters, by start date or by relevance to the user"""
     try:
-        # Build query
-        query = db.query(Trip).options(
-            joinedload(Trip.host),
-            joinedload(Trip.creator)
-        ).filter(Trip.status == "active")
-        
-        # Apply filters
-        if destination:
-            query = query.filter(Trip.destination.ilike(f"%{destination}%"))
-        
-        if start_date_from:
-            query = query.filter(Trip.start_date >= start_date_from)
-            
-        if start_date_to:
-            query = query.filter(Trip.start_date <= start_date_to)
-        
-        if budget_min is not None:
-            query = query.filter(
-                or_(Trip.budget_min.is_(None), Trip.budget_min >= budget_min)
-            )
-            
-        if budget_max is not None:
-            query = query.filter(
-                or_(Trip.budget_max.is_(None), Trip.budget_max <= budget_max)
-            )
+        # Answer conditional requests before loading any rows; relevance
+        # pages are personalized and are not cached
+        if sort == "start_date":
+            etag = feed_etag(db, filters, page, per_page)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            response.headers["ETag"] = etag
         
-        if available_slots_only:
-            query = query.filter(Trip.current_participants < Trip.open_slots)
-        
-        # Get total count
-        total = query.count()
-        
-        # Apply pagination and ordering
-        trips = query.order_by(Trip.start_date.asc()).offset(
-            (page - 1) * per_page
-        ).limit(per_page).all()
+        # Apply pagination and ordering; host profiles come from the entity cache
+        if sort == "relevance":
+            candidate_ids = [
+                row[0] for row in filters.apply(db.query(Trip.id)).order_by(
+                    Trip.start_date.asc()
+                ).limit(RANKING_MAX_CANDIDATES)
+            ]
+            ranked_ids = rank_trips(db, current_user.id if current_user else None, candidate_ids)
+            # Only the first RANKING_MAX_CANDIDATES matches are ranked and paged
+            total = len(ranked_ids)
+            page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+            trips_by_id = {trip.id: trip for trip in db.query(Trip).filter(Trip.id.in_(page_ids))}
+            trips = [trips_by_id[trip_id] for trip_id in page_ids if trip_id in trips_by_id]
+        else:
+            total = feed_total(db, filters)
+            trips = feed_page(db, filters, (page - 1) * per_page, per_page)
         
         return TripFeedResponse(
-            trips=trips,
+            trips=with_profiles(db, trips, host="host_id"),
             total=total,
             page=page,
             per_page=per_page
@@ -108,58 +183,158 @@ async def get_trip_feed(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error fetching trips: {str(e)}")
 
+@router.get("/facets", response_model=TripFacetsResponse)
+async def get_trip_facets(
+    filters: TripFeedFilters = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Get facet counts (destination, start month, budget bucket, open slots) for the feed filters"""
+    try:
+        return get_facets(db, filters)
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error fetching facets: {str(e)}")
+
 @router.get("/{trip_id}", response_model=TripDetail)
 async def get_trip_details(
     trip_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get detailed trip information"""
+    etag = trip_etag(db, trip_id)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
     trip = db.query(Trip).options(
-        joinedload(Trip.host),
-        joinedload(Trip.creator),
-        joinedload(Trip.participants).joinedload(TripParticipant.user)
+        joinedload(Trip.participants)
     ).filter(Trip.id == trip_id).first()
     
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    return trip
+    # The strong ETag hashes the profiles' updated_at, so they are read from
+    # the database (after the ETag, never older than it) rather than from
+    # this worker's cache, and the cache is refreshed with them
+    users = get_users(db, [trip.host_id, trip.user_id] + [p.user_id for p in trip.participants], fresh=True)
+    return ProfileView(
+        trip,
+        host=users.get(trip.host_id),
+        creator=users.get(trip.user_id),
+        participants=[ProfileView(p, user=users.get(p.user_id)) for p in trip.participants]
+    )
+
+@router.get("/{trip_id}/similar", response_model=List[TripSummary])
+async def get_similar_trips(
+    trip_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get active trips similar to a trip (destination, dates, budget, open slots)"""
+    # Served from the precomputed neighbor table, ordered by rank
+    neighbor_ids = [
+        row[0] for row in db.query(TripNeighbor.neighbor_id).filter(
+            TripNeighbor.trip_id == trip_id
+        ).order_by(TripNeighbor.rank)
+    ]
+    
+    trips = get_trips(db, neighbor_ids)
+    similar = [
+        trips[neighbor_id] for neighbor_id in neighbor_ids
+        if neighbor_id in trips and trips[neighbor_id].status == "active"
+    ]
+    return with_profiles(db, similar, host="host_id")
 
-@router.get("/user/my-trips", response_model=List[TripSchema])
+@router.get("/user/my-trips", response_model=List[MyTrip])
 async def get_user_trips(
+    response: Response,
+    role: Optional[str] = Query(None, pattern="^(host|participant)$"),
+    status: Optional[str] = Query(None, pattern="^(active|completed|cancelled)$"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get current user's trips (both hosted and participating)"""
+    """Get current user's trips (both hosted and participating), newest first.
+    
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    try:
+        start_after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        # Get trips where user is host or participant
-        hosted_trips = db.query(Trip).options(
-            joinedload(Trip.host),
-            joinedload(Trip.creator)
-        ).filter(Trip.host_id == current_user.id).all()
+        # One query: hosted trips plus trips joined through a participant row.
+        # Membership is matched with IN rather than on the outer join so both
+        # sides can use their (host_id, ...) and (user_id, role, ...) indexes
+        member_trip_ids = db.query(TripParticipant.trip_id).filter(
+            TripParticipant.user_id == current_user.id
+        )
+        user_role = case(
+            (Trip.host_id == current_user.id, "host"),
+            else_=TripParticipant.role
+        ).label("role")
         
-        participant_trip_ids = db.query(TripParticipant.trip_id).filter(
+        query = db.query(Trip, user_role).outerjoin(
+            TripParticipant,
             and_(
-                TripParticipant.user_id == current_user.id,
-                TripParticipant.role == "participant"
+                TripParticipant.trip_id == Trip.id,
+                TripParticipant.user_id == current_user.id
             )
-        ).all()
+        )
         
-        participating_trips = []
-        if participant_trip_ids:
-            trip_ids = [t[0] for t in participant_trip_ids]
-            participating_trips = db.query(Trip).options(
-                joinedload(Trip.host),
-                joinedload(Trip.creator)
-            ).filter(Trip.id.in_(trip_ids)).all()
+        if role == "host":
+            query = query.filter(Trip.host_id == current_user.id)
+        elif role == "participant":
+            query = query.filter(
+                and_(Trip.host_id != current_user.id, Trip.id.in_(member_trip_ids))
+            )
+        else:
+            query = query.filter(
+                or_(Trip.host_id == current_user.id, Trip.id.in_(member_trip_ids))
+            )
+        
+        if status:
+            query = query.filter(Trip.status == status)
+        
+        # Keyset pagination on (start_date, id)
+        if start_after:
+            last_start_date, last_id = date.fromisoformat(start_after[0]), start_after[1]
+            query = query.filter(or_(
+                Trip.start_date < last_start_date,
+                and_(Trip.start_date == last_start_date, Trip.id < last_id)
+            ))
         
-        # Combine and remove duplicates
-        all_trips = {trip.id: trip for trip in hosted_trips + participating_trips}
-        return list(all_trips.values())
+        rows = query.order_by(Trip.start_date.desc(), Trip.id.desc()).limit(limit + 1).all()
+        
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_trip = rows[-1][0]
+            response.headers["X-Next-Cursor"] = encode_cursor(last_trip.start_date, last_trip.id)
+        
+        trips = with_profiles(db, [trip for trip, _ in rows], host="host_id", creator="user_id")
+        return [ProfileView(trip, role=trip_role) for trip, (_, trip_role) in zip(trips, rows)]
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error fetching user trips: {str(e)}")
 
+@router.get("/user/dashboard", response_model=HostDashboardResponse)
+async def get_host_dashboard_view(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the current user's hosted trips with request counts, occupancy and latest pending requests"""
+    try:
+        return get_host_dashboard(db, current_user.id)
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error fetching dashboard: {str(e)}")
+
 @router.put("/{trip_id}", response_model=TripSchema)
 async def update_trip(
     trip_id: int,
@@ -168,7 +343,7 @@ async def update_trip(
     db: Session = Depends(get_db)
 ):
     """Update trip details (only by host)"""
-    trip = db.query(Trip).filter(Trip.id == trip_id).first()
+    trip = trip_by_id(db, trip_id)
     
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -176,11 +351,19 @@ async def update_trip(
     if trip.host_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only trip host can update trip details")
     
+    update_data = trip_update.dict(exclude_unset=True)
+    error = trip_bounds_error(**{
+        field: update_data.get(field, getattr(trip, field))
+        for field in ("start_date", "end_date", "budget_min", "budget_max")
+    })
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
     try:
         # Update fields if provided
-        update_data = trip_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(trip, field, value)
+        queue_neighbor_refresh(db, [trip.id])
         
         db.commit()
         db.refresh(trip)
@@ -197,7 +380,7 @@ async def cancel_trip(
     db: Session = Depends(get_db)
 ):
     """Cancel a trip (only by host)"""
-    trip = db.query(Trip).filter(Trip.id == trip_id).first()
+    trip = trip_by_id(db, trip_id)
     
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -207,6 +390,11 @@ async def cancel_trip(
     
     try:
         trip.status = "cancelled"
+        enqueue(db, "trip.cancelled", trip_id=trip_id, host_id=current_user.id)
+        record_activity(
+            db, "trip.cancelled", trip_id, current_user.id, set(trip_members(db, trip_id)) - {current_user.id}
+        )
+        queue_neighbor_refresh(db, [trip_id])
         db.commit()
         return {"message": "Trip cancelled successfully"}
         
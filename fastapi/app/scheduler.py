@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+import zlib
+
+from app.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "True").lower() == "true"
+
+@contextmanager
+def advisory_lock(key: int):
+    """Try to take a cluster-wide lock; yields False if another worker holds it.
+
+    Uses a session-level Postgres advisory lock. Other databases have no
+    equivalent, so the lock is always granted there.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    with engine.connect() as connection:
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": key}
+        ).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                connection.commit()
+
+class PeriodicJob:
+    """A function run every `interval` seconds by at most one worker at a time"""
+    def __init__(self, name: str, func: Callable[[Session], Dict[str, int]], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.lock_key = zlib.crc32(f"tripnect:{name}".encode())
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.totals: Dict[str, int] = {}
+        self.last_started_at: Optional[datetime] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_result: Optional[Dict[str, int]] = None
+        self.last_error: Optional[str] = None
+
+    def run_once(self) -> Optional[Dict[str, int]]:
+        """Run the job now unless another worker is already running it"""
+        with advisory_lock(self.lock_key) as acquired:
+            if not acquired:
+                self.skipped += 1
+                return None
+
+            self.last_started_at = datetime.now(timezone.utc)
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                result = self.func(db) or {}
+                self.runs += 1
+                self.last_result = result
+                self.last_error = None
+                for key, value in result.items():
+                    self.totals[key] = self.totals.get(key, 0) + value
+                return result
+            except Exception as e:
+                db.rollback()
+                self.failures += 1
+                self.last_error = str(e)
+                logger.exception("Job %s failed", self.name)
+                return None
+            finally:
+                db.close()
+                self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def run_forever(self):
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "totals": self.totals,
+            "last_started_at": self.last_started_at,
+            "last_duration_ms": self.last_duration_ms,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+class Scheduler:
+    """Runs registered periodic jobs as background tasks of the event loop"""
+    def __init__(self):
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, job: PeriodicJob):
+        self.jobs[job.name] = job
+
+    def start(self):
+        if not SCHEDULER_ENABLED:
+            return
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(job.run_forever(), name=f"job:{job.name}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def metrics(self) -> Dict[str, Any]:
+        return {name: job.metrics() for name, job in self.jobs.items()}
+
+scheduler = Scheduler()
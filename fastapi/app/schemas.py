@@ -22,6 +22,18 @@ class UserProfile(User):
     pass
 
 # Trip schemas
+def trip_bounds_error(start_date=None, end_date=None, budget_min=None, budget_max=None) -> Optional[str]:
+    """Why a trip's dates or budget are inverted, or None.
+
+    PostgreSQL cannot build the daterange/numrange of an inverted trip,
+    which the overlap filters and their indexes rely on.
+    """
+    if start_date is not None and end_date is not None and end_date <= start_date:
+        return 'End date must be after start date'
+    if budget_min is not None and budget_max is not None and budget_max < budget_min:
+        return 'Maximum budget must not be less than minimum budget'
+    return None
+
 class TripBase(BaseModel):
     title: str
     destination: str
@@ -45,9 +57,38 @@ class TripBase(BaseModel):
             raise ValueError('Open slots must be at least 1')
         return v
 
+    @validator('budget_max')
+    def budget_max_not_below_budget_min(cls, v, values):
+        error = trip_bounds_error(budget_min=values.get('budget_min'), budget_max=v)
+        if error:
+            raise ValueError(error)
+        return v
+
 class TripCreate(TripBase):
     pass
 
+class TripBatchCreate(BaseModel):
+    # Items are validated one by one against TripCreate so a bad item
+    # does not reject the whole batch
+    trips: List[Dict[str, Any]]
+
+    @validator('trips')
+    def validate_batch_size(cls, v):
+        if not 1 <= len(v) <= 200:
+            raise ValueError('A batch must contain between 1 and 200 trips')
+        return v
+
+class TripBatchItemResult(BaseModel):
+    index: int
+    status: str  # created, invalid
+    trip_id: Optional[int] = None
+    error: Optional[str] = None
+
+class TripBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[TripBatchItemResult]
+
 class TripUpdate(BaseModel):
     title: Optional[str] = None
     destination: Optional[str] = None
@@ -59,12 +100,28 @@ class TripUpdate(BaseModel):
     budget_max: Optional[Decimal] = None
     preferences: Optional[Dict[str, Any]] = None
 
+    # Bounds given together are checked here; update_trip checks them against the stored trip
+    @validator('end_date')
+    def end_date_after_start_date(cls, v, values):
+        error = trip_bounds_error(start_date=values.get('start_date'), end_date=v)
+        if error:
+            raise ValueError(error)
+        return v
+
+    @validator('budget_max')
+    def budget_max_not_below_budget_min(cls, v, values):
+        error = trip_bounds_error(budget_min=values.get('budget_min'), budget_max=v)
+        if error:
+            raise ValueError(error)
+        return v
+
 class Trip(TripBase):
     id: int
     user_id: int
     host_id: int
     status: str
     current_participants: int
+    pending_requests: int = 0
     created_at: datetime
     updated_at: datetime
     host: UserProfile
@@ -73,6 +130,9 @@ class Trip(TripBase):
     class Config:
         from_attributes = True
 
+class MyTrip(Trip):
+    role: str  # host, participant
+
 class TripDetail(Trip):
     participants: List['TripParticipant']
     
@@ -140,6 +200,8 @@ class GroupChatBase(BaseModel):
 class GroupChat(GroupChatBase):
     id: int
     trip_id: int
+    message_count: int = 0
+    last_message_id: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -169,9 +231,97 @@ class TripFeedResponse(BaseModel):
     page: int
     per_page: int
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class TripFacetsResponse(BaseModel):
+    total: int
+    destinations: List[FacetCount]
+    start_months: List[FacetCount]
+    budget_buckets: List[FacetCount]
+    has_open_slots: int
+
+class DashboardPendingRequest(BaseModel):
+    id: int
+    user_id: int
+    message: Optional[str] = None
+    created_at: datetime
+    user: UserProfile
+
+class DashboardTrip(BaseModel):
+    id: int
+    title: str
+    destination: str
+    start_date: date
+    end_date: date
+    status: str
+    open_slots: int
+    current_participants: int
+    occupancy: float  # current_participants / open_slots
+    pending_requests: int
+    accepted_requests: int
+    rejected_requests: int
+    latest_pending: List[DashboardPendingRequest]
+
+class HostDashboardResponse(BaseModel):
+    trips: List[DashboardTrip]
+    total_trips: int
+    total_pending_requests: int
+    total_participants: int
+
 class RequestStatusUpdate(BaseModel):
     message: str
     request: TripRequest
 
+# Activity schemas
+class ActivityItem(BaseModel):
+    id: int
+    event_type: str
+    trip_id: int
+    actor_id: int
+    subject_id: Optional[int] = None
+    data: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    actor: Optional[UserProfile] = None
+    trip: Optional[TripSummary] = None
+    
+    class Config:
+        from_attributes = True
+
+# Batch schemas
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # echoed back to match responses to requests
+    method: str = "GET"
+    path: str  # e.g. /api/v1/trips/42?include=host
+    body: Optional[Any] = None
+    headers: Optional[Dict[str, str]] = None  # e.g. If-None-Match
+    timeout_ms: Optional[int] = None
+
+    @validator('method')
+    def validate_method(cls, v):
+        v = v.upper()
+        if v not in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE'):
+            raise ValueError('Method must be one of GET, POST, PUT, PATCH, DELETE')
+        return v
+
+    @validator('timeout_ms')
+    def validate_timeout(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('timeout_ms must be positive')
+        return v
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchItemResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchItemResponse]
+
 # Update forward references
 TripDetail.model_rebuild()
\ No newline at end of file
@@ -0,0 +1,307 @@
+"""
+Pre-forking production server
+
+The master process imports the app once, binds the listening socket and
+forks the workers, so they share the loaded modules copy-on-write. Each
+worker runs uvicorn on the inherited socket (with uvloop and httptools when
+installed), warms up in the app lifespan before it accepts connections, and
+exits gracefully after MAX_REQUESTS requests or once its resident memory
+passes MAX_WORKER_MEMORY_MB; the master then forks a replacement.
+
+Signals to the master: SIGTERM/SIGINT stop all workers gracefully, SIGHUP
+recycles them one at a time: each replacement is forked and has finished
+its startup before the worker it replaces is stopped.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import gc
+import importlib.util
+import logging
+import os
+import random
+import resource
+import signal
+import socket
+import time
+
+import uvicorn
+
+logger = logging.getLogger("uvicorn.error")
+
+SERVE_HOST = os.getenv("HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("PORT", "8000"))
+# Defaults to one worker per CPU available to the process
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+# Requests served before a worker is recycled (0 disables), plus up to
+# MAX_REQUESTS_JITTER more so workers do not all restart at once
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+MAX_WORKER_MEMORY_MB = int(os.getenv("MAX_WORKER_MEMORY_MB", "0"))
+MEMORY_CHECK_INTERVAL_SECONDS = int(os.getenv("MEMORY_CHECK_INTERVAL_SECONDS", "10"))
+KEEP_ALIVE_SECONDS = int(os.getenv("KEEP_ALIVE_SECONDS", "5"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+# A replacement forked by SIGHUP that has not started by then is stopped and retried
+WORKER_READY_TIMEOUT_SECONDS = float(os.getenv("WORKER_READY_TIMEOUT_SECONDS", "60"))
+
+# A worker dying sooner than this is treated as a crash and restarted with a delay
+MIN_WORKER_LIFETIME_SECONDS = 1.0
+
+def default_workers() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that writes a byte to ready_fd once it accepts connections"""
+    def __init__(self, config: uvicorn.Config, ready_fd: Optional[int] = None):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.ready_fd is not None and self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+            self.ready_fd = None
+
+class Master:
+    """Forks and supervises uvicorn workers sharing one listening socket"""
+    def __init__(
+        self,
+        app,
+        host: str = SERVE_HOST,
+        port: int = SERVE_PORT,
+        workers: Optional[int] = None,
+        max_requests: int = MAX_REQUESTS,
+        max_requests_jitter: int = MAX_REQUESTS_JITTER,
+        max_memory_mb: int = MAX_WORKER_MEMORY_MB,
+        keep_alive: int = KEEP_ALIVE_SECONDS,
+        backlog: int = BACKLOG,
+        graceful_timeout: int = GRACEFUL_TIMEOUT_SECONDS,
+        log_level: str = "info",
+    ):
+        self.app = app
+        self.workers = workers or WEB_CONCURRENCY or default_workers()
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_memory_mb = max_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.config_options = dict(
+            host=host,
+            port=port,
+            loop=event_loop(),
+            http=http_protocol(),
+            lifespan="on",
+            backlog=backlog,
+            timeout_keep_alive=keep_alive,
+            timeout_graceful_shutdown=graceful_timeout,
+            log_level=log_level,
+        )
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.stop_deadline: Optional[float] = None
+        # Rolling restart: workers still to replace, and the pending replacement
+        # as (pid, read end of its ready pipe, deadline)
+        self.recycle_queue: List[int] = []
+        self.replacement: Optional[Tuple[int, int, float]] = None
+        self.retiring: Set[int] = set()
+
+    def _config(self, **overrides) -> uvicorn.Config:
+        return uvicorn.Config(self.app, **{**self.config_options, **overrides})
+
+    # Worker side
+
+    def _run_worker(self, sock: socket.socket, ready_fd: Optional[int] = None):
+        # The master's handlers must not run in the worker; uvicorn installs its own
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+
+        # Pooled connections must never be shared across processes
+        from app.database import engine
+        engine.dispose(close=False)
+
+        limit = None
+        if self.max_requests:
+            limit = self.max_requests + random.randint(0, self.max_requests_jitter)
+        config = self._config(limit_max_requests=limit, timeout_notify=MEMORY_CHECK_INTERVAL_SECONDS)
+        server = WorkerServer(config, ready_fd)
+
+        if self.max_memory_mb:
+            async def check_memory():
+                # Also called once at startup, before any request could have grown the worker
+                if not server.server_state.total_requests or server.should_exit:
+                    return
+                rss_mb = rss_bytes() / (1024 * 1024)
+                if rss_mb > self.max_memory_mb:
+                    logger.info("Worker %d uses %.0f MB, recycling", os.getpid(), rss_mb)
+                    server.should_exit = True
+            config.callback_notify = check_memory
+
+        server.run(sockets=[sock])
+
+    def _spawn(self, sock: socket.socket, ready_fd: Optional[int] = None) -> int:
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                self._run_worker(sock, ready_fd)
+                status = 0
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+            finally:
+                os._exit(status)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    # Master side
+
+    def _signal_workers(self, signum: int):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _handle_stop(self, signum, frame):
+        if not self.stopping:
+            logger.info("Stopping %d workers", len(self.children))
+            self.stopping = True
+            self.recycle_queue = []
+            self.stop_deadline = time.monotonic() + self.graceful_timeout + 5
+            self._signal_workers(signal.SIGTERM)
+
+    def _handle_recycle(self, signum, frame):
+        if self.stopping:
+            return
+        pending = self.replacement[0] if self.replacement else None
+        self.recycle_queue = [pid for pid in self.children if pid != pending and pid not in self.retiring]
+        logger.info("Recycling %d workers one at a time", len(self.recycle_queue))
+
+    def _start_replacement(self, sock: socket.socket):
+        read_fd, write_fd = os.pipe()
+        pid = self._spawn(sock, write_fd)
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        self.replacement = (pid, read_fd, time.monotonic() + WORKER_READY_TIMEOUT_SECONDS)
+
+    def _end_replacement(self):
+        os.close(self.replacement[1])
+        self.replacement = None
+
+    def _retire(self, pid: int):
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _recycle(self, sock: socket.socket):
+        """Advance the rolling restart by at most one worker"""
+        # Workers that exited on their own meanwhile were already replaced
+        self.recycle_queue = [pid for pid in self.recycle_queue if pid in self.children]
+        if self.stopping or (not self.recycle_queue and self.replacement is None):
+            if self.replacement is not None:
+                self._end_replacement()
+            return
+
+        if self.replacement is None:
+            self._start_replacement(sock)
+            return
+
+        pid, read_fd, deadline = self.replacement
+        if pid not in self.children:
+            # Died before it was ready; _reap logged it, try again
+            self._end_replacement()
+            return
+        try:
+            ready = os.read(read_fd, 1)
+        except BlockingIOError:
+            ready = b""
+        if ready:
+            self._end_replacement()
+            old = self.recycle_queue.pop(0)
+            logger.info("Worker %d ready, stopping worker %d", pid, old)
+            self._retire(old)
+        elif time.monotonic() > deadline:
+            logger.error("Worker %d did not start within %.0fs, retrying", pid, WORKER_READY_TIMEOUT_SECONDS)
+            self._end_replacement()
+            self._retire(pid)
+
+    def _reap(self, sock: socket.socket):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                continue
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self.replacement and pid == self.replacement[0]:
+                # _recycle forks another; the worker it was to replace keeps serving
+                logger.error("Replacement worker %d exited with %d before it was ready", pid, code)
+                time.sleep(1)
+                continue
+            if code != 0 and time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+                logger.error("Worker %d exited with %d right after starting; retrying in 1s", pid, code)
+                time.sleep(1)
+            self._spawn(sock)
+
+    def run(self):
+        config = self._config()
+        sock = config.bind_socket()
+        logger.info(
+            "Starting %d workers (loop=%s, http=%s, keep-alive=%ds, backlog=%d)",
+            self.workers, config.loop, config.http, config.timeout_keep_alive, config.backlog,
+        )
+
+        # Objects loaded so far are shared with every worker; keep the garbage
+        # collector from touching (and so copying) their pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_recycle)
+        for _ in range(self.workers):
+            self._spawn(sock)
+
+        while self.children:
+            self._reap(sock)
+            self._recycle(sock)
+            if self.stopping and time.monotonic() > self.stop_deadline:
+                logger.warning("Killing %d workers after the graceful timeout", len(self.children))
+                self._signal_workers(signal.SIGKILL)
+                self.stop_deadline = float("inf")
+            time.sleep(0.2)
+        sock.close()
+
+def serve(**options):
+    """Run the app with pre-forked workers (a single uvicorn process where fork is unavailable)"""
+    from app.main import app
+
+    if not hasattr(os, "fork"):
+        uvicorn.run(app, host=options.get("host", SERVE_HOST), port=options.get("port", SERVE_PORT))
+        return
+    Master(app, **options).run()
@@ -0,0 +1,235 @@
+from datetime import datetime, timezone
+from sqlalchemy import delete, insert, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List
+import os
+
+import numpy as np
+
+from app.models import Trip, TripNeighbor, TripNeighborRefresh
+from app.ranking import (
+    feature_store, COL_BUDGET, COL_AVAILABILITY, COL_DESTINATION, COL_START, COL_END,
+    COL_LATITUDE, COL_LONGITUDE, COL_TAGS
+)
+from app.geo import EARTH_RADIUS_KM
+
+SIMILAR_TRIPS_K = int(os.getenv("SIMILAR_TRIPS_K", "10"))
+SIMILAR_TRIPS_REBUILD_INTERVAL_SECONDS = float(os.getenv("SIMILAR_TRIPS_REBUILD_INTERVAL_SECONDS", "21600"))
+# Queued trip writes are refreshed together this often
+SIMILAR_TRIPS_REFRESH_INTERVAL_SECONDS = float(os.getenv("SIMILAR_TRIPS_REFRESH_INTERVAL_SECONDS", "5"))
+# Best-scoring trips per changed trip checked against their stored K-th neighbor
+SIMILAR_TRIPS_RESCORE_CANDIDATES = int(os.getenv("SIMILAR_TRIPS_RESCORE_CANDIDATES", "500"))
+
+# Size of each (batch x trips) float64 temporary of a scoring pass; the
+# number of trips per batch follows from the number of trips compared to
+SIMILARITY_BATCH_MB = float(os.getenv("SIMILARITY_BATCH_MB", "32"))
+MAX_BATCH_SIZE = 256
+
+# Trip ids bound per IN (...) list
+ID_CHUNK_SIZE = 1000
+
+SIMILARITY_WEIGHTS = {
+    "destination": 3.0,
+    "dates": 2.0,
+    "budget": 1.5,
+    "tags": 1.0,
+}
+
+# Days of gap between two trips at which date similarity has decayed to ~37%
+DATE_GAP_SCALE_DAYS = 14.0
+
+# Distance between destinations at which destination similarity has decayed to ~37%
+DISTANCE_SCALE_KM = 100.0
+
+def _pairwise_distance_km(rows: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Great-circle distances between destinations (B x N), NaN where not geocoded"""
+    lat1 = np.radians(rows[:, None, COL_LATITUDE])
+    lat2 = np.radians(matrix[None, :, COL_LATITUDE])
+    dlon = np.radians(matrix[None, :, COL_LONGITUDE] - rows[:, None, COL_LONGITUDE])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def similarity(rows: np.ndarray, matrix: np.ndarray, exclude_full: bool = True) -> np.ndarray:
+    """Similarity of each trip in `rows` (B x F) to every trip in `matrix` (N x F), as B x N.
+
+    The score itself is symmetric; with exclude_full, trips of `matrix` without
+    open slots score -inf so they are never suggested.
+    """
+    # Same destination, or nearby ones by distance when both are geocoded
+    same_destination = rows[:, None, COL_DESTINATION] == matrix[None, :, COL_DESTINATION]
+    with np.errstate(invalid="ignore"):
+        nearby = np.exp(-_pairwise_distance_km(rows, matrix) / DISTANCE_SCALE_KM)
+    destination = np.maximum(same_destination, np.nan_to_num(nearby, nan=0.0))
+
+    # Overlapping days relative to the shorter trip; gaps decay exponentially
+    overlap = (
+        np.minimum(rows[:, None, COL_END], matrix[None, :, COL_END])
+        - np.maximum(rows[:, None, COL_START], matrix[None, :, COL_START]) + 1
+    )
+    shorter = np.minimum(
+        rows[:, None, COL_END] - rows[:, None, COL_START],
+        matrix[None, :, COL_END] - matrix[None, :, COL_START]
+    ) + 1
+    dates = np.where(
+        overlap > 0,
+        np.clip(overlap / shorter, 0.0, 1.0),
+        0.5 * np.exp(overlap / DATE_GAP_SCALE_DAYS)
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        budget = np.exp(-np.abs(np.log(rows[:, None, COL_BUDGET] / matrix[None, :, COL_BUDGET])))
+    budget = np.where(np.isnan(budget), 0.5, budget)
+
+    row_tags = rows[:, COL_TAGS:]
+    tags = row_tags @ matrix[:, COL_TAGS:].T
+    tags /= np.maximum(row_tags.sum(axis=1, keepdims=True), 1.0)
+
+    scores = (
+        SIMILARITY_WEIGHTS["destination"] * destination
+        + SIMILARITY_WEIGHTS["dates"] * dates
+        + SIMILARITY_WEIGHTS["budget"] * budget
+        + SIMILARITY_WEIGHTS["tags"] * tags
+    )
+    if exclude_full:
+        scores[:, matrix[:, COL_AVAILABILITY] <= 0] = -np.inf
+    return scores
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, self_ids: np.ndarray, k: int) -> List[List[tuple]]:
+    scores[ids[None, :] == self_ids[:, None]] = -np.inf
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return [[] for _ in range(len(self_ids))]
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    neighbors = []
+    for row, columns in enumerate(top):
+        columns = columns[np.argsort(-scores[row, columns], kind="stable")]
+        neighbors.append([
+            (int(ids[column]), float(scores[row, column]))
+            for column in columns if np.isfinite(scores[row, column])
+        ])
+    return neighbors
+
+def _write_neighbors(db: Session, trip_ids: Iterable[int], neighbors: List[List[tuple]]):
+    trip_ids = list(trip_ids)
+    db.execute(delete(TripNeighbor).where(TripNeighbor.trip_id.in_(trip_ids)))
+    rows = [
+        {"trip_id": trip_id, "rank": rank, "neighbor_id": neighbor_id, "score": score}
+        for trip_id, trip_neighbors in zip(trip_ids, neighbors)
+        for rank, (neighbor_id, score) in enumerate(trip_neighbors, start=1)
+    ]
+    if rows:
+        db.execute(insert(TripNeighbor), rows)
+
+def batch_size(n_trips: int) -> int:
+    """Rows scored per batch so each (batch x n_trips) temporary stays within SIMILARITY_BATCH_MB"""
+    return int(min(max(SIMILARITY_BATCH_MB * 2 ** 20 // (8 * max(n_trips, 1)), 1), MAX_BATCH_SIZE))
+
+def _recompute(db: Session, trip_ids: np.ndarray, ids: np.ndarray, matrix: np.ndarray):
+    positions = np.searchsorted(ids, trip_ids)
+    size = batch_size(len(ids))
+    for start in range(0, len(trip_ids), size):
+        batch = trip_ids[start:start + size]
+        scores = similarity(matrix[positions[start:start + size]], matrix)
+        _write_neighbors(db, batch.tolist(), _top_k(ids, scores, batch, SIMILAR_TRIPS_K))
+
+def _thresholds(db: Session, trip_ids: List[int]) -> Dict[int, float]:
+    """Score a trip must beat to enter each trip's top-K, -inf while it has fewer than K"""
+    thresholds = {trip_id: -np.inf for trip_id in trip_ids}
+    for start in range(0, len(trip_ids), ID_CHUNK_SIZE):
+        chunk = trip_ids[start:start + ID_CHUNK_SIZE]
+        rows = db.query(
+            TripNeighbor.trip_id, func.min(TripNeighbor.score), func.count(TripNeighbor.rank)
+        ).filter(TripNeighbor.trip_id.in_(chunk)).group_by(TripNeighbor.trip_id)
+        for trip_id, kth, count in rows:
+            if count >= SIMILAR_TRIPS_K:
+                thresholds[trip_id] = kth
+    return thresholds
+
+def refresh_neighbors(db: Session, changed_ids: Iterable[int]) -> Dict[str, int]:
+    """Update the neighbor table after the given trips were created, updated or cancelled.
+
+    Recomputes the changed trips themselves and every trip whose top-K could
+    be affected: trips that list a changed trip, and trips for which a
+    changed trip now scores above their current K-th neighbor. Only the
+    SIMILAR_TRIPS_RESCORE_CANDIDATES best-scoring trips of each changed trip
+    are checked; the periodic rebuild catches the rest.
+    """
+    changed = np.array(sorted(set(changed_ids)), dtype=np.int64)
+    feature_store.refresh(db)
+    ids, matrix, _ = feature_store.snapshot()
+
+    active = changed[np.isin(changed, ids)]
+    inactive = changed[~np.isin(changed, ids)]
+    if len(inactive):
+        db.execute(delete(TripNeighbor).where(TripNeighbor.trip_id.in_(inactive.tolist())))
+
+    affected = set(
+        row[0] for row in db.query(TripNeighbor.trip_id).filter(
+            TripNeighbor.neighbor_id.in_(changed.tolist())
+        ).distinct()
+    )
+
+    # Similarity is symmetric, so one row per changed trip scores it for everyone
+    positions = np.searchsorted(ids, active)
+    size = batch_size(len(ids))
+    for start in range(0, len(active), size):
+        scores = similarity(matrix[positions[start:start + size]], matrix, exclude_full=False)
+        limit = min(SIMILAR_TRIPS_RESCORE_CANDIDATES, scores.shape[1])
+        columns = np.unique(np.argpartition(-scores, limit - 1, axis=1)[:, :limit])
+        thresholds = _thresholds(db, ids[columns].tolist())
+        limits = np.array([thresholds[trip_id] for trip_id in ids[columns].tolist()])
+        candidates = (scores[:, columns] > limits[None, :]).any(axis=0)
+        affected.update(ids[columns[candidates]].tolist())
+
+    affected.update(active.tolist())
+    affected = np.array(sorted(affected & set(ids.tolist())), dtype=np.int64)
+    _recompute(db, affected, ids, matrix)
+    db.commit()
+    return {"changed": len(changed), "recomputed": len(affected)}
+
+def rebuild_neighbors(db: Session) -> Dict[str, int]:
+    """Recompute the neighbor lists of every active trip"""
+    feature_store.refresh(db)
+    ids, matrix, _ = feature_store.snapshot()
+    db.execute(delete(TripNeighbor).where(TripNeighbor.trip_id.notin_(
+        select(Trip.id).where(Trip.status == "active")
+    )))
+    _recompute(db, ids, ids, matrix)
+    db.commit()
+    return {"recomputed": len(ids)}
+
+def queue_neighbor_refresh(db: Session, trip_ids: Iterable[int]):
+    """Queue trips for the next refresh_queued_neighbors run, in the caller's transaction"""
+    trip_ids = sorted(set(trip_ids))
+    if not trip_ids:
+        return
+    now = datetime.now(timezone.utc)
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(TripNeighborRefresh)
+    # A trip queued again moves its queued_at past any refresh already under way
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[TripNeighborRefresh.trip_id], set_={"queued_at": statement.excluded.queued_at}
+        ),
+        [{"trip_id": trip_id, "queued_at": now} for trip_id in trip_ids]
+    )
+
+def refresh_queued_neighbors(db: Session) -> Dict[str, int]:
+    """Refresh the neighbor lists after every trip write queued so far, in one pass.
+
+    Trips queued again while this runs keep their queue entry for the next
+    run. The feature store of this worker is told about the queued trips,
+    since they were usually written by other workers.
+    """
+    started = datetime.now(timezone.utc)
+    trip_ids = [row[0] for row in db.query(TripNeighborRefresh.trip_id)]
+    if not trip_ids:
+        return {"changed": 0, "recomputed": 0}
+    for trip_id in trip_ids:
+        feature_store.mark_dirty(trip_id)
+    db.execute(delete(TripNeighborRefresh).where(
+        TripNeighborRefresh.trip_id.in_(trip_ids), TripNeighborRefresh.queued_at <= started
+    ))
+    return refresh_neighbors(db, trip_ids)
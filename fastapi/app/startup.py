@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import os
+import time
+
+class StartupReport:
+    """Milliseconds spent in each startup phase, from the first app import to serving.
+
+    Import and configuration happen once per process that imports the app
+    (the master under the pre-forking server); the remaining phases run in
+    the lifespan of every worker.
+    """
+    def __init__(self):
+        self.import_started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.ready_at: Optional[datetime] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def finish_import(self):
+        """Close the import phase; configuration time is reported separately"""
+        elapsed = (time.perf_counter() - self.import_started) * 1000
+        self.phases["import"] = round(elapsed - self.phases.get("configuration", 0.0), 2)
+
+    def ready(self):
+        self.ready_at = datetime.now(timezone.utc)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "phases_ms": dict(self.phases),
+            "total_ms": round(sum(self.phases.values()), 2),
+            "errors": dict(self.errors),
+            "ready_at": self.ready_at,
+        }
+
+startup_report = StartupReport()
@@ -0,0 +1,60 @@
+from sqlalchemy import lambda_stmt, select, func
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.models import Trip, TripParticipant, GroupChat, User
+from app.filters import TripFeedFilters
+
+# Statements run on nearly every request, built as lambda statements.
+#
+# A lambda statement is constructed once per code location: later calls
+# only read the closure variables as bound parameters and reuse the cached
+# construct, its cache key and its compiled SQL. The SQL text never varies,
+# so drivers with server-side prepared statements (see DB_PREPARE_THRESHOLD)
+# reuse the plan as well. Closures must only capture plain values.
+
+def trip_by_id(db: Session, trip_id: int) -> Optional[Trip]:
+    return db.scalars(lambda_stmt(lambda: select(Trip).where(Trip.id == trip_id))).first()
+
+def active_trip_by_id(db: Session, trip_id: int) -> Optional[Trip]:
+    return db.scalars(lambda_stmt(
+        lambda: select(Trip).where(Trip.id == trip_id, Trip.status == "active")
+    )).first()
+
+def chat_by_id(db: Session, chat_id: int) -> Optional[GroupChat]:
+    return db.scalars(lambda_stmt(lambda: select(GroupChat).where(GroupChat.id == chat_id))).first()
+
+def user_by_id(db: Session, user_id: int) -> Optional[User]:
+    return db.scalars(lambda_stmt(lambda: select(User).where(User.id == user_id))).first()
+
+def membership(db: Session, trip_id: int, user_id: int) -> Optional[TripParticipant]:
+    """The user's participant row on the trip, or None"""
+    return db.scalars(lambda_stmt(
+        lambda: select(TripParticipant).where(
+            TripParticipant.trip_id == trip_id, TripParticipant.user_id == user_id
+        )
+    )).first()
+
+def feed_total(db: Session, filters: TripFeedFilters) -> int:
+    """Number of trips in the feed.
+
+    The unfiltered feed is the cached skeleton; filtered feeds are built per
+    request and rely on the regular compiled cache.
+    """
+    if not filters.as_dict():
+        return db.scalar(lambda_stmt(
+            lambda: select(func.count(Trip.id)).where(Trip.status == "active")
+        ))
+    return db.scalar(filters.apply(select(func.count(Trip.id))))
+
+def feed_page(db: Session, filters: TripFeedFilters, offset: int, limit: int) -> List[Trip]:
+    """A page of the feed by start date"""
+    if not filters.as_dict():
+        return db.scalars(lambda_stmt(
+            lambda: select(Trip).where(Trip.status == "active").order_by(
+                Trip.start_date.asc()
+            ).offset(offset).limit(limit)
+        )).all()
+    return db.scalars(
+        filters.apply(select(Trip)).order_by(Trip.start_date.asc()).offset(offset).limit(limit)
+    ).all()
@@ -1,5 +1,7 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime, date
+import base64
+import hashlib
 import json
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -56,4 +58,58 @@ def build_trip_filters(
     if preferences:
         filters['preferences'] = preferences
     
-    return filters
\ No newline at end of file
+    return filters
+
+def encode_cursor(*values) -> str:
+    """Encode keyset pagination values as an opaque cursor"""
+    payload = json.dumps(values, cls=DateTimeEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor created by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+# Length of trip_tags.tag; longer tags keep a prefix and a digest of the rest
+MAX_TAG_LENGTH = 100
+
+def _fit_tag(tag: str) -> str:
+    if len(tag) <= MAX_TAG_LENGTH:
+        return tag
+    digest = hashlib.sha1(tag.encode()).hexdigest()[:20]
+    return f"{tag[:MAX_TAG_LENGTH - len(digest) - 1]}~{digest}"
+
+def normalize_tag(tag: str) -> str:
+    """A tag as stored in trip_tags: trimmed, lowercased and fit to MAX_TAG_LENGTH"""
+    return _fit_tag(str(tag).strip().lower())
+
+def preference_tags(preferences: Optional[Dict[str, Any]]) -> List[str]:
+    """Flatten a trip preferences dict into normalized tags.
+
+    {"tags": ["Trekking"], "women_only": true, "pace": "slow"}
+    -> ["trekking", "women_only", "pace=slow"]
+
+    Nested lists and objects are skipped. Tags longer than MAX_TAG_LENGTH
+    are shortened the same way for trips and for filters, so they still
+    match exactly.
+    """
+    tags = set()
+    for key, value in (preferences or {}).items():
+        key = str(key).strip().lower()
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if item is True:
+                tags.add(_fit_tag(key))
+            elif item is None or item is False or isinstance(item, (dict, list)):
+                continue
+            elif key == "tags":
+                tags.add(normalize_tag(item))
+            else:
+                tags.add(_fit_tag(f"{key}={str(item).strip().lower()}"))
+    return sorted(tags)
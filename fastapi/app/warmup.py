@@ -0,0 +1,31 @@
+from sqlalchemy import text
+import os
+
+from app.database import SessionLocal, engine
+from app.geo import get_gazetteer
+from app.ranking import feature_store
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+
+def connect_pool() -> int:
+    """Open the pool's persistent connections up front, returning how many were opened"""
+    connections = []
+    try:
+        for _ in range(engine.pool.size() if hasattr(engine.pool, "size") else 1):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+def prime_caches():
+    """Load the in-process state the first feed and similar-trips requests would build"""
+    get_gazetteer()
+    db = SessionLocal()
+    try:
+        feature_store.refresh(db)
+        feature_store.snapshot()
+    finally:
+        db.close()
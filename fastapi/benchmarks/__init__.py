@@ -0,0 +1 @@
+# TripNect India benchmarks
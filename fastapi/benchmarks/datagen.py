@@ -0,0 +1,294 @@
+"""
+Seeded synthetic data generator for benchmarks
+
+Bulk-loads users, trips (with tags and coordinates), join requests,
+participants, group chats and chat messages with realistic skew: a few
+hosts run many trips, popular destinations and trips draw most requests,
+and a handful of chats carry most messages. Every trip is derived from
+(seed, trip id) alone, so each table is streamed in its own pass without
+holding the dataset in memory. PostgreSQL is loaded with COPY, other
+databases with executemany in chunks. Prints row counts and timings as JSON.
+
+    DATABASE_URL=postgresql://localhost/tripnect_bench python -m benchmarks.datagen --users 200000 --trips 1000000
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.datagen --trips 50000
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/tripnect-bench.db")
+
+from sqlalchemy import func, text
+
+from app.database import engine, Base
+from app.models import Trip
+from app.geo import geocode
+from app.counters import install_counter_triggers
+from app.utils import preference_tags
+from benchmarks.ranking import DESTINATIONS, TAGS
+
+CHUNK_SIZE = 50000
+
+class TripPlan(NamedTuple):
+    id: int
+    host_id: int
+    destination: str
+    start_date: date
+    end_date: date
+    created_at: datetime
+    open_slots: int
+    budget_min: Optional[int]
+    budget_max: Optional[int]
+    preferences: Dict[str, Any]
+    status: str
+    # (user_id, status, created_at) of each join request
+    requests: List[Tuple[int, str, datetime]]
+    messages: int
+
+def skewed_index(rng: random.Random, n: int, alpha: float) -> int:
+    """Index in [0, n) following a power law, so low indexes are far more likely"""
+    return min(int(rng.paretovariate(alpha)) - 1, n - 1)
+
+class Generator:
+    def __init__(self, n_users: int, n_trips: int, seed: int = 42, today: Optional[date] = None):
+        self.n_users = n_users
+        self.n_trips = n_trips
+        self.seed = seed
+        self.today = today or date.today()
+        self.now = datetime.combine(self.today, datetime.min.time())
+        self._coordinates = {destination: geocode(destination) for destination in DESTINATIONS}
+
+    def _rng(self, kind: str, entity_id: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{entity_id}")
+
+    def trip(self, trip_id: int) -> TripPlan:
+        rng = self._rng("trip", trip_id)
+        # A few power hosts run many trips
+        host_id = skewed_index(rng, self.n_users, 1.2) + 1 if rng.random() < 0.3 else rng.randint(1, self.n_users)
+        destination = DESTINATIONS[skewed_index(rng, len(DESTINATIONS), 1.2)]
+        start = self.today + timedelta(days=rng.randint(-720, 365))
+        created_at = self.now - timedelta(days=max(0, (self.today - start).days) + rng.randint(1, 90), seconds=rng.randint(0, 86399))
+        if start <= self.today:
+            status = "cancelled" if rng.random() < 0.1 else "completed"
+        else:
+            status = "cancelled" if rng.random() < 0.05 else "active"
+        budget = rng.lognormvariate(math.log(15000), 0.6)
+        open_slots = rng.randint(2, 12)
+
+        # Popular trips draw most requests; answered ones only on trips that ran
+        popularity = rng.paretovariate(1.5)
+        wanted = min(int(popularity * 2), 60, self.n_users - 1)
+        requesters = set()
+        requests = []
+        accepted = 0
+        while len(requesters) < wanted:
+            user_id = rng.randint(1, self.n_users)
+            if user_id == host_id or user_id in requesters:
+                continue
+            requesters.add(user_id)
+            roll = rng.random()
+            if status == "active" and roll < 0.4:
+                request_status = "pending"
+            elif roll < 0.75 and accepted < open_slots - 1:
+                request_status = "accepted"
+                accepted += 1
+            else:
+                request_status = "rejected"
+            requests.append((user_id, request_status, created_at + timedelta(hours=rng.randint(1, 24 * 60))))
+
+        messages = int(rng.paretovariate(1.1) * 3) if accepted and rng.random() < 0.7 else 0
+        return TripPlan(
+            id=trip_id,
+            host_id=host_id,
+            destination=destination,
+            start_date=start,
+            end_date=start + timedelta(days=rng.randint(2, 10)),
+            created_at=created_at,
+            open_slots=open_slots,
+            budget_min=round(budget * 0.8) if rng.random() < 0.9 else None,
+            budget_max=round(budget * 1.2) if rng.random() < 0.9 else None,
+            preferences={"tags": rng.sample(TAGS, k=rng.randint(0, 3))},
+            status=status,
+            requests=requests,
+            messages=min(messages, 2000),
+        )
+
+    def trips(self) -> Iterator[TripPlan]:
+        for trip_id in range(1, self.n_trips + 1):
+            yield self.trip(trip_id)
+
+    # Table rows, in column order
+
+    def user_rows(self) -> Iterator[Sequence[Any]]:
+        for user_id in range(1, self.n_users + 1):
+            yield (user_id, f"user{user_id}@example.com", "x", f"User {user_id}", self.now)
+
+    def trip_rows(self) -> Iterator[Sequence[Any]]:
+        for plan in self.trips():
+            latitude, longitude = self._coordinates[plan.destination] or (None, None)
+            yield (
+                plan.id, plan.host_id, plan.host_id, f"{plan.destination} trip", plan.destination,
+                plan.start_date, plan.end_date, plan.open_slots, plan.budget_min, plan.budget_max,
+                plan.preferences, plan.status, 0, latitude, longitude, plan.created_at, plan.created_at,
+            )
+
+    def tag_rows(self) -> Iterator[Sequence[Any]]:
+        for plan in self.trips():
+            for tag in preference_tags(plan.preferences):
+                yield (plan.id, tag)
+
+    def request_rows(self) -> Iterator[Sequence[Any]]:
+        request_id = 0
+        for plan in self.trips():
+            for user_id, status, created_at in plan.requests:
+                request_id += 1
+                yield (request_id, plan.id, user_id, status, "Would love to join", created_at, created_at)
+
+    def participant_rows(self) -> Iterator[Sequence[Any]]:
+        participant_id = 0
+        for plan in self.trips():
+            participant_id += 1
+            yield (participant_id, plan.id, plan.host_id, "host", plan.created_at)
+            for user_id, status, created_at in plan.requests:
+                if status == "accepted":
+                    participant_id += 1
+                    yield (participant_id, plan.id, user_id, "participant", created_at)
+
+    def chat_rows(self) -> Iterator[Sequence[Any]]:
+        for plan in self.trips():
+            if plan.messages:
+                # Chat ids follow trip ids so messages can reference them directly
+                yield (plan.id, plan.id, f"Trip to {plan.destination}", plan.created_at)
+
+    def message_rows(self) -> Iterator[Sequence[Any]]:
+        message_id = 0
+        for plan in self.trips():
+            if not plan.messages:
+                continue
+            rng = self._rng("chat", plan.id)
+            members = [plan.host_id] + [user_id for user_id, status, _ in plan.requests if status == "accepted"]
+            sent_at = plan.created_at
+            for _ in range(plan.messages):
+                message_id += 1
+                sent_at += timedelta(minutes=rng.randint(1, 600))
+                # The host and a couple of regulars write most messages
+                author = members[skewed_index(rng, len(members), 1.5)]
+                yield (message_id, plan.id, author, "Sounds good!", "text", sent_at)
+
+TABLES = [
+    ("users", ["id", "email", "password_hash", "name", "created_at"], "user_rows"),
+    ("trips", [
+        "id", "user_id", "host_id", "title", "destination", "start_date", "end_date", "open_slots",
+        "budget_min", "budget_max", "preferences", "status", "current_participants",
+        "latitude", "longitude", "created_at", "updated_at",
+    ], "trip_rows"),
+    ("trip_tags", ["trip_id", "tag"], "tag_rows"),
+    # Chats go in before participants so the SQL script's chat-on-first-participant
+    # trigger finds them and does not create duplicates
+    ("group_chats", ["id", "trip_id", "name", "created_at"], "chat_rows"),
+    ("chat_messages", ["id", "chat_id", "user_id", "message", "message_type", "created_at"], "message_rows"),
+    ("trip_requests", ["id", "trip_id", "user_id", "status", "message", "created_at", "updated_at"], "request_rows"),
+    ("trip_participants", ["id", "trip_id", "user_id", "role", "joined_at"], "participant_rows"),
+]
+
+def _chunks(rows: Iterable[Sequence[Any]], size: int) -> Iterator[List[Sequence[Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _db_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="microseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def copy_rows(connection, table: str, columns: List[str], rows: Iterable[Sequence[Any]], chunk_size: int) -> int:
+    """Stream rows into a PostgreSQL table with COPY, one CSV buffer per chunk"""
+    cursor = connection.connection.cursor()
+    count = 0
+    for chunk in _chunks(rows, chunk_size):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow([_db_value(value) for value in row])
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        count += len(chunk)
+    return count
+
+def insert_rows(connection, table: str, columns: List[str], rows: Iterable[Sequence[Any]], chunk_size: int) -> int:
+    """Insert rows with the driver's executemany, one call per chunk"""
+    placeholders = ", ".join("?" if connection.dialect.paramstyle == "qmark" else "%s" for _ in columns)
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    count = 0
+    for chunk in _chunks(rows, chunk_size):
+        connection.exec_driver_sql(statement, [tuple(_db_value(value) for value in row) for row in chunk])
+        count += len(chunk)
+    return count
+
+def generate(n_users: int, n_trips: int, seed: int = 42, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Load a synthetic dataset into an empty database, returning row counts and timings"""
+    Base.metadata.create_all(bind=engine)
+    generator = Generator(n_users, n_trips, seed)
+    load = copy_rows if engine.dialect.name == "postgresql" else insert_rows
+    report: Dict[str, Any] = {"users": n_users, "trips": n_trips, "seed": seed, "tables": {}}
+
+    with engine.begin() as connection:
+        if connection.execute(func.count(Trip.id).select()).scalar():
+            raise SystemExit("Database already has trips; benchmarks need an empty database")
+        # Counters are maintained by triggers while the rows go in
+        install_counter_triggers(connection)
+
+        for table, columns, rows in TABLES:
+            started = time.perf_counter()
+            count = load(connection, table, columns, getattr(generator, rows)(), chunk_size)
+            elapsed = time.perf_counter() - started
+            report["tables"][table] = {
+                "rows": count,
+                "seconds": round(elapsed, 2),
+                "rows_per_second": round(count / elapsed) if elapsed else None,
+            }
+
+        # Explicit ids bypass the sequences
+        if engine.dialect.name == "postgresql":
+            for table, _, _ in TABLES:
+                if table != "trip_tags":
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                    ))
+
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        connection.commit()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=None, help="Defaults to a tenth of --trips")
+    parser.add_argument("--trips", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    users = args.users or max(args.trips // 10, 100)
+    print(json.dumps({"benchmark": "datagen", **generate(users, args.trips, args.seed, args.chunk_size)}, indent=2))
+
+if __name__ == "__main__":
+    main()
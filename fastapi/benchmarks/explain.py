@@ -0,0 +1,179 @@
+"""
+Query plan check for the router queries on a seeded large dataset
+
+Loads a dataset from the synthetic data generator (mostly past trips, as
+history accumulates), calls every read endpoint through the app,
+captures the SELECT statements they issue and runs EXPLAIN on each with
+the same parameters. Prints the plans as JSON and exits with status 1 if
+any statement sequentially scans a large table.
+
+    DATABASE_URL=sqlite:////tmp/explain.db python -m benchmarks.explain --trips 50000
+    DATABASE_URL=postgresql://localhost/tripnect_explain python -m benchmarks.explain
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/tripnect-explain.db")
+os.environ.setdefault("SECRET_KEY", "explain")
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import event, text
+
+from app.database import SessionLocal, engine, Base
+from app.models import Trip, GroupChat
+from app.main import app
+from benchmarks.datagen import generate
+from benchmarks.ranking import TAGS
+
+SEQ_SCAN_TABLES = [
+    "trips", "trip_requests", "trip_participants", "group_chats", "chat_messages", "trip_tags", "users",
+    "activity_events", "user_activity",
+]
+
+def token(user_id):
+    return {"Authorization": "Bearer " + jwt.encode({"sub": str(user_id)}, os.environ["SECRET_KEY"], algorithm="HS256")}
+
+def scenario(db):
+    """(name, path, headers) of every read endpoint, for a busy host and one of their trips"""
+    host_id, trip_id = db.query(Trip.host_id, Trip.id).filter(Trip.status == "active").order_by(
+        Trip.pending_requests.desc()
+    ).first()
+    chat_id = db.query(GroupChat.id).join(Trip, Trip.id == GroupChat.trip_id).filter(
+        Trip.host_id == host_id
+    ).limit(1).scalar() or db.query(GroupChat.id).limit(1).scalar()
+    chat_host = db.query(Trip.host_id).join(GroupChat, GroupChat.trip_id == Trip.id).filter(
+        GroupChat.id == chat_id
+    ).scalar()
+    host = token(host_id)
+    return [
+        ("feed", "/api/v1/trips/feed", {}),
+        ("feed_page_5", "/api/v1/trips/feed?page=5", {}),
+        ("feed_filtered", "/api/v1/trips/feed?destination=goa&available_slots_only=true", {}),
+        ("feed_tags", f"/api/v1/trips/feed?tags_all={TAGS[0]}&tags_any={TAGS[1]}", {}),
+        ("feed_pref", f"/api/v1/trips/feed?pref=tags={TAGS[2]}", {}),
+        ("feed_near", "/api/v1/trips/feed?near=Manali&radius_km=100", {}),
+        ("feed_overlap", f"/api/v1/trips/feed?travel_from={date.today()}&travel_to={date.today() + timedelta(days=30)}", {}),
+        ("feed_relevance", "/api/v1/trips/feed?sort=relevance", host),
+        ("facets", "/api/v1/trips/facets", {}),
+        ("trip_detail", f"/api/v1/trips/{trip_id}", {}),
+        ("similar_trips", f"/api/v1/trips/{trip_id}/similar", {}),
+        ("my_trips", "/api/v1/trips/user/my-trips", host),
+        ("my_trips_participant", "/api/v1/trips/user/my-trips?role=participant", host),
+        ("dashboard", "/api/v1/trips/user/dashboard", host),
+        ("search_destinations", "/api/v1/trips/search/destinations?q=go", {}),
+        ("trip_requests", f"/api/v1/requests/trip/{trip_id}", host),
+        ("my_requests", "/api/v1/requests/user/my-requests", host),
+        ("participants", f"/api/v1/participants/trip/{trip_id}", {}),
+        ("my_participations", "/api/v1/participants/user/my-participations", host),
+        ("trip_chat", f"/api/v1/chats/trip/{trip_id}", host),
+        ("chat_messages", f"/api/v1/chats/{chat_id}/messages", token(chat_host)),
+        ("my_chats", "/api/v1/chats/user/my-chats", host),
+        ("activity", "/api/v1/activity/", host),
+    ]
+
+def capture(client, path, headers):
+    """SELECT statements (with parameters) issued while serving one request"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return response.status_code, statements
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+def partial_indexes():
+    """Names of indexes covering a subset of rows; walking one whole is not a table scan"""
+    return {
+        index.name
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+        if index.dialect_options["sqlite"].get("where") is not None
+    }
+
+def explain(connection, statement, parameters, partial=frozenset()):
+    """(plan lines, tables scanned sequentially)"""
+    if engine.dialect.name == "postgresql":
+        plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        nodes = list(_walk(plan[0]["Plan"]))
+        lines = [f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip() for node in nodes]
+        scanned = [node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"]
+        return lines, scanned
+
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    lines = [row[3] for row in rows]
+    scanned = []
+    for line in lines:
+        # "SCAN trips" reads the whole table; "SCAN trips USING INDEX ix" reads all of
+        # it in index order, which only narrows anything for partial indexes
+        match = re.fullmatch(r"SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?", line)
+        if match and match.group(2) not in partial:
+            scanned.append(re.sub(r"_\d+$", "", match.group(1)))
+    return lines, scanned
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-rows", type=int, default=1000, help="Tables smaller than this may be scanned")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    if not db.query(Trip.id).first():
+        generate(max(args.trips // 10, 100), args.trips, args.seed)
+
+    with engine.connect() as connection:
+        sizes = {
+            table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            for table in SEQ_SCAN_TABLES
+        }
+    large = {table for table, size in sizes.items() if size >= args.min_rows}
+
+    client = TestClient(app)
+    report, failures = [], 0
+    with engine.connect() as connection:
+        for name, path, headers in scenario(db):
+            status, statements = capture(client, path, headers)
+            seen = set()
+            for statement, parameters in statements:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan, scanned = explain(connection, statement, parameters, partial_indexes())
+                seq_scans = sorted(set(scanned) & large)
+                failures += bool(seq_scans)
+                report.append({
+                    "endpoint": name, "status": status, "sql": " ".join(statement.split()),
+                    "plan": plan, "seq_scans": seq_scans,
+                })
+
+    print(json.dumps({
+        "benchmark": "explain",
+        "dialect": engine.dialect.name,
+        "rows": sizes,
+        "statements": len(report),
+        "seq_scan_statements": failures,
+        "results": report,
+    }, indent=2, default=str))
+    db.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark of GET /api/v1/trips/facets against the multi-call approach
+
+The explore page used to read each facet count from the `total` of a
+separate feed request. This compares one COUNT(*) per facet value (what
+those feed calls cost the database) with the single-scan facet query,
+cold and cached, and prints the timings as JSON.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.facets --trips 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import func, insert
+
+from app.database import SessionLocal, engine, Base
+from app.models import Trip, User
+from app.filters import TripFeedFilters
+from app.facets import compute_facets, get_facets, invalidate_facets, _start_month, _budget_bucket
+from benchmarks.ranking import DESTINATIONS
+
+def seed(db, n_trips, seed_value):
+    rng = random.Random(seed_value)
+    db.execute(insert(User), [{"email": "bench@example.com", "password_hash": "x", "name": "Bench"}])
+    host_id = db.query(User.id).scalar()
+    rows = []
+    for _ in range(n_trips):
+        start = date.today() + timedelta(days=rng.randint(1, 365))
+        slots = rng.randint(2, 10)
+        budget = rng.choice([None, rng.randint(2000, 90000)])
+        rows.append({
+            "user_id": host_id, "host_id": host_id, "title": "Trip",
+            "destination": rng.choice(DESTINATIONS), "start_date": start,
+            "end_date": start + timedelta(days=rng.randint(2, 9)), "open_slots": slots,
+            "current_participants": rng.randint(1, slots), "budget_max": budget,
+            "preferences": {}, "status": "active",
+        })
+    db.execute(insert(Trip.__table__), rows)
+    db.commit()
+
+def filters(**values):
+    defaults = dict(
+        destination=None, start_date_from=None, start_date_to=None, budget_min=None,
+        budget_max=None, available_slots_only=False, tags_all=None, tags_any=None, pref=None,
+        travel_from=None, travel_to=None, budget_range_min=None, budget_range_max=None,
+        near=None, radius_km=50,
+    )
+    defaults.update(values)
+    return TripFeedFilters(**defaults)
+
+def multi_call(db, base):
+    """One count per facet value, as the explore page did with feed calls"""
+    month, bucket = _start_month(), _budget_bucket()
+    values = base.apply(db.query(Trip.destination, month, bucket)).distinct().all()
+    counts = {"total": base.apply(db.query(func.count(Trip.id))).scalar()}
+    for destination in {row[0] for row in values}:
+        counts[destination] = base.apply(
+            db.query(func.count(Trip.id))
+        ).filter(Trip.destination == destination).scalar()
+    for value in {row[1] for row in values}:
+        counts[value] = base.apply(db.query(func.count(Trip.id))).filter(month == value).scalar()
+    for value in {row[2] for row in values}:
+        counts[value] = base.apply(db.query(func.count(Trip.id))).filter(bucket == value).scalar()
+    counts["has_open_slots"] = base.apply(db.query(func.count(Trip.id))).filter(
+        Trip.current_participants < Trip.open_slots
+    ).scalar()
+    return len(counts)
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, round(sorted(samples)[len(samples) // 2], 3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    if not db.query(Trip.id).first():
+        seed(db, args.trips, args.seed)
+
+    base = filters()
+    queries, multi_ms = timed(lambda: multi_call(db, base), args.repeats)
+    _, single_ms = timed(lambda: compute_facets(db, base), args.repeats)
+    invalidate_facets()
+    get_facets(db, base)
+    _, cached_ms = timed(lambda: get_facets(db, base), args.repeats)
+
+    print(json.dumps({
+        "benchmark": "facets",
+        "trips": db.query(func.count(Trip.id)).scalar(),
+        "multi_call": {"queries": queries, "median_ms": multi_ms},
+        "single_scan": {"queries": 1, "median_ms": single_ms},
+        "cached": {"median_ms": cached_ms},
+        "speedup": round(multi_ms / single_ms, 2) if single_ms else None,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
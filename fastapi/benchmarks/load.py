@@ -0,0 +1,326 @@
+"""
+Scripted load scenarios against the API, in-process or over HTTP
+
+Runs each scenario with a number of concurrent virtual users for a fixed
+duration and reports throughput and latency percentiles per scenario and
+per endpoint as JSON. Scenarios:
+
+    feed          browse the feed with filters, facets and relevance sort
+    join_request  request to join a trip, host lists and answers, requester checks
+    chat          send a message and poll the chat history
+    my            my-trips, my-requests, my-participations, my-chats, dashboard
+
+By default requests go to the ASGI app in-process. --url targets a running
+server and --serve starts a local uvicorn for the run. An empty database is
+filled by the synthetic data generator first. --baseline compares against
+an earlier --output file.
+
+    python -m benchmarks.load --trips 50000 --concurrency 16 --duration 20 --output run.json
+    python -m benchmarks.load --serve --workers 4 --baseline run.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --scenario feed --scenario chat
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/tripnect-bench.db")
+
+# Tokens must be signed with the server's key when targeting --url
+from dotenv import load_dotenv
+load_dotenv()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["SCHEDULER_ENABLED"] = "false"
+# Virtual users share a few power hosts, which would trip the per-user rate limits
+os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+
+import httpx
+import numpy as np
+from jose import jwt
+
+from app.database import SessionLocal, engine, Base
+from app.models import Trip, User, GroupChat
+from benchmarks.datagen import generate
+from benchmarks.ranking import DESTINATIONS, TAGS
+
+PERCENTILES = (50, 90, 95, 99)
+
+def token(user_id: int) -> Dict[str, str]:
+    return {"Authorization": "Bearer " + jwt.encode(
+        {"sub": str(user_id)}, os.environ["SECRET_KEY"], algorithm=os.getenv("ALGORITHM", "HS256")
+    )}
+
+class Recorder:
+    """Latencies and status codes per endpoint"""
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            self.statuses[name][type(e).__name__] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - started) * 1000)
+        self.statuses[name][str(response.status_code)] += 1
+        if response.status_code >= 500:
+            self.errors[name] += 1
+        return response
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    if not latencies:
+        return {"requests": 0, "errors": errors, "throughput_rps": 0.0, "latency_ms": None}
+    values = np.array(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "latency_ms": {
+            **{f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES},
+            "mean": round(float(values.mean()), 3),
+            "max": round(float(values.max()), 3),
+        },
+    }
+
+class Dataset:
+    """Ids the scenarios draw from, sampled once from the database"""
+    def __init__(self, sample: int = 5000):
+        db = SessionLocal()
+        try:
+            self.users = db.query(User.id).count()
+            self.active_trips = db.query(Trip.id, Trip.host_id).filter(
+                Trip.status == "active", Trip.current_participants < Trip.open_slots
+            ).limit(sample).all()
+            self.hosts = sorted({host_id for _, host_id in self.active_trips})
+            self.chats = db.query(GroupChat.id, Trip.host_id).join(
+                Trip, Trip.id == GroupChat.trip_id
+            ).order_by(GroupChat.message_count.desc()).limit(sample).all()
+            self.trips = db.query(Trip.id).count()
+        finally:
+            db.close()
+
+# Scenarios: one iteration of a virtual user's session
+
+async def feed(client, recorder, data, rng):
+    params = {"page": rng.choice([1, 1, 1, 2, 3, 5])}
+    roll = rng.random()
+    if roll < 0.3:
+        params["destination"] = DESTINATIONS[min(int(rng.paretovariate(1.2)) - 1, len(DESTINATIONS) - 1)]
+    elif roll < 0.5:
+        params["tags_any"] = rng.choice(TAGS)
+    elif roll < 0.6:
+        params["available_slots_only"] = "true"
+    await recorder.call(client, "GET /trips/feed", "GET", "/api/v1/trips/feed", params=params)
+    if rng.random() < 0.3:
+        await recorder.call(
+            client, "GET /trips/feed?sort=relevance", "GET", "/api/v1/trips/feed",
+            params={"sort": "relevance"}, headers=token(rng.randint(1, data.users))
+        )
+    if rng.random() < 0.3:
+        await recorder.call(client, "GET /trips/facets", "GET", "/api/v1/trips/facets", params=params)
+    if data.active_trips and rng.random() < 0.5:
+        trip_id, _ = rng.choice(data.active_trips)
+        await recorder.call(client, "GET /trips/{id}", "GET", f"/api/v1/trips/{trip_id}")
+
+async def join_request(client, recorder, data, rng):
+    if not data.active_trips:
+        return
+    trip_id, host_id = rng.choice(data.active_trips)
+    user_id = rng.randint(1, data.users)
+    response = await recorder.call(
+        client, "POST /requests", "POST", "/api/v1/requests/",
+        json={"trip_id": trip_id, "message": "Count me in"}, headers=token(user_id)
+    )
+    host = token(host_id)
+    await recorder.call(client, "GET /requests/trip/{id}", "GET", f"/api/v1/requests/trip/{trip_id}", headers=host)
+    if response is not None and response.status_code == 200:
+        request_id = response.json()["id"]
+        await recorder.call(
+            client, "PUT /requests/{id}", "PUT", f"/api/v1/requests/{request_id}",
+            json={"status": rng.choice(["accepted", "rejected"])}, headers=host
+        )
+    await recorder.call(client, "GET /requests/user/my-requests", "GET", "/api/v1/requests/user/my-requests", headers=token(user_id))
+
+async def chat(client, recorder, data, rng):
+    if not data.chats:
+        return
+    chat_id, host_id = rng.choice(data.chats)
+    headers = token(host_id)
+    if rng.random() < 0.3:
+        await recorder.call(
+            client, "POST /chats/{id}/messages", "POST", f"/api/v1/chats/{chat_id}/messages",
+            json={"message": "On my way"}, headers=headers
+        )
+    await recorder.call(client, "GET /chats/{id}/messages", "GET", f"/api/v1/chats/{chat_id}/messages", headers=headers)
+
+async def my(client, recorder, data, rng):
+    # Mostly active hosts, who have the most to list
+    user_id = rng.choice(data.hosts) if data.hosts and rng.random() < 0.7 else rng.randint(1, data.users)
+    headers = token(user_id)
+    await recorder.call(client, "GET /trips/user/my-trips", "GET", "/api/v1/trips/user/my-trips", headers=headers)
+    await recorder.call(client, "GET /trips/user/dashboard", "GET", "/api/v1/trips/user/dashboard", headers=headers)
+    await recorder.call(client, "GET /requests/user/my-requests", "GET", "/api/v1/requests/user/my-requests", headers=headers)
+    await recorder.call(
+        client, "GET /participants/user/my-participations", "GET",
+        "/api/v1/participants/user/my-participations", headers=headers
+    )
+    await recorder.call(client, "GET /chats/user/my-chats", "GET", "/api/v1/chats/user/my-chats", headers=headers)
+
+SCENARIOS = {"feed": feed, "join_request": join_request, "chat": chat, "my": my}
+
+async def run_scenario(client, name, data, concurrency, duration, seed) -> Dict[str, Any]:
+    recorder = Recorder()
+    scenario = SCENARIOS[name]
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(index):
+        rng = random.Random(f"{seed}:{name}:{index}")
+        while time.perf_counter() < deadline:
+            await scenario(client, recorder, data, rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        **summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "endpoints": {
+            endpoint: {
+                **summarize(recorder.latencies[endpoint], recorder.errors[endpoint], elapsed),
+                "statuses": dict(recorder.statuses[endpoint]),
+            }
+            for endpoint in sorted(recorder.statuses)
+        },
+    }
+
+def _change(current, previous):
+    if current is None or not previous:
+        return None
+    return round((current - previous) / previous * 100, 1)
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Percent change of throughput and p50/p95/p99 per scenario and endpoint"""
+    def delta(current, previous):
+        if not current or not previous or not current.get("latency_ms") or not previous.get("latency_ms"):
+            return None
+        return {
+            "throughput_rps_pct": _change(current["throughput_rps"], previous["throughput_rps"]),
+            **{
+                f"p{p}_pct": _change(current["latency_ms"][f"p{p}"], previous["latency_ms"][f"p{p}"])
+                for p in (50, 95, 99)
+            },
+        }
+
+    changes = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        changes[name] = {
+            **(delta(current, previous) or {}),
+            "endpoints": {
+                endpoint: delta(values, previous.get("endpoints", {}).get(endpoint))
+                for endpoint, values in current["endpoints"].items()
+            },
+        }
+    return changes
+
+def serve(port: int, workers: int) -> subprocess.Popen:
+    """Start a local uvicorn serving the app and wait until it answers"""
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+        "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ], env=os.environ.copy())
+    for _ in range(100):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("uvicorn did not start")
+
+async def run(args, data) -> Dict[str, Any]:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    async with client:
+        scenarios = {}
+        for name in args.scenario or list(SCENARIOS):
+            scenarios[name] = await run_scenario(client, name, data, args.concurrency, args.duration, args.seed)
+        return scenarios
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--url", help="Base URL of a running server instead of the in-process app")
+    parser.add_argument("--serve", action="store_true", help="Start a local uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--trips", type=int, default=20000, help="Trips to generate if the database is empty")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the report to this file")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        empty = db.query(Trip.id).first() is None
+    finally:
+        db.close()
+    if empty:
+        generate(max(args.trips // 10, 100), args.trips, args.seed)
+    data = Dataset()
+
+    process = None
+    if args.serve:
+        process = serve(args.port, args.workers)
+        args.url = f"http://127.0.0.1:{args.port}"
+    try:
+        scenarios = asyncio.run(run(args, data))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "benchmark": "load",
+        "target": args.url or "asgi",
+        "workers": args.workers if args.serve else None,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "seed": args.seed,
+        "dataset": {"users": data.users, "trips": data.trips},
+        "scenarios": scenarios,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["vs_baseline"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
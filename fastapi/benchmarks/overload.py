@@ -0,0 +1,159 @@
+"""
+Cheap-route latency while the feed is saturated
+
+Starts a single uvicorn worker twice, without and with load shedding
+(LOAD_SHEDDING_ENABLED). Each run first probes cheap routes (/health, trip
+detail, sending a chat message) on an idle server, then floods the feed with
+expensive requests (ILIKE destination filter plus relevance sort) from many
+concurrent clients while the same probes run. Reports the probes' latency
+percentiles idle and under flood, and the feed's status counts (503s are
+shed requests). Per-user rate limits are disabled so only the concurrency
+limits act. With --max-slowdown, exits with status 1 if the shedding run's
+cheap-route p95 under flood exceeds that multiple of its idle p95.
+
+    python -m benchmarks.overload --flood-concurrency 64 --duration 10 --max-slowdown 5
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Any, Dict
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/tripnect-bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["RATE_LIMIT_PER_SECOND"] = "0"
+
+import httpx
+
+from app.database import SessionLocal, engine, Base
+from app.models import Trip
+from benchmarks.datagen import generate
+from benchmarks.load import Dataset, Recorder, summarize, serve, token
+
+FLOOD_PARAMS = {"destination": "a", "sort": "relevance"}
+PROBE_INTERVAL_SECONDS = 0.02
+
+async def probe(client: httpx.AsyncClient, recorder: Recorder, data: Dataset, deadline: float):
+    """Cheap requests one after another, as a lightly active user would send them"""
+    trip_id, _ = data.active_trips[0]
+    chat_id, host_id = data.chats[0]
+    while time.perf_counter() < deadline:
+        await recorder.call(client, "GET /health", "GET", "/health")
+        await recorder.call(client, "GET /trips/{id}", "GET", f"/api/v1/trips/{trip_id}")
+        await recorder.call(
+            client, "POST /chats/{id}/messages", "POST", f"/api/v1/chats/{chat_id}/messages",
+            json={"message": "Still on?"}, headers=token(host_id)
+        )
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+async def flood(url: str, hosts, concurrency: int, duration: float) -> Recorder:
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def client_loop(client, index):
+        headers = token(hosts[index % len(hosts)])
+        while time.perf_counter() < deadline:
+            response = await recorder.call(client, "GET /trips/feed", "GET", "/api/v1/trips/feed", params=FLOOD_PARAMS, headers=headers)
+            if response is not None and response.status_code == 503:
+                # Honour a short backoff like a well-behaved client would
+                await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+    return recorder
+
+def _flood_process(url: str, hosts, concurrency: int, duration: float, results):
+    # A process of its own, so the flood's client overhead does not delay the probes
+    recorder = asyncio.run(flood(url, hosts, concurrency, duration))
+    results.put((recorder.latencies["GET /trips/feed"], dict(recorder.statuses["GET /trips/feed"]), recorder.errors["GET /trips/feed"]))
+
+def probe_summary(recorder: Recorder, duration: float) -> Dict[str, Any]:
+    names = list(recorder.latencies)
+    return {
+        **summarize([value for name in names for value in recorder.latencies[name]], 0, duration),
+        "endpoints": {name: summarize(recorder.latencies[name], recorder.errors[name], duration) for name in sorted(names)},
+    }
+
+async def measure(url: str, data: Dataset, flood_concurrency: int, duration: float) -> Dict[str, Any]:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        idle = Recorder()
+        await probe(client, idle, data, time.perf_counter() + duration / 2)
+
+        results = multiprocessing.Queue()
+        flooder = multiprocessing.Process(
+            target=_flood_process, args=(url, data.hosts, flood_concurrency, duration, results)
+        )
+        flooder.start()
+        loaded = Recorder()
+        await probe(client, loaded, data, time.perf_counter() + duration)
+        feed_latencies, feed_statuses, feed_errors = results.get()
+        flooder.join()
+
+        limits_report = None
+        if os.environ["LOAD_SHEDDING_ENABLED"] == "true":
+            admin = await client.get("/api/v1/admin/limits", headers=token(1))
+            limits_report = admin.json()["groups"]["feed"] if admin.status_code == 200 else None
+
+    return {
+        "idle": probe_summary(idle, duration / 2),
+        "flooded": probe_summary(loaded, duration),
+        "feed": {
+            **summarize(feed_latencies, feed_errors, duration),
+            "statuses": feed_statuses,
+            "limit": limits_report,
+        },
+    }
+
+def slowdown(run: Dict[str, Any]) -> float:
+    return round(run["flooded"]["latency_ms"]["p95"] / run["idle"]["latency_ms"]["p95"], 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--flood-concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of flood per run")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--max-slowdown", type=float)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        empty = db.query(Trip.id).first() is None
+    finally:
+        db.close()
+    if empty:
+        generate(max(args.trips // 10, 100), args.trips, args.seed)
+    data = Dataset()
+    os.environ.setdefault("ADMIN_USER_IDS", "1")
+
+    runs = {}
+    for name, enabled in (("without_shedding", "false"), ("with_shedding", "true")):
+        os.environ["LOAD_SHEDDING_ENABLED"] = enabled
+        process = serve(args.port, 1)
+        try:
+            runs[name] = asyncio.run(measure(f"http://127.0.0.1:{args.port}", data, args.flood_concurrency, args.duration))
+        finally:
+            process.terminate()
+            process.wait()
+        runs[name]["cheap_p95_slowdown"] = slowdown(runs[name])
+
+    failed = args.max_slowdown is not None and runs["with_shedding"]["cheap_p95_slowdown"] > args.max_slowdown
+    print(json.dumps({
+        "benchmark": "overload",
+        "dialect": engine.dialect.name,
+        "flood_concurrency": args.flood_concurrency,
+        "runs": runs,
+        "failed": failed,
+    }, indent=2))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Offline benchmark of the relevance ranking used by GET /api/v1/trips/feed?sort=relevance
+
+Builds a feature store from synthetic trips, derives a taste profile from a
+synthetic user history and reports scoring latency and ranking quality
+(NDCG@10 / precision@10 against the user's hidden preferences) as JSON.
+
+    python -m benchmarks.ranking --trips 3000 --users 50
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np
+
+from app.ranking import TripFeatureStore, TasteProfile, score_trips
+
+DESTINATIONS = [
+    "Manali", "Goa", "Leh", "Rishikesh", "Jaipur", "Udaipur", "Varanasi", "Munnar",
+    "Coorg", "Ooty", "Darjeeling", "Gangtok", "Shillong", "Hampi", "Pondicherry",
+    "Spiti", "Kasol", "Andaman", "Kochi", "Mysore", "Agra", "Amritsar", "Jaisalmer",
+    "Auli", "Nainital", "Mussoorie", "Gokarna", "Alleppey", "Tawang", "Kodaikanal",
+]
+TAGS = [
+    "trekking", "beach", "camping", "photography", "food", "heritage", "wildlife",
+    "yoga", "backpacking", "luxury", "road-trip", "snow", "rafting", "culture",
+    "nightlife", "pet-friendly", "women-only", "budget", "spiritual", "cycling",
+]
+
+def synthetic_trip(trip_id, rng, taste=None, today=date(2025, 1, 1)):
+    """A random trip; with a taste, drawn from that user's preferences"""
+    if taste:
+        destination = rng.choice(taste["destinations"])
+        month = rng.choice(taste["months"])
+        budget = taste["budget"] * rng.uniform(0.8, 1.25)
+        tags = rng.sample(taste["tags"], k=min(2, len(taste["tags"])))
+    else:
+        # Zipf-like skew towards popular destinations
+        destination = DESTINATIONS[min(int(rng.paretovariate(1.2)) - 1, len(DESTINATIONS) - 1)]
+        month = rng.randint(1, 12)
+        budget = rng.lognormvariate(math.log(15000), 0.6)
+        tags = rng.sample(TAGS, k=rng.randint(0, 3))
+
+    start = date(today.year + 1, month, rng.randint(1, 28))
+    slots = rng.randint(2, 12)
+    return SimpleNamespace(
+        id=trip_id,
+        destination=destination,
+        start_date=start,
+        end_date=start + timedelta(days=rng.randint(2, 10)),
+        budget_min=round(budget * 0.8, 2),
+        budget_max=round(budget * 1.2, 2),
+        open_slots=slots,
+        current_participants=rng.randint(1, slots),
+        preferences={"tags": tags},
+        status="active",
+        created_at=datetime.now(timezone.utc) - timedelta(days=rng.uniform(0, 60)),
+    )
+
+def random_taste(rng):
+    return {
+        "destinations": rng.sample(DESTINATIONS, k=3),
+        "months": rng.sample(range(1, 13), k=2),
+        "budget": rng.lognormvariate(math.log(15000), 0.6),
+        "tags": rng.sample(TAGS, k=3),
+    }
+
+def is_relevant(trip, taste):
+    tags = set(trip.preferences["tags"])
+    return (
+        trip.destination in taste["destinations"]
+        and trip.start_date.month in taste["months"]
+        and bool(tags & set(taste["tags"]))
+    )
+
+def ndcg_at_k(relevances, k=10):
+    dcg = sum(rel / math.log2(i + 2) for i, rel in enumerate(relevances[:k]))
+    ideal = sorted(relevances, reverse=True)
+    idcg = sum(rel / math.log2(i + 2) for i, rel in enumerate(ideal[:k]))
+    return dcg / idcg if idcg else 0.0
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run(n_trips, n_users, repeats, seed):
+    rng = random.Random(seed)
+    users = [random_taste(rng) for _ in range(n_users)]
+
+    # Background trips plus a few trips matching each user's hidden taste
+    trips = [synthetic_trip(i, rng) for i in range(1, n_trips + 1)]
+    for taste in users:
+        trips += [synthetic_trip(len(trips) + 1, rng, taste) for _ in range(5)]
+
+    store = TripFeatureStore(ttl=math.inf)
+    started = time.perf_counter()
+    store.load(trips)
+    ids, matrix, codes = store.snapshot()
+    build_ms = (time.perf_counter() - started) * 1000
+    by_id = {trip.id: trip for trip in trips}
+
+    latencies, ndcg, precision, baseline_ndcg = [], [], [], []
+    for taste in users:
+        history = [synthetic_trip(0, rng, taste) for _ in range(8)]
+        profile = TasteProfile.from_trips(history)
+
+        for _ in range(repeats):
+            started = time.perf_counter()
+            scores = score_trips(ids, matrix, codes, profile)
+            order = np.argsort(-scores, kind="stable")
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        ranked = [by_id[i] for i in ids[order].tolist()]
+        relevances = [1.0 if is_relevant(trip, taste) else 0.0 for trip in ranked]
+        ndcg.append(ndcg_at_k(relevances))
+        precision.append(sum(relevances[:10]) / 10)
+
+        # The existing feed order: by start date
+        by_start = sorted(trips, key=lambda trip: (trip.start_date, trip.id))
+        baseline_ndcg.append(ndcg_at_k([1.0 if is_relevant(t, taste) else 0.0 for t in by_start]))
+
+    return {
+        "benchmark": "ranking",
+        "candidates": len(ids),
+        "users": n_users,
+        "store_build_ms": round(build_ms, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+        "quality": {
+            "ndcg_at_10": round(statistics.mean(ndcg), 4),
+            "precision_at_10": round(statistics.mean(precision), 4),
+            "start_date_ndcg_at_10": round(statistics.mean(baseline_ndcg), 4),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(run(args.trips, args.users, args.repeats, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Cold start and first-request latency
+
+Measures, each in a fresh interpreter: importing the app (and that the
+import opens no database connection), the time from launching uvicorn to
+the first successful health check, and the latency of the first requests
+to the main read endpoints against their warm median. Includes the
+worker's own startup report (per-phase breakdown). With budgets given,
+exits with status 1 when one is exceeded, so it can gate CI.
+
+    python -m benchmarks.startup --max-import-ms 1500 --max-cold-start-ms 4000 --max-first-request-ms 500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from statistics import median
+from typing import Any, Dict, List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/tripnect-bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ADMIN_USER_IDS", "1")
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+import httpx
+
+from app.database import SessionLocal, engine, Base
+from app.models import Trip
+from benchmarks.datagen import generate
+from benchmarks.load import token
+
+IMPORT_PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+from app.database import engine
+from app.startup import startup_report
+print(json.dumps({
+    "import_ms": round((time.perf_counter() - started) * 1000, 2),
+    "connections_opened": engine.pool.checkedin() + engine.pool.checkedout(),
+    "phases_ms": startup_report.phases,
+}))
+"""
+
+def measure_import(runs: int) -> Dict[str, Any]:
+    """Median wall time of `import app.main` in fresh interpreters"""
+    probes = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], env=os.environ.copy(), capture_output=True, text=True, check=True
+        ).stdout
+        probes.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "import_ms": median(probe["import_ms"] for probe in probes),
+        "connections_opened": max(probe["connections_opened"] for probe in probes),
+        "phases_ms": probes[-1]["phases_ms"],
+    }
+
+def first_requests(client: httpx.Client, paths: List[str], repeats: int) -> Dict[str, Any]:
+    """Latency of each path's first call and the median of the following ones"""
+    results = {}
+    for path in paths:
+        timings = []
+        for _ in range(repeats + 1):
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+        results[path] = {
+            "first_ms": round(timings[0], 2),
+            "warm_median_ms": round(median(timings[1:]), 2),
+        }
+    return results
+
+def measure_cold_start(port: int, paths: List[str], repeats: int) -> Dict[str, Any]:
+    """Launch uvicorn, wait for it to answer and time the first requests"""
+    started = time.perf_counter()
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+        "--port", str(port), "--log-level", "warning",
+    ], env=os.environ.copy())
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                if process.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                if time.perf_counter() - started > 60:
+                    raise SystemExit("uvicorn did not start within 60s")
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.01)
+            cold_start_ms = (time.perf_counter() - started) * 1000
+            requests = first_requests(client, paths, repeats)
+            report = client.get("/api/v1/admin/startup", headers=token(1)).json()
+    finally:
+        process.terminate()
+        process.wait()
+    return {"cold_start_ms": round(cold_start_ms, 2), "requests": requests, "startup_report": report}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-cold-start-ms", type=float)
+    parser.add_argument("--max-first-request-ms", type=float)
+    args = parser.parse_args()
+
+    # Stands in for `alembic upgrade head`; the app itself never creates tables
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        empty = db.query(Trip.id).first() is None
+        if empty:
+            generate(max(args.trips // 10, 100), args.trips, args.seed)
+        trip_id = db.query(Trip.id).filter(Trip.status == "active").limit(1).scalar()
+    finally:
+        db.close()
+    engine.dispose()
+
+    paths = ["/api/v1/trips/feed", "/api/v1/trips/facets", f"/api/v1/trips/{trip_id}", f"/api/v1/trips/{trip_id}/similar"]
+    imports = measure_import(args.import_runs)
+    cold = measure_cold_start(args.port, paths, args.repeats)
+
+    failures = []
+    if imports["connections_opened"]:
+        failures.append("importing the app opened a database connection")
+    if args.max_import_ms is not None and imports["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {imports['import_ms']} ms (budget {args.max_import_ms})")
+    if args.max_cold_start_ms is not None and cold["cold_start_ms"] > args.max_cold_start_ms:
+        failures.append(f"cold start took {cold['cold_start_ms']} ms (budget {args.max_cold_start_ms})")
+    if args.max_first_request_ms is not None:
+        for path, timing in cold["requests"].items():
+            if timing["first_ms"] > args.max_first_request_ms:
+                failures.append(f"first {path} took {timing['first_ms']} ms (budget {args.max_first_request_ms})")
+
+    print(json.dumps({
+        "benchmark": "startup",
+        "dialect": engine.dialect.name,
+        "import": imports,
+        **cold,
+        "failures": failures,
+    }, indent=2, default=str))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Statement build and compile overhead of the hot router queries
+
+Runs each hot statement shape (membership check, trip, chat and user by id,
+the unfiltered feed count and page) against a seeded database three ways:
+as the routers used to write it with db.query() and compilation disabled,
+the same with SQLAlchemy's compiled cache, and through the cached lambda
+statements in app/statements.py. Parameters cycle through sampled rows so
+every call binds new values. Reports microseconds per call for each shape
+and the time saved per request for the statements a few endpoints run.
+With --min-saved-us, exits with status 1 if the statements save less than
+that per request on any endpoint.
+
+    python -m benchmarks.statements --iterations 5000 --min-saved-us 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/tripnect-bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine, Base
+from app.filters import TripFeedFilters
+from app.models import Trip, TripParticipant, GroupChat, User
+from app import statements
+from benchmarks.datagen import generate
+
+FEED_PER_PAGE = 10
+
+def _feed_filters() -> TripFeedFilters:
+    # Every parameter at its default, as FastAPI builds it for a bare /trips/feed
+    return TripFeedFilters(
+        destination=None, start_date_from=None, start_date_to=None, budget_min=None, budget_max=None,
+        available_slots_only=False, tags_all=None, tags_any=None, pref=None, travel_from=None,
+        travel_to=None, budget_range_min=None, budget_range_max=None, near=None, radius_km=50
+    )
+
+# Shape -> (the former router code, the cached statement), each called with (db, sample row)
+SHAPES: Dict[str, Any] = {
+    "membership": (
+        lambda db, row: db.query(TripParticipant).filter(
+            and_(TripParticipant.trip_id == row["trip_id"], TripParticipant.user_id == row["user_id"])
+        ).first(),
+        lambda db, row: statements.membership(db, row["trip_id"], row["user_id"]),
+    ),
+    "trip_by_id": (
+        lambda db, row: db.query(Trip).filter(Trip.id == row["trip_id"]).first(),
+        lambda db, row: statements.trip_by_id(db, row["trip_id"]),
+    ),
+    "chat_by_id": (
+        lambda db, row: db.query(GroupChat).filter(GroupChat.id == row["chat_id"]).first(),
+        lambda db, row: statements.chat_by_id(db, row["chat_id"]),
+    ),
+    "user_by_id": (
+        lambda db, row: db.query(User).filter(User.id == row["user_id"]).first(),
+        lambda db, row: statements.user_by_id(db, row["user_id"]),
+    ),
+    "feed_total": (
+        lambda db, row: row["filters"].apply(db.query(Trip)).count(),
+        lambda db, row: statements.feed_total(db, row["filters"]),
+    ),
+    "feed_page": (
+        lambda db, row: row["filters"].apply(db.query(Trip)).order_by(Trip.start_date.asc()).offset(
+            row["offset"]
+        ).limit(FEED_PER_PAGE).all(),
+        lambda db, row: statements.feed_page(db, row["filters"], row["offset"], FEED_PER_PAGE),
+    ),
+}
+
+# Endpoint -> the shapes it runs per request
+ENDPOINTS = {
+    "GET /chats/{id}/messages": ["user_by_id", "chat_by_id", "membership"],
+    "DELETE /participants/trip/{id}/user/{id}": ["user_by_id", "trip_by_id", "membership"],
+    "GET /trips/feed": ["feed_total", "feed_page"],
+}
+
+def sample_rows(limit: int) -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        rows = db.query(TripParticipant.trip_id, TripParticipant.user_id, GroupChat.id).join(
+            GroupChat, GroupChat.trip_id == TripParticipant.trip_id
+        ).limit(limit).all()
+    finally:
+        db.close()
+    filters = _feed_filters()
+    return [
+        {"trip_id": trip_id, "user_id": user_id, "chat_id": chat_id, "filters": filters, "offset": (i % 5) * FEED_PER_PAGE}
+        for i, (trip_id, user_id, chat_id) in enumerate(rows)
+    ]
+
+def time_calls(db: Session, call: Callable, rows: List[Dict[str, Any]], iterations: int) -> float:
+    """Microseconds per call, with a fresh identity map so every call loads its rows"""
+    for row in rows[:50]:
+        call(db, row)
+    db.expunge_all()
+    started = time.perf_counter()
+    for i in range(iterations):
+        call(db, rows[i % len(rows)])
+        if i % 100 == 99:
+            db.expunge_all()
+    elapsed = time.perf_counter() - started
+    db.rollback()
+    return round(elapsed / iterations * 1e6, 1)
+
+def measure(rows: List[Dict[str, Any]], iterations: int) -> Dict[str, Dict[str, float]]:
+    db = SessionLocal()
+    uncached = Session(bind=engine.execution_options(compiled_cache=None))
+    try:
+        results = {}
+        for name, (legacy, cached) in SHAPES.items():
+            result = {
+                "query_no_cache_us": time_calls(uncached, legacy, rows, iterations),
+                "query_us": time_calls(db, legacy, rows, iterations),
+                "statement_us": time_calls(db, cached, rows, iterations),
+            }
+            result["compile_us"] = round(result["query_no_cache_us"] - result["query_us"], 1)
+            result["saved_us"] = round(result["query_us"] - result["statement_us"], 1)
+            results[name] = result
+        return results
+    finally:
+        uncached.close()
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=5000, help="Calls per shape and variant")
+    parser.add_argument("--min-saved-us", type=float)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        empty = db.query(Trip.id).first() is None
+    finally:
+        db.close()
+    if empty:
+        generate(max(args.trips // 10, 100), args.trips, args.seed)
+
+    rows = sample_rows(1000)
+    if not rows:
+        sys.exit("No trip participants with a chat to sample")
+    shapes = measure(rows, args.iterations)
+    endpoints = {
+        endpoint: {
+            "query_us": round(sum(shapes[name]["query_us"] for name in names), 1),
+            "statement_us": round(sum(shapes[name]["statement_us"] for name in names), 1),
+            "saved_us": round(sum(shapes[name]["saved_us"] for name in names), 1),
+        }
+        for endpoint, names in ENDPOINTS.items()
+    }
+
+    failed = args.min_saved_us is not None and any(
+        result["saved_us"] < args.min_saved_us for result in endpoints.values()
+    )
+    print(json.dumps({
+        "benchmark": "statements",
+        "dialect": engine.dialect.name,
+        "driver": engine.dialect.driver,
+        "iterations": args.iterations,
+        "shapes": shapes,
+        "endpoints": endpoints,
+        "failed": failed,
+    }, indent=2))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
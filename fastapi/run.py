@@ -1,16 +1,48 @@
 """
 TripNect India FastAPI Backend
-Run this file to start the development server
+Run this file to start the development server, or with --production to
+serve with pre-forked workers (see app/server.py)
 """
 
+import argparse
 import uvicorn
-from app.main import app
+
+from app.server import (
+    serve, SERVE_HOST, SERVE_PORT, MAX_REQUESTS, MAX_REQUESTS_JITTER, MAX_WORKER_MEMORY_MB,
+    KEEP_ALIVE_SECONDS, BACKLOG, GRACEFUL_TIMEOUT_SECONDS
+)
 
 if __name__ == "__main__":
-    uvicorn.run(
-        app,  # use the imported app directly
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--production", action="store_true", help="Pre-forked workers, no reload")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to WEB_CONCURRENCY or the CPU count")
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS, help="Recycle a worker after this many requests (0 never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=MAX_REQUESTS_JITTER)
+    parser.add_argument("--max-memory-mb", type=int, default=MAX_WORKER_MEMORY_MB, help="Recycle a worker above this RSS (0 never)")
+    parser.add_argument("--keep-alive", type=int, default=KEEP_ALIVE_SECONDS)
+    parser.add_argument("--backlog", type=int, default=BACKLOG)
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    if args.production:
+        serve(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            max_requests=args.max_requests,
+            max_requests_jitter=args.max_requests_jitter,
+            max_memory_mb=args.max_memory_mb,
+            keep_alive=args.keep_alive,
+            backlog=args.backlog,
+            graceful_timeout=args.graceful_timeout,
+        )
+    else:
+        uvicorn.run(
+            "app.main:app",  # reload needs an import string
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )